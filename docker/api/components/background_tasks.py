@@ -32,6 +32,14 @@ class BackgroundTaskProcessor:
         s3_task = asyncio.create_task(self._process_s3_events())
         self.tasks.append(s3_task)
         
+        # Periodically correct drift in the analytics aggregates
+        reconcile_task = asyncio.create_task(self._reconcile_analytics())
+        self.tasks.append(reconcile_task)
+        
+        # Pick up documents written through other replicas into this pod's local search index
+        refresh_task = asyncio.create_task(self._refresh_local_search())
+        self.tasks.append(refresh_task)
+        
         # Start other background tasks as needed
         # cleanup_task = asyncio.create_task(self._cleanup_old_files())
         # self.tasks.append(cleanup_task)
@@ -124,6 +132,46 @@ class BackgroundTaskProcessor:
         except Exception as e:
             logger.error(f"Error processing S3 object {key}: {str(e)}")
     
+    async def _reconcile_analytics(self):
+        """Reconcile analytics aggregates against the source tables"""
+        interval = int(os.environ.get('ANALYTICS_RECONCILE_INTERVAL_SECONDS', '3600'))
+        while self.running:
+            try:
+                # Runs at startup too (seeding the counters); every worker of every replica calls this, but the
+                # lease and the reconciled_at age check keep it to about one recount per interval fleet-wide
+                result = await asyncio.to_thread(
+                    self.document_processor.database_service.reconcile_analytics_aggregates, interval
+                )
+                if not result.get('skipped'):
+                    logger.info(f"Reconciled analytics aggregates: {result['corrections'] or 'no drift'}")
+                await asyncio.sleep(interval)
+                
+            except asyncio.CancelledError:
+                logger.info("Analytics reconciliation cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error reconciling analytics aggregates: {str(e)}")
+                await asyncio.sleep(interval)
+    
+    async def _refresh_local_search(self):
+        """Periodically catch the pod-local fallback search index up with the documents table and reload
+        typeahead from it"""
+        interval = int(os.environ.get('LOCAL_SEARCH_REFRESH_INTERVAL_SECONDS', '300'))
+        if interval <= 0:
+            return
+        while self.running:
+            try:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.document_processor.database_service.catch_up_local_search_index, interval)
+                # Runs in every worker: the catch-up above may have been done by another worker of the pod
+                await asyncio.to_thread(self.document_processor.refresh_suggest_index)
+                
+            except asyncio.CancelledError:
+                logger.info("Local search index refresh cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error refreshing local search index: {str(e)}")
+    
     async def _cleanup_old_files(self):
         """Cleanup old temporary files"""
         while self.running:
@@ -1,15 +1,20 @@
 # Contact Processor Component - Extracted from lambda_function.py
 import os
 import time
+import asyncio
 import uuid
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 from shared.aws_clients import AWSClientManager
 from shared.email_service import EmailService
+from shared.email_outbox import EmailOutbox
 from shared.database_service import DatabaseService
+from shared.cache import StaleWhileRevalidateCache
+from shared.outbox import Outbox
 from utils.validation import ValidationService
+from utils.pagination import CursorCodec
 from models.contact import ContactForm, ContactResponse, ContactRecord
 
 logger = logging.getLogger(__name__)
@@ -19,12 +24,27 @@ class ContactProcessor:
     
     def __init__(self, aws_clients: AWSClientManager):
         self.aws_clients = aws_clients
-        self.email_service = EmailService(aws_clients.ses_client)
+        self.email_outbox = EmailOutbox(aws_clients)
+        self.email_service = EmailService(aws_clients.ses_client, self.email_outbox)
         self.database_service = DatabaseService(aws_clients)
         self.validation_service = ValidationService()
+        self.stats_cache = StaleWhileRevalidateCache(
+            self._load_stats,
+            soft_ttl_seconds=float(os.environ.get('STATS_CACHE_SOFT_TTL_SECONDS', '5')),
+            hard_ttl_seconds=float(os.environ.get('STATS_CACHE_HARD_TTL_SECONDS', '60'))
+        )
+        
+        self.documents_page_size = int(os.environ.get('CONTACT_DOCUMENTS_PAGE_SIZE', '100'))
+        self.merge_by_email = os.environ.get('CONTACT_MERGE_BY_EMAIL', 'false').lower() == 'true'
+        
+        # Metrics do not need to land before the submitter gets a response (the notification goes through
+        # the durable email outbox instead, so a restart cannot drop it)
+        self.outbox = Outbox('contact-outbox')
+        self.outbox.register('contact_metrics', self.database_service.record_contact_metrics)
     
-    async def process_contact(self, contact_form: ContactForm) -> ContactResponse:
+    async def process_contact(self, contact_form: ContactForm, visitor_key: Optional[str] = None) -> ContactResponse:
         """Process contact form submission (from lambda_function.py)"""
+        stage_times = {'start': time.perf_counter()}
         try:
             # Convert Pydantic model to dict and validate
             body = contact_form.dict()
@@ -54,22 +74,23 @@ class ContactProcessor:
                 'search_capabilities': True
             }
             
-            # Save contact submission to DynamoDB
-            contact_id = self.database_service.create_contact_record(contact_item)
+            stage_times['validate'] = time.perf_counter()
             
-            # Update visitor counter
-            visitor_count = self.database_service.update_visitor_count()
+            # Store the contact and count the visit concurrently
+            contact_id, visitor_count, merged = await self._store_contact(contact_item, visitor_key)
+            stage_times['store'] = time.perf_counter()
             
-            # Get document count for this contact
-            documents_count = len(self.database_service.get_contact_documents(contact_id))
+            # A freshly generated contact ID cannot have documents yet
+            documents_count = 0
             
-            # Send notification email
-            email_response = self.email_service.send_contact_notification(
+            # Queue the notification email and hand the metrics to the outbox
+            await self._queue_side_effects(contact_item, merged, 'send_contact_notification', [
                 sanitized_body['name'], sanitized_body['email'], sanitized_body['company'],
                 sanitized_body['service'], sanitized_body['budget'], sanitized_body['message'],
                 timestamp, sanitized_body['source'], sanitized_body['userAgent'], 
                 sanitized_body['pageUrl'], documents_count
-            )
+            ])
+            stage_times['enqueue'] = time.perf_counter()
             
             # Return success response
             response_data = ContactResponse(
@@ -80,7 +101,7 @@ class ContactProcessor:
                 documents_count=documents_count
             )
             
-            logger.info(f"Successfully processed contact submission: {contact_id}")
+            logger.info(f"Successfully processed contact submission: {contact_id} ({self._format_timings(stage_times)})")
             return response_data
             
         except ValueError as ve:
@@ -90,8 +111,9 @@ class ContactProcessor:
             logger.error(f"Unexpected error in contact submission: {str(e)}")
             raise Exception(f"Internal Error: An unexpected error occurred. Please try again later.")
     
-    async def process_enhanced_contact(self, contact_form: ContactForm) -> ContactResponse:
+    async def process_enhanced_contact(self, contact_form: ContactForm, visitor_key: Optional[str] = None) -> ContactResponse:
         """Process enhanced contact form with document capabilities (from enhanced_app.py)"""
+        stage_times = {'start': time.perf_counter()}
         try:
             # Convert Pydantic model to dict and validate
             body = contact_form.dict()
@@ -118,23 +140,26 @@ class ContactProcessor:
                 'search_capabilities': True
             }
             
-            # Save contact submission to DynamoDB
-            contact_id = self.database_service.create_contact_record(contact_item)
+            stage_times['validate'] = time.perf_counter()
             
-            # Update visitor counter
-            visitor_count = self.database_service.update_visitor_count()
+            # Store the contact (or fold it into the existing contact for this email) and count the visit concurrently
+            contact_id, visitor_count, merged = await self._store_contact(contact_item, visitor_key, self.merge_by_email)
+            stage_times['store'] = time.perf_counter()
             
-            # Get document count for this contact
-            documents_count = len(self.database_service.get_contact_documents(contact_id))
+            # A freshly generated contact ID cannot have documents yet; an existing contact may
+            documents_count = 0
+            if merged:
+                documents_count = len(await asyncio.to_thread(self.database_service.get_contact_documents, contact_id))
             
-            # Send enhanced notification email
-            email_response = self.email_service.send_enhanced_contact_notification(
+            # Queue the enhanced notification email and hand the metrics to the outbox
+            await self._queue_side_effects(contact_item, merged, 'send_enhanced_contact_notification', [
                 body['name'], body['email'], body.get('company', 'Not specified'),
                 body.get('service', 'Not specified'), body.get('budget', 'Not specified'),
                 body['message'], timestamp, body.get('source', 'website'),
                 body.get('userAgent', 'Not provided'), body.get('pageUrl', 'Not provided'),
                 documents_count
-            )
+            ])
+            stage_times['enqueue'] = time.perf_counter()
             
             # Return enhanced success response
             response_data = ContactResponse(
@@ -145,38 +170,97 @@ class ContactProcessor:
                 documents_count=documents_count
             )
             
-            logger.info(f"Successfully processed enhanced contact submission: {contact_id}")
+            logger.info(f"Successfully processed enhanced contact submission: {contact_id} ({self._format_timings(stage_times)})")
             return response_data
             
         except Exception as e:
             logger.error(f"Unexpected error in enhanced contact submission: {str(e)}")
             raise Exception(f"Internal Error: An unexpected error occurred. Please try again later.")
     
-    async def get_contact_documents(self, contact_id: str) -> Dict[str, Any]:
-        """Get all documents for a specific contact (from enhanced_app.py)"""
+    async def _store_contact(self, contact_item: Dict[str, Any], visitor_key: Optional[str],
+                             merge: bool = False) -> Tuple[str, int, bool]:
+        """Durably store the contact while the visitor counter is updated; returns (contact_id, visitor_count, merged)"""
+        async def store() -> Tuple[str, bool]:
+            if merge:
+                existing = await asyncio.to_thread(self.database_service.get_contact_by_email, contact_item['email'])
+                if existing and await asyncio.to_thread(self.database_service.merge_contact_submission, existing['id'], contact_item):
+                    return existing['id'], True
+            return await asyncio.to_thread(self.database_service.create_contact_record, contact_item, False), False
+        
+        (contact_id, merged), visitor_count = await asyncio.gather(
+            store(),
+            asyncio.to_thread(self.database_service.update_visitor_count, visitor_key)
+        )
+        return contact_id, visitor_count, merged
+    
+    async def _queue_side_effects(self, contact_item: Dict[str, Any], merged: bool, method: str, arguments: list):
+        """Persist the notification email in the email outbox (sent inline when it is disabled) and, for new
+        contacts, hand the contact metrics to the outbox workers"""
+        if await asyncio.to_thread(getattr(self.email_service, method), *arguments) is None:
+            logger.error(f"Notification for contact {contact_item['id']} was not queued")
+        if not merged:
+            self.outbox.enqueue('contact_metrics', contact_item)
+    
+    async def lookup_contact(self, email: str) -> Optional[Dict[str, Any]]:
+        """Find the most recent contact for an email address"""
+        if not self.validation_service.validate_email(email.strip()):
+            raise ValueError("Invalid email format")
+        return await asyncio.to_thread(self.database_service.get_contact_by_email, email)
+    
+    @staticmethod
+    def _format_timings(stage_times: Dict[str, float]) -> str:
+        """Per-stage durations in milliseconds, e.g. 'validate=0.1ms store=12.3ms ... total=12.6ms'"""
+        stages = list(stage_times.items())
+        parts = [f"{name}={(moment - stages[index][1]) * 1000:.1f}ms" for index, (name, moment) in enumerate(stages[1:])]
+        parts.append(f"total={(stages[-1][1] - stages[0][1]) * 1000:.1f}ms")
+        return ' '.join(parts)
+    
+    async def get_contact_documents(self, contact_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                    if_none_match: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Get one page of a contact's documents (from enhanced_app.py); returns (page or None if unchanged, ETag)"""
+        limit = limit or self.documents_page_size
+        start_key = None
+        if cursor:
+            cursor_state = CursorCodec.decode(cursor)
+            if cursor_state.get('contact') != contact_id:
+                raise ValueError("Cursor does not belong to this contact")
+            start_key = cursor_state.get('key')
+        
         try:
-            documents = self.database_service.get_contact_documents(contact_id)
+            # Read the version before the page so a concurrent change can only make the ETag stale, never wrong
+            version = await asyncio.to_thread(self.database_service.get_contact_documents_version, contact_id)
+            etag = f'"v{version}-{CursorCodec.fingerprint(contact_id, limit, cursor)}"'
+            if if_none_match and etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+                return None, etag
             
+            documents, last_key = await asyncio.to_thread(
+                self.database_service.list_contact_documents, contact_id, limit, start_key
+            )
             return {
                 'contact_id': contact_id,
                 'documents': documents,
-                'total_count': len(documents)
-            }
+                'count': len(documents),
+                # Only known when the whole listing fits on this page
+                'total_count': len(documents) if not last_key and not cursor else None,
+                'next_cursor': CursorCodec.encode({'contact': contact_id, 'key': last_key}) if last_key else None
+            }, etag
             
         except Exception as e:
             logger.error(f"Error getting contact documents: {str(e)}")
             raise Exception(f"Retrieval Error: Failed to retrieve contact documents.")
     
-    async def get_stats(self) -> Dict[str, Any]:
-        """Get visitor statistics (from enhanced_app.py)"""
+    async def get_stats(self) -> Tuple[Dict[str, Any], float]:
+        """Get visitor statistics, served from the stale-while-revalidate cache (from enhanced_app.py)"""
         try:
-            visitor_count = self.database_service.get_visitor_count()
-            
-            return {
-                "visitor_count": visitor_count,
-                "timestamp": datetime.utcnow().isoformat() + 'Z',
-                "enhanced_features": True
-            }
+            return await self.stats_cache.get()
         except Exception as e:
             logger.error(f"Error getting stats: {str(e)}")
             raise Exception("Unable to retrieve statistics")
+    
+    async def _load_stats(self) -> Dict[str, Any]:
+        visitor_count = await asyncio.to_thread(self.database_service.get_visitor_count)
+        return {
+            "visitor_count": visitor_count,
+            "timestamp": datetime.utcnow().isoformat() + 'Z',
+            "enhanced_features": True
+        }
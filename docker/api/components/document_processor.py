@@ -1,19 +1,30 @@
 # Document Processor Component - Extracted from enhanced_index.py
 import os
 import time
+import asyncio
 import uuid
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, List, Tuple
+import numpy as np
 from fastapi import UploadFile
 
 from shared.aws_clients import AWSClientManager
 from shared.email_service import EmailService
+from shared.email_outbox import EmailOutbox
 from shared.database_service import DatabaseService
 from shared.opensearch_client import OpenSearchService
+from shared.search_executor import SearchExecutor
+from shared.cache import TTLCache, StaleWhileRevalidateCache
+from shared.notification_digest import NotificationDigest
+from shared.near_duplicates import NearDuplicateIndex
+from shared.suggest_index import PrefixIndex
+from shared.vector_index import HashingVectorizer, VectorIndex
 from utils.document_processing import DocumentProcessingService
 from utils.validation import ValidationService
-from models.document import DocumentUpload, DocumentResponse, SearchRequest, SearchResponse, DocumentRecord
+from utils.pagination import CursorCodec
+from utils.minhash import MinHasher
+from models.document import DocumentUpload, DocumentResponse, SearchRequest, SearchResponse, SuggestResponse, DocumentRecord
 from models.contact import ContactRecord
 
 logger = logging.getLogger(__name__)
@@ -21,11 +32,36 @@ logger = logging.getLogger(__name__)
 class DocumentProcessor:
     """Document processing component extracted from enhanced_index.py"""
     
-    def __init__(self, aws_clients: AWSClientManager):
+    def __init__(self, aws_clients: AWSClientManager, email_outbox: Optional[EmailOutbox] = None):
         self.aws_clients = aws_clients
-        self.email_service = EmailService(aws_clients.ses_client)
+        # Shares the contact processor's outbox (whose sender loop the app runs) when given one
+        self.email_outbox = email_outbox or EmailOutbox(aws_clients)
+        self.email_service = EmailService(aws_clients.ses_client, self.email_outbox)
         self.database_service = DatabaseService(aws_clients)
         self.opensearch_service = OpenSearchService(aws_clients)
+        self.search_executor = SearchExecutor(self.opensearch_service, self.database_service)
+        self.suggest_index = PrefixIndex()
+        # Local index change marker the typeahead was last loaded at
+        self.suggest_loaded_at = None
+        self.minhasher = MinHasher()
+        self.near_duplicate_index = NearDuplicateIndex(aws_clients, threshold=float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.8')))
+        self.skip_near_duplicate_enrichment = os.environ.get('NEAR_DUPLICATE_SKIP_ENRICHMENT', 'true').lower() == 'true'
+        self.vector_index = VectorIndex()
+        self.vectorizer = HashingVectorizer(self.vector_index.dimensions)
+        self.facet_cache = TTLCache(
+            max_entries=int(os.environ.get('FACET_CACHE_MAX_ENTRIES', '1024')),
+            ttl_seconds=float(os.environ.get('FACET_CACHE_TTL_SECONDS', '60'))
+        )
+        self.analytics_cache = StaleWhileRevalidateCache(
+            self._load_analytics,
+            soft_ttl_seconds=float(os.environ.get('ANALYTICS_CACHE_SOFT_TTL_SECONDS', '5')),
+            hard_ttl_seconds=float(os.environ.get('ANALYTICS_CACHE_HARD_TTL_SECONDS', '60'))
+        )
+        self.contact_email_cache = TTLCache(
+            max_entries=int(os.environ.get('CONTACT_EMAIL_CACHE_MAX_ENTRIES', '10000')),
+            ttl_seconds=float(os.environ.get('CONTACT_EMAIL_CACHE_TTL_SECONDS', '3600'))
+        )
+        self.notification_digest = NotificationDigest(self.email_service, self.email_outbox, self._get_contact_email)
         self.validation_service = ValidationService()
         
         # Configuration
@@ -135,9 +171,25 @@ class DocumentProcessor:
     
     async def process_s3_document(self, bucket: str, key: str) -> Dict[str, Any]:
         """Process S3 document (from enhanced_index.py)"""
+        document_id = None
+        document_record = {}
+        version = None
         try:
             logger.info(f"Processing S3 object: s3://{bucket}/{key}")
             
+            # Claim the document record first so redelivered events and concurrent processors skip it
+            document_record = self.database_service.get_document_by_s3_key(key) or {}
+            if document_record:
+                version = self.database_service.start_document_processing(
+                    document_record['id'], int(document_record.get('version', 0)), document_record.get('contact_id')
+                )
+                if version is None:
+                    return {
+                        'message': f"Document {document_record['id']} is already being processed or completed",
+                        'processed_count': 0
+                    }
+                document_id = document_record['id']
+            
             # Get object from S3
             response = self.aws_clients.s3_client.get_object(Bucket=bucket, Key=key)
             content = response['Body'].read().decode('utf-8')
@@ -145,7 +197,7 @@ class DocumentProcessor:
             
             # Extract metadata from S3 object metadata
             s3_metadata = response.get('Metadata', {})
-            contact_id = s3_metadata.get('contact_id', 'unknown')
+            contact_id = document_record.get('contact_id') or s3_metadata.get('contact_id', 'unknown')
             document_type = s3_metadata.get('document_type', 'unknown')
             upload_timestamp = s3_metadata.get('upload_timestamp', datetime.utcnow().isoformat())
             
@@ -171,33 +223,20 @@ class DocumentProcessor:
                 'processing_status': 'processing'
             })
             
-            # Update document status in DynamoDB
-            documents_table = self.database_service.get_documents_table()
-            
-            # Find document by S3 key
-            response_scan = documents_table.scan(
-                FilterExpression='s3_key = :s3_key',
-                ExpressionAttributeValues={':s3_key': key}
-            )
-            
-            document_id = None
-            if response_scan['Items']:
-                document_id = response_scan['Items'][0]['id']
-                
-                # Update document with processing metadata
-                self.database_service.update_document_status(document_id, 'processing', document_metadata)
-                
-                logger.info(f"Updated document {document_id} with processing metadata")
-            
-            # Prepare document for OpenSearch indexing
-            self.opensearch_service.create_index_if_not_exists()
+            # Flag near-duplicates (revised proposals, re-dated contracts) before the expensive steps
+            near_duplicates, near_duplicate_fields = [], {}
+            if document_id:
+                near_duplicates, near_duplicate_fields = await asyncio.to_thread(
+                    self._detect_near_duplicates, document_id, text_content
+                )
+            skip_enrichment = bool(near_duplicates) and self.skip_near_duplicate_enrichment
             
             # Calculate complexity score
             complexity_score = DocumentProcessingService.calculate_complexity_score(document_metadata)
             
-            # Prepare document for indexing
+            # Prepare document for indexing; the id is stable so a redelivered event overwrites the same entry
             document = {
-                'id': f"{contact_id}_{filename}_{int(time.time())}",
+                'id': document_id or f"{contact_id}_{filename}",
                 'contact_id': contact_id,
                 'filename': filename,
                 'document_type': document_type,
@@ -211,8 +250,9 @@ class DocumentProcessor:
                     'content_type': content_type,
                     'last_modified': response['LastModified'].isoformat()
                 },
+                # Indexed only once completion is recorded, so the indexed copy carries the final status
                 'processing_info': {
-                    'status': 'processing',
+                    'status': 'completed',
                     'timestamp': datetime.utcnow().isoformat() + 'Z',
                     'complexity_score': complexity_score
                 },
@@ -221,26 +261,61 @@ class DocumentProcessor:
                 'processing_timestamp': datetime.utcnow().isoformat() + 'Z'
             }
             
+            # Store metadata, complexity score and near-duplicate flags with the completed status in one write
+            if document_id:
+                completed = self.database_service.complete_document_processing(
+                    document_id,
+                    version,
+                    complexity_score,
+                    document_metadata,
+                    near_duplicate_fields,
+                    document_type=document_record.get('document_type', document_type),
+                    upload_timestamp=document_record.get('upload_timestamp', upload_timestamp),
+                    contact_id=document_record.get('contact_id', contact_id)
+                )
+                version = None
+                if completed is None:
+                    # Another processor reclaimed the document; it runs the remaining steps
+                    logger.warning(f"Document {document_id} changed while it was being processed; completion not recorded")
+                    return {
+                        'message': f"Document {document_id} changed while it was being processed",
+                        'processed_count': 0
+                    }
+            
             # Index document in OpenSearch
-            self.opensearch_service.index_document(document)
-            logger.info(f"Indexed enhanced document: {document['id']}")
+            await self.opensearch_service.create_index_if_not_exists()
+            await self.opensearch_service.index_document(document)
             
-            # Update document status to completed
+            # Append the document vector for "more like this" queries
             if document_id:
-                self.database_service.update_document_completion(document_id, complexity_score)
+                await asyncio.to_thread(self._index_vector, document_id, text_content, document_metadata.get('keywords', []))
             
-            # Enrich contact data
-            contact_insights = self.database_service.enrich_contact_data(contact_id, document_metadata)
-            logger.info(f"Enriched contact {contact_id} with insights: {contact_insights}")
+            # Make the document's filename, keywords and tags available to typeahead
+            self.suggest_index.add_document(
+                document_record.get('filename', filename),
+                document_metadata.get('keywords', []),
+                document_record.get('tags', [])
+            )
             
-            # Send processing notification
-            self._send_processing_notification(contact_id, document_metadata, 'completed')
+            if skip_enrichment:
+                logger.info(f"Document {document_id} is a near-duplicate of {near_duplicates[0]['document_id']}, "
+                            f"skipping enrichment and notification")
+            else:
+                # Enrich contact data
+                contact_insights = self.database_service.enrich_contact_data(
+                    contact_id, document_metadata, complexity_score, 'completed'
+                )
+                logger.info(f"Enriched contact {contact_id} with insights: {contact_insights}")
+                
+                # Send processing notification
+                self._send_processing_notification(contact_id, document_metadata, 'completed')
             
             return {
                 'message': 'Successfully processed and enriched documents',
                 'processed_count': 1,
+                'near_duplicate_of': near_duplicates[0]['document_id'] if near_duplicates else None,
                 'enhanced_features': {
-                    'contact_enrichment': True,
+                    'contact_enrichment': not skip_enrichment,
                     'content_analysis': True,
                     'complexity_scoring': True,
                     'entity_extraction': True,
@@ -251,74 +326,248 @@ class DocumentProcessor:
             
         except Exception as e:
             logger.error(f"Error processing S3 document: {str(e)}")
+            if version is not None:
+                self.database_service.fail_document_processing(
+                    document_id, version, str(e), document_record.get('contact_id')
+                )
             return {
                 'error': str(e),
                 'enhanced_processing': True
             }
     
+    def _detect_near_duplicates(self, document_id: str, text_content: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Compute the MinHash signature, flag any duplicate cluster and add the document to the shared band index;
+        returns the matches and the fields to store with the document's completion"""
+        signature = self.minhasher.signature(text_content)
+        if signature is None:
+            return [], {}
+        
+        # Best effort: the signature is stored with the document either way, so the backfill can catch up
+        try:
+            matches = self.near_duplicate_index.query(signature, exclude=document_id)
+        except Exception as e:
+            logger.error(f"Error querying near-duplicates of {document_id}: {str(e)}")
+            matches = []
+        cluster_id = None
+        if matches:
+            closest = matches[0]['document_id']
+            # Join the closest match's cluster; on its first duplicate the match becomes the cluster root
+            cluster_id = self.database_service.assign_duplicate_cluster(closest, closest) or closest
+            logger.info(f"Document {document_id} joins duplicate cluster {cluster_id} "
+                        f"(similarity {matches[0]['similarity']})")
+        
+        fields = DatabaseService.near_duplicate_fields(
+            signature.tobytes(),
+            cluster_id=cluster_id,
+            duplicate_of=matches[0]['document_id'] if matches else None,
+            similarity=matches[0]['similarity'] if matches else None
+        )
+        try:
+            self.near_duplicate_index.insert(document_id, signature)
+        except Exception as e:
+            logger.error(f"Error adding {document_id} to the near-duplicate index: {str(e)}")
+        return matches, fields
+    
+    def backfill_near_duplicate_index(self) -> int:
+        """Add signatures stored on document records to the shared band index (documents processed
+        before the index was kept in DynamoDB)"""
+        count = 0
+        for item in self.database_service.iter_near_duplicate_signatures():
+            signature = np.frombuffer(bytes(item['minhash_signature']), dtype=np.uint32)
+            self.near_duplicate_index.insert(item['id'], signature)
+            count += 1
+        logger.info(f"Backfilled near-duplicate bands for {count} documents")
+        return count
+    
+    async def get_near_duplicates(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Near-duplicates of a processed document; None if the document has no signature"""
+        document = await asyncio.to_thread(self.database_service.get_near_duplicate_info, document_id)
+        if not document or 'minhash_signature' not in document:
+            return None
+        
+        signature = np.frombuffer(bytes(document['minhash_signature']), dtype=np.uint32)
+        matches = await asyncio.to_thread(self.near_duplicate_index.query, signature, document_id)
+        return {
+            'document_id': document_id,
+            'duplicate_cluster_id': document.get('duplicate_cluster_id'),
+            'near_duplicates': matches,
+            'total_count': len(matches)
+        }
+    
+    def _index_vector(self, document_id: str, text_content: str, keywords: List[str]):
+        """Embed a document and append it to the vector index"""
+        vector = self.vectorizer.vectorize(text_content, keywords)
+        if vector is not None:
+            self.vector_index.append(document_id, vector)
+    
+    async def build_vector_partitions(self):
+        """Load the vector index and build IVF partitions when the corpus is large enough"""
+        try:
+            rows = await asyncio.to_thread(self.vector_index.refresh)
+            partitioned = await asyncio.to_thread(self.vector_index.build_partitions)
+            logger.info(f"Vector index loaded with {rows} rows (partitioned: {partitioned})")
+        except Exception as e:
+            logger.error(f"Error loading vector index: {str(e)}")
+    
+    async def find_similar_documents(self, document_id: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+        """Documents most similar to an indexed document; None if it has no vector"""
+        start_time = time.time()
+        result = await asyncio.to_thread(self.vector_index.similar, document_id, limit)
+        if result is None:
+            return None
+        return {
+            'document_id': document_id,
+            'similar': result['results'],
+            'total_count': len(result['results']),
+            'engine': result['engine'],
+            'scanned': result['scanned'],
+            'processing_time': time.time() - start_time
+        }
+    
     async def search_documents(self, search_request: SearchRequest) -> SearchResponse:
-        """Search documents with advanced filtering (from enhanced_app.py)"""
+        """Search documents with advanced filtering and cursor pagination (from enhanced_app.py)"""
         try:
             start_time = time.time()
-            
-            # Try OpenSearch first, fallback to DynamoDB
-            opensearch_results = self.opensearch_service.search_documents(
-                search_request.query, 
-                search_request.filters, 
-                search_request.limit
-            )
-            
-            if opensearch_results['total_count'] > 0:
-                processing_time = time.time() - start_time
-                return SearchResponse(
-                    results=opensearch_results['results'],
-                    total_count=opensearch_results['total_count'],
-                    query=search_request.query,
-                    processing_time=processing_time
+            query_fingerprint = CursorCodec.fingerprint(search_request.query, search_request.filters)
+            
+            facets = None
+            
+            # A cursor pins the backend that produced the first page
+            if search_request.cursor:
+                cursor_state = CursorCodec.decode(search_request.cursor)
+                if cursor_state.get('q') != query_fingerprint:
+                    raise ValueError("Cursor does not belong to this query")
+                result = await self.search_executor.search_page(
+                    cursor_state.get('engine'),
+                    search_request.query,
+                    search_request.filters,
+                    search_request.limit,
+                    cursor_state.get('page')
+                )
+            else:
+                # Facets are cached per query, so only ask OpenSearch for aggregations on a miss
+                facet_key = (query_fingerprint, search_request.facet_size)
+                if search_request.include_facets:
+                    facets = self.facet_cache.get(facet_key)
+                
+                # OpenSearch first, hedged with the local index once it runs slow
+                result = await self.search_executor.search(
+                    search_request.query,
+                    search_request.filters,
+                    search_request.limit,
+                    facet_size=search_request.facet_size if search_request.include_facets and facets is None else None
                 )
+                
+                if result.get('facets') is not None:
+                    self.facet_cache.set(facet_key, result['facets'])
+                    facets = result['facets']
             
-            # Fallback to DynamoDB search
-            results = self.database_service.search_documents(search_request.query, search_request.limit)
             processing_time = time.time() - start_time
+            next_page = result['next_page']
             
             return SearchResponse(
-                results=results,
-                total_count=len(results),
+                results=result['results'],
+                total_count=result['total_count'],
+                total_count_exact=result.get('total_count_exact', True),
                 query=search_request.query,
-                processing_time=processing_time
+                processing_time=processing_time,
+                next_cursor=CursorCodec.encode({
+                    'engine': result['backend'], 'q': query_fingerprint, 'page': next_page
+                }) if next_page else None,
+                engine=result['engine'],
+                facets=facets
             )
             
+        except (ValueError, TimeoutError):
+            raise
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
             raise Exception(f"Search Error: Failed to search documents. Please try again.")
     
-    async def get_analytics(self) -> Dict[str, Any]:
-        """Get system analytics and insights (from enhanced_app.py)"""
+    async def ensure_search_index(self):
+        """Build the local fallback search index if it has never been built, then load typeahead"""
+        if not self.database_service.local_search.is_ready():
+            count = await asyncio.to_thread(self.database_service.rebuild_local_search_index)
+            logger.info(f"Local search index initialized with {count} documents")
+        
+        count = await asyncio.to_thread(self.build_suggest_index)
+        logger.info(f"Suggest index loaded from {count} documents")
+    
+    def refresh_suggest_index(self) -> Optional[int]:
+        """Reload typeahead when the local index picked up changes (including other pods' documents) since
+        the last load; each worker keeps its own in-process copy. None when nothing changed"""
+        if self.database_service.local_search.get_state('changed_at') == self.suggest_loaded_at:
+            return None
+        return self.build_suggest_index()
+    
+    def build_suggest_index(self) -> int:
+        """Load typeahead completions from the local index, or DynamoDB when it is unavailable"""
         try:
-            return self.database_service.get_analytics_data()
+            if self.database_service.local_search.is_ready():
+                self.suggest_loaded_at = self.database_service.local_search.get_state('changed_at')
+                sources = self.database_service.local_search.iter_suggestion_sources()
+            else:
+                sources = (
+                    {
+                        'filename': item.get('filename', ''),
+                        'tags': item.get('tags', []),
+                        'keywords': (item.get('processing_metadata') or {}).get('keywords', [])
+                    }
+                    for item in self.database_service.iter_search_documents()
+                )
+            return self.suggest_index.bulk_load(sources)
+        except Exception as e:
+            logger.error(f"Error building suggest index: {str(e)}")
+            return 0
+    
+    def suggest(self, prefix: str, limit: int = 10) -> SuggestResponse:
+        """Typeahead completions served from the in-process prefix index"""
+        start_time = time.perf_counter()
+        suggestions = self.suggest_index.suggest(prefix, limit)
+        return SuggestResponse(
+            query=prefix,
+            suggestions=suggestions,
+            processing_time=time.perf_counter() - start_time
+        )
+    
+    async def get_analytics(self) -> Tuple[Dict[str, Any], float]:
+        """Get system analytics and insights, served from the stale-while-revalidate cache (from enhanced_app.py)"""
+        try:
+            return await self.analytics_cache.get()
         except Exception as e:
             logger.error(f"Error getting analytics: {str(e)}")
             raise Exception(f"Analytics Error: Failed to retrieve analytics data.")
     
+    async def _load_analytics(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.database_service.get_analytics_data)
+
+    async def get_timeseries(self, start: Optional[datetime], end: Optional[datetime], granularity: str) -> Dict[str, Any]:
+        """Upload, contact and processing-latency trends from the rollup buckets"""
+        # Buckets are keyed in naive UTC
+        start, end = [value.astimezone(timezone.utc).replace(tzinfo=None) if value and value.tzinfo else value
+                      for value in (start, end)]
+        end = end or datetime.utcnow()
+        start = start or end - timedelta(days=1)
+        return await asyncio.to_thread(self.database_service.get_timeseries, start, end, granularity)
+
     def _send_processing_notification(self, contact_id: str, document_metadata: Dict[str, Any], processing_status: str):
-        """Send processing notification (from enhanced_index.py)"""
-        try:
-            # Get contact email from database
-            contact_table = self.database_service.get_contacts_table()
-            response = contact_table.get_item(Key={'id': contact_id})
-            if 'Item' not in response:
-                return
-            
-            contact = response['Item']
-            contact_email = contact.get('email')
-            
-            if contact_email:
-                self.email_service.send_processing_notification(
-                    contact_id, document_metadata, processing_status, contact_email
-                )
-            
-        except Exception as e:
-            logger.error(f"Error sending processing notification: {str(e)}")
+        """Send processing notification (from enhanced_index.py); coalesced into a per-contact digest"""
+        self.notification_digest.add(contact_id, document_metadata, processing_status)
+    
+    def _get_contact_email(self, contact_id: str) -> Optional[str]:
+        """Contact email address, cached so a burst of uploads costs one read"""
+        contact_email = self.contact_email_cache.get(contact_id)
+        if contact_email is not None:
+            return contact_email or None
+        
+        response = self.database_service.get_contacts_table().get_item(
+            Key={'id': contact_id},
+            ProjectionExpression='email'
+        )
+        # Unknown contacts are cached briefly as '' so a burst does not look them up repeatedly
+        contact_email = response.get('Item', {}).get('email') or ''
+        self.contact_email_cache.set(contact_id, contact_email, None if contact_email else 60)
+        return contact_email or None
     
     async def process_background_tasks(self):
         """Process background tasks for S3 events"""
@@ -0,0 +1,177 @@
+# Export Processor Component - Streaming bulk exports of DynamoDB tables
+import os
+import re
+import json
+import zlib
+import base64
+import logging
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from boto3.dynamodb.types import Binary
+
+from shared.database_service import DatabaseService
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Columns written to Parquet when no fields are requested (NDJSON exports whole items)
+DEFAULT_PARQUET_FIELDS = {
+    'documents': ['id', 'contact_id', 'filename', 'document_type', 'description', 'tags', 'size', 'content_type',
+                  'upload_timestamp', 'processing_status', 'complexity_score', 's3_key'],
+    'contacts': ['id', 'name', 'email', 'company', 'service', 'budget', 'timestamp', 'status', 'source']
+}
+FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+class _StreamSink:
+    """Write-only file object for ParquetWriter that keeps absolute offsets while its buffer is drained"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+class ExportProcessor:
+    """Streams whole-table exports from the parallel scan engine with constant memory"""
+
+    FORMATS = ('ndjson', 'parquet')
+    COMPRESSIONS = ('none', 'gzip')
+
+    def __init__(self, database_service: DatabaseService):
+        self.database_service = database_service
+        self.tables = {
+            'documents': database_service.documents_table_name,
+            'contacts': database_service.contacts_table_name
+        }
+        self.chunk_bytes = int(os.environ.get('EXPORT_CHUNK_BYTES', str(256 * 1024)))
+        self.row_group_size = int(os.environ.get('EXPORT_PARQUET_ROW_GROUP_SIZE', '10000'))
+
+    def validate(self, table: str, export_format: str, compression: str, fields: Optional[str]) -> List[str]:
+        """Check export parameters before streaming starts; returns the projected field list"""
+        if table not in self.tables:
+            raise KeyError(f"Unknown table '{table}'. Available: {', '.join(self.tables)}")
+        if export_format not in self.FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(self.FORMATS)}")
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"compression must be one of: {', '.join(self.COMPRESSIONS)}")
+        if export_format == 'parquet' and pa is None:
+            raise ValueError("Parquet export requires pyarrow, which is not installed")
+
+        field_list = [field.strip() for field in (fields or '').split(',') if field.strip()]
+        invalid = [field for field in field_list if not FIELD_PATTERN.match(field)]
+        if invalid:
+            raise ValueError(f"Invalid field names: {', '.join(invalid)}")
+        if export_format == 'parquet' and not field_list:
+            field_list = DEFAULT_PARQUET_FIELDS[table]
+        return field_list
+
+    def content_type(self, export_format: str, compression: str) -> str:
+        if export_format == 'parquet':
+            return 'application/vnd.apache.parquet'
+        return 'application/gzip' if compression == 'gzip' else 'application/x-ndjson'
+
+    def filename(self, table: str, export_format: str, compression: str) -> str:
+        extension = 'parquet' if export_format == 'parquet' else 'ndjson'
+        if export_format == 'ndjson' and compression == 'gzip':
+            extension += '.gz'
+        return f"{table}.{extension}"
+
+    async def export(self, table: str, export_format: str = 'ndjson', compression: str = 'none',
+                     fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        """Yield the export body in chunks (parameters must already be validated)"""
+        scan_kwargs = {}
+        if fields:
+            names = {f'#f{index}': field for index, field in enumerate(fields)}
+            scan_kwargs = {'projection': ', '.join(names), 'names': names}
+        items = self.database_service.parallel_scan(self.tables[table], **scan_kwargs)
+
+        exported = 0
+        if export_format == 'parquet':
+            async for chunk in self._parquet_chunks(items, fields, compression):
+                yield chunk
+            return
+
+        # gzip container (wbits=31) so the output is a standard .gz stream
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compression == 'gzip' else None
+        buffer = bytearray()
+        async for item in items:
+            buffer += json.dumps(item, default=self._json_default, separators=(',', ':')).encode('utf-8') + b'\n'
+            exported += 1
+            if len(buffer) >= self.chunk_bytes:
+                chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+                buffer.clear()
+                if chunk:
+                    yield chunk
+
+        tail = compressor.compress(bytes(buffer)) + compressor.flush() if compressor else bytes(buffer)
+        if tail:
+            yield tail
+        logger.info(f"Exported {exported} {table} items as {export_format} ({compression})")
+
+    async def _parquet_chunks(self, items: AsyncIterator[Dict[str, Any]], fields: List[str],
+                              compression: str) -> AsyncIterator[bytes]:
+        """Write row groups into an in-memory sink and hand each one off as soon as it is written"""
+        schema = pa.schema([(field, pa.string()) for field in fields])
+        sink = _StreamSink()
+        writer = pq.ParquetWriter(sink, schema, compression='gzip' if compression == 'gzip' else 'snappy')
+        columns = {field: [] for field in fields}
+        rows = 0
+
+        async for item in items:
+            for field in fields:
+                columns[field].append(self._cell(item.get(field)))
+            rows += 1
+            if rows % self.row_group_size == 0:
+                writer.write_table(pa.table(columns, schema=schema))
+                columns = {field: [] for field in fields}
+                yield sink.drain()
+
+        if columns[fields[0]]:
+            writer.write_table(pa.table(columns, schema=schema))
+        writer.close()
+        yield sink.drain()
+        logger.info(f"Exported {rows} items as parquet")
+
+    @classmethod
+    def _cell(cls, value: Any) -> Optional[str]:
+        """Parquet cells are strings; nested values are JSON-encoded"""
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (Decimal, int, float, bool)):
+            return str(value)
+        return json.dumps(value, default=cls._json_default, separators=(',', ':'))
+
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        if isinstance(value, Decimal):
+            return int(value) if value == value.to_integral_value() else float(value)
+        if isinstance(value, Binary):
+            return base64.b64encode(value.value).decode('ascii')
+        if isinstance(value, (set, frozenset)):
+            return sorted(value, key=str)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,261 @@
+# Import Processor Component - Streaming bulk contact imports via parallel BatchWriteItem writers
+import os
+import io
+import csv
+import json
+import time
+import uuid
+import random
+import asyncio
+import codecs
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError, BotoCoreError
+
+from shared.database_service import DatabaseService
+from shared.scan_engine import THROTTLE_ERRORS
+from utils.validation import ValidationService
+
+logger = logging.getLogger(__name__)
+
+BATCH_WRITE_LIMIT = 25
+
+class ImportProcessor:
+    """Parses NDJSON/CSV contact streams, validates in batches and writes with parallel BatchWriteItem calls"""
+
+    FORMATS = ('ndjson', 'csv')
+
+    def __init__(self, database_service: DatabaseService):
+        self.database_service = database_service
+        self.client = database_service.aws_clients.dynamodb_client
+        self.table_name = database_service.contacts_table_name
+        self.validation_service = ValidationService()
+        self.writers = int(os.environ.get('IMPORT_WRITERS', '8'))
+        self.validation_batch_size = int(os.environ.get('IMPORT_VALIDATION_BATCH_SIZE', '500'))
+        self.max_retries = int(os.environ.get('IMPORT_MAX_RETRIES', '8'))
+        self.max_errors_reported = int(os.environ.get('IMPORT_MAX_ERRORS_REPORTED', '100'))
+        self.progress_interval = float(os.environ.get('IMPORT_PROGRESS_INTERVAL_SECONDS', '5'))
+        self._serializer = TypeSerializer()
+        self.active: Dict[str, tuple] = {}
+
+    def resolve_format(self, import_format: Optional[str], content_type: Optional[str]) -> str:
+        """Explicit format wins; otherwise infer from the request content type"""
+        if import_format is None:
+            import_format = 'csv' if 'csv' in (content_type or '') else 'ndjson'
+        if import_format not in self.FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(self.FORMATS)}")
+        return import_format
+
+    async def import_contacts(self, body: AsyncIterator[bytes], import_format: str,
+                              source: str = 'import') -> Dict[str, Any]:
+        """Import a contact stream and return the summary report (status 'completed' or 'failed')"""
+        import_id = f"import_{int(time.time())}_{str(uuid.uuid4())[:8]}"
+        report = {'import_id': import_id, 'status': 'running', 'received': 0, 'valid': 0, 'invalid': 0,
+                  'written': 0, 'failed': 0, 'retries': 0, 'errors': []}
+        started_at = time.monotonic()
+        last_progress = started_at
+        self.active[import_id] = (report, started_at)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.writers * 4)
+        writers = [asyncio.create_task(self._writer(queue, report)) for _ in range(self.writers)]
+        records = self._parse_ndjson(body) if import_format == 'ndjson' else self._parse_csv(body)
+        batch = []
+        try:
+            async for line_number, record in records:
+                report['received'] += 1
+                batch.append((line_number, record))
+                if len(batch) >= self.validation_batch_size:
+                    await self._submit(batch, queue, writers, report, import_id, source)
+                    batch = []
+                if time.monotonic() - last_progress >= self.progress_interval:
+                    last_progress = time.monotonic()
+                    progress = self._snapshot(report, started_at)
+                    logger.info(f"Contact import {import_id}: {progress['received']} received, "
+                                f"{progress['written']} written ({progress['rate_per_second']}/s)")
+            await self._submit(batch, queue, writers, report, import_id, source)
+
+            for _ in writers:
+                await self._put(queue, None, writers)
+            await asyncio.gather(*writers)
+            report['status'] = 'completed'
+        except Exception as e:
+            logger.error(f"Error importing contacts ({import_id}): {str(e)}")
+            report['status'] = 'failed'
+            report['error'] = str(e)
+        finally:
+            # Also reached when the request is cancelled mid-import
+            for writer in writers:
+                writer.cancel()
+            self.active.pop(import_id, None)
+
+        summary = self._snapshot(report, started_at)
+        logger.info(f"Contact import {import_id} {report['status']}: {report['written']} written, "
+                    f"{report['invalid']} invalid, {report['failed']} failed in {summary['duration_seconds']}s")
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Progress of imports that are still running"""
+        return {'active_imports': [self._snapshot(report, started_at) for report, started_at in list(self.active.values())]}
+
+    @staticmethod
+    def _snapshot(report: Dict[str, Any], started_at: float) -> Dict[str, Any]:
+        elapsed = time.monotonic() - started_at
+        return dict(report, errors=list(report['errors']), duration_seconds=round(elapsed, 2),
+                    rate_per_second=round(report['written'] / elapsed, 1) if elapsed else 0.0)
+
+    async def _parse_ndjson(self, body: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+        line_number = 0
+        async for line in self._lines(body):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = ValueError(f"Invalid JSON: {e.msg}")
+            yield line_number, record
+
+    async def _parse_csv(self, body: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+        """CSV with a header row; quoted fields may span lines"""
+        header = None
+        line_number = 0
+        pending, pending_start = '', 0
+        async for line in self._lines(body):
+            line_number += 1
+            if not pending:
+                pending_start = line_number
+            pending += line + '\n'
+            if pending.count('"') % 2:
+                continue  # inside a quoted field; keep reading
+            row, pending = next(csv.reader(io.StringIO(pending)), []), ''
+            if not any(cell.strip() for cell in row):
+                continue
+            if header is None:
+                header = [cell.strip() for cell in row]
+                continue
+            if len(row) != len(header):
+                yield pending_start, ValueError(f"Expected {len(header)} columns, got {len(row)}")
+            else:
+                yield pending_start, dict(zip(header, row))
+        if pending.strip():
+            yield pending_start, ValueError("Unterminated quoted field")
+
+    @staticmethod
+    async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """Decode a byte stream incrementally and split it into lines"""
+        decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        remainder = ''
+        async for chunk in body:
+            text = remainder + decoder.decode(chunk)
+            lines = text.split('\n')
+            remainder = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        remainder += decoder.decode(b'', final=True)
+        if remainder:
+            yield remainder.rstrip('\r')
+
+    async def _submit(self, batch: List[tuple], queue: asyncio.Queue, writers: List[asyncio.Task],
+                      report: Dict[str, Any], import_id: str, source: str):
+        """Validate a batch of records and queue the valid ones in BatchWriteItem-sized chunks"""
+        items = []
+        imported_at = datetime.utcnow().isoformat() + 'Z'
+        for line_number, record in batch:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                if not isinstance(record, dict):
+                    raise ValueError("Record must be an object")
+                items.append(self._contact_item(record, import_id, source, imported_at))
+            except (ValueError, AttributeError) as e:
+                report['invalid'] += 1
+                if len(report['errors']) < self.max_errors_reported:
+                    report['errors'].append({'line': line_number, 'error': str(e)})
+        report['valid'] += len(items)
+        for start in range(0, len(items), BATCH_WRITE_LIMIT):
+            await self._put(queue, items[start:start + BATCH_WRITE_LIMIT], writers)
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, items: Optional[List[Dict[str, Any]]], writers: List[asyncio.Task]):
+        """Queue work for the writers; fails instead of blocking on the bounded queue forever if a writer has died"""
+        put = asyncio.ensure_future(queue.put(items))
+        done, _ = await asyncio.wait([put, *writers], return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            writer = next(iter(done))
+            raise RuntimeError(f"Import writer stopped: {writer.exception() or 'exited early'}")
+
+    def _contact_item(self, record: Dict[str, Any], import_id: str, source: str, imported_at: str) -> Dict[str, Any]:
+        """Same shape as a submitted contact (see ContactProcessor.process_contact), minus the side effects"""
+        record = {key: value if value is None or isinstance(value, str) else str(value) for key, value in record.items()}
+        record.setdefault('source', source)
+        sanitized_body = self.validation_service.validate_contact_input(record)
+        return {
+            'id': f"contact_{int(time.time())}_{uuid.uuid4().hex[:12]}",
+            'name': sanitized_body['name'],
+            'email': sanitized_body['email'],
+            'email_normalized': DatabaseService.normalize_email(sanitized_body['email']),
+            'company': sanitized_body['company'],
+            'service': sanitized_body['service'],
+            'budget': sanitized_body['budget'],
+            'message': sanitized_body['message'],
+            'timestamp': (record.get('timestamp') or '').strip() or imported_at,
+            'status': 'new',
+            'source': sanitized_body['source'],
+            'userAgent': sanitized_body['userAgent'],
+            'pageUrl': sanitized_body['pageUrl'],
+            'document_processing_enabled': True,
+            'search_capabilities': True,
+            'import_id': import_id,
+            'imported_at': imported_at
+        }
+
+    async def _writer(self, queue: asyncio.Queue, report: Dict[str, Any]):
+        while True:
+            items = await queue.get()
+            if items is None:
+                return
+            written, retries = await asyncio.to_thread(self._write_batch, items)
+            report['written'] += len(written)
+            report['failed'] += len(items) - len(written)
+            report['retries'] += retries
+            if written:
+                try:
+                    await asyncio.to_thread(self.database_service.record_imported_contacts, written)
+                except Exception as e:
+                    # The contacts are stored; reconciliation corrects the aggregates
+                    logger.error(f"Error recording imported contact metrics: {str(e)}")
+
+    def _write_batch(self, items: List[Dict[str, Any]]) -> tuple:
+        """BatchWriteItem with exponential backoff on unprocessed items and throttling; returns (written items, retries)"""
+        requests = [{'PutRequest': {'Item': {key: self._serializer.serialize(value) for key, value in item.items()}}}
+                    for item in items]
+        retries = 0
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                retries += 1
+                time.sleep(min(0.05 * (2 ** attempt), 5.0) * random.uniform(0.5, 1.0))
+            try:
+                response = self.client.batch_write_item(RequestItems={self.table_name: requests})
+            except ClientError as e:
+                if e.response['Error']['Code'] in THROTTLE_ERRORS:
+                    continue
+                logger.error(f"Error writing import batch: {str(e)}")
+                break
+            except BotoCoreError as e:
+                # Connection errors and read timeouts are usually transient; back off like a throttle
+                logger.warning(f"Error writing import batch, retrying: {str(e)}")
+                continue
+            except Exception as e:
+                # Count the batch as failed rather than killing the writer
+                logger.error(f"Error writing import batch: {str(e)}")
+                break
+            requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not requests:
+                return items, retries
+        logger.warning(f"Gave up on {len(requests)} contacts after {retries} retries")
+        failed_ids = {request['PutRequest']['Item']['id']['S'] for request in requests}
+        return [item for item in items if item['id'] not in failed_ids], retries
@@ -1,22 +1,29 @@
 # Unified Enhanced FastAPI Application - Document Management & Contact Intelligence System
 # Consolidates functionality from enhanced_app.py, lambda_function.py, and enhanced_index.py
-from fastapi import FastAPI, Request, Response, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Request, Response, HTTPException, UploadFile, File, Form, BackgroundTasks, Query
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
 import os
+import asyncio
+import hashlib
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Any, Awaitable, Callable
 
 # Import unified components
 from shared.aws_clients import AWSClientManager
+from shared.health_monitor import HealthMonitor
+from shared.idempotency import IdempotencyStore, IdempotencyConflict
 from components.contact_processor import ContactProcessor
 from components.document_processor import DocumentProcessor
 from components.background_tasks import BackgroundTaskProcessor
+from components.export_processor import ExportProcessor
+from components.import_processor import ImportProcessor
 
 # Import unified models
 from models.contact import ContactForm, ContactResponse
-from models.document import DocumentUpload, DocumentResponse, SearchRequest, SearchResponse
+from models.document import DocumentUpload, DocumentResponse, SearchRequest, SearchResponse, SuggestResponse
 from models.response import HealthResponse, AnalyticsResponse, StatsResponse, ErrorResponse
 
 # Configure logging
@@ -38,19 +45,24 @@ app.add_middleware(
     allow_origins=[os.environ.get('ALLOWED_ORIGIN', '*')],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key", "X-Amz-Security-Token"],
+    allow_headers=["Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key", "X-Amz-Security-Token", "Idempotency-Key", "If-None-Match"],
+    expose_headers=["Idempotent-Replayed", "ETag"],
 )
 
 # Global components
 aws_clients = None
 contact_processor = None
 document_processor = None
+export_processor = None
+import_processor = None
 background_processor = None
+health_monitor = None
+idempotency_store = None
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
-    global aws_clients, contact_processor, document_processor, background_processor
+    global aws_clients, contact_processor, document_processor, export_processor, import_processor, background_processor, health_monitor, idempotency_store
     
     logger.info("Starting Unified Document Management & Contact Intelligence API...")
     logger.info(f"AWS Region: {os.environ.get('AWS_REGION', 'ap-southeast-1')}")
@@ -60,12 +72,35 @@ async def startup_event():
     
     # Initialize components
     contact_processor = ContactProcessor(aws_clients)
-    document_processor = DocumentProcessor(aws_clients)
+    document_processor = DocumentProcessor(aws_clients, contact_processor.email_outbox)
+    export_processor = ExportProcessor(document_processor.database_service)
+    import_processor = ImportProcessor(contact_processor.database_service)
     background_processor = BackgroundTaskProcessor(aws_clients, document_processor)
+    health_monitor = HealthMonitor(aws_clients)
+    idempotency_store = IdempotencyStore(aws_clients)
     
     # Start background processor
     await background_processor.start()
     
+    # Record contact metrics off the request path
+    await background_processor.add_task(contact_processor.outbox.run)
+    
+    # Drain the durable email outbox at the SES send rate (one sender serves both processors' queued mail)
+    if contact_processor.email_outbox.enabled:
+        await background_processor.add_task(contact_processor.email_outbox.run)
+    
+    # Send processing notification digests whose window has closed (open digests are kept in the email outbox table)
+    await background_processor.add_task(document_processor.notification_digest.run)
+    
+    # Probe dependencies in the background; health endpoints serve the cached results
+    await background_processor.add_task(health_monitor.run)
+    
+    # Build the local fallback search index on first boot and load typeahead
+    await background_processor.add_task(document_processor.ensure_search_index)
+    
+    # Map the vector index and partition it if the corpus has grown
+    await background_processor.add_task(document_processor.build_vector_partitions)
+    
     logger.info("Application startup complete!")
 
 @app.on_event("shutdown")
@@ -75,17 +110,70 @@ async def shutdown_event():
     
     logger.info("Shutting down Unified Document Management API...")
     
+    # Let queued contact metrics land before the workers are cancelled
+    if contact_processor:
+        await contact_processor.outbox.stop()
+    
     if background_processor:
         await background_processor.stop()
     
+    # Write out buffered rollups and sketches
+    for processor in (contact_processor, document_processor):
+        if processor:
+            processor.database_service.close()
+    
+    if aws_clients:
+        await aws_clients.close()
+    
     logger.info("Application shutdown complete!")
 
+def visitor_key(request: Request) -> str:
+    """Anonymous visitor identity for distinct-visitor counting (client address + user agent, hashed)"""
+    forwarded_for = request.headers.get('x-forwarded-for', '')
+    client_address = forwarded_for.split(',')[0].strip() or (request.client.host if request.client else '')
+    return hashlib.sha256(f"{client_address}|{request.headers.get('user-agent', '')}".encode('utf-8')).hexdigest()
+
+async def run_idempotent(request: Request, scope: str, fingerprint: Any, operation: Callable[[], Awaitable[Any]]) -> Any:
+    """Execute once per Idempotency-Key; duplicates within the TTL get the stored response"""
+    key = request.headers.get('idempotency-key')
+    if key is None:
+        return await operation()
+    
+    request_hash = IdempotencyStore.fingerprint(fingerprint)
+    replay = await asyncio.to_thread(idempotency_store.begin, scope, key, request_hash)
+    if replay is not None:
+        return JSONResponse(status_code=replay['status_code'], content=replay['body'], headers={'Idempotent-Replayed': 'true'})
+    
+    try:
+        result = await operation()
+    except BaseException:
+        await asyncio.to_thread(idempotency_store.release, scope, key)
+        raise
+    await asyncio.to_thread(idempotency_store.complete, scope, key, 200, jsonable_encoder(result))
+    return result
+
+async def upload_fingerprint(file: UploadFile, **fields) -> dict:
+    """Request fingerprint for uploads: form fields plus a hash of the file content"""
+    digest = hashlib.sha256()
+    while True:
+        chunk = await file.read(1024 * 1024)
+        if not chunk:
+            break
+        digest.update(chunk)
+    await file.seek(0)
+    return dict(fields, filename=file.filename, content_sha256=digest.hexdigest())
+
 # Contact Form Endpoints
 @app.post("/contact", response_model=ContactResponse)
-async def submit_contact(contact_form: ContactForm):
+async def submit_contact(contact_form: ContactForm, request: Request):
     """Submit contact form with document processing capabilities"""
     try:
-        return await contact_processor.process_enhanced_contact(contact_form)
+        return await run_idempotent(
+            request, '/contact', contact_form.dict(),
+            lambda: contact_processor.process_enhanced_contact(contact_form, visitor_key(request))
+        )
+    except IdempotencyConflict as ic:
+        raise HTTPException(status_code=ic.status_code, detail=str(ic))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -99,10 +187,15 @@ async def submit_contact(contact_form: ContactForm):
         )
 
 @app.post("/contact/basic", response_model=ContactResponse)
-async def submit_basic_contact(contact_form: ContactForm):
+async def submit_basic_contact(contact_form: ContactForm, request: Request):
     """Submit basic contact form (from lambda_function.py)"""
     try:
-        return await contact_processor.process_contact(contact_form)
+        return await run_idempotent(
+            request, '/contact/basic', contact_form.dict(),
+            lambda: contact_processor.process_contact(contact_form, visitor_key(request))
+        )
+    except IdempotencyConflict as ic:
+        raise HTTPException(status_code=ic.status_code, detail=str(ic))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -118,6 +211,7 @@ async def submit_basic_contact(contact_form: ContactForm):
 # Document Endpoints
 @app.post("/documents/upload", response_model=DocumentResponse)
 async def upload_document(
+    request: Request,
     file: UploadFile = File(...),
     contact_id: str = Form(...),
     document_type: str = Form(...),
@@ -126,7 +220,16 @@ async def upload_document(
 ):
     """Upload and process documents with contact association"""
     try:
-        return await document_processor.upload_document(file, contact_id, document_type, description, tags)
+        fingerprint = None
+        if 'idempotency-key' in request.headers:
+            fingerprint = await upload_fingerprint(file, contact_id=contact_id, document_type=document_type,
+                                                   description=description, tags=tags)
+        return await run_idempotent(
+            request, '/documents/upload', fingerprint,
+            lambda: document_processor.upload_document(file, contact_id, document_type, description, tags)
+        )
+    except IdempotencyConflict as ic:
+        raise HTTPException(status_code=ic.status_code, detail=str(ic))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -141,9 +244,13 @@ async def upload_document(
 
 @app.post("/documents/search", response_model=SearchResponse)
 async def search_documents(search_request: SearchRequest):
-    """Search documents with advanced filtering"""
+    """Search documents with advanced filtering and cursor pagination"""
     try:
         return await document_processor.search_documents(search_request)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except TimeoutError as te:
+        raise HTTPException(status_code=504, detail=str(te))
     except Exception as e:
         logger.error(f"Error searching documents: {str(e)}")
         raise HTTPException(
@@ -154,11 +261,88 @@ async def search_documents(search_request: SearchRequest):
             }
         )
 
+@app.get("/documents/suggest", response_model=SuggestResponse)
+async def suggest_documents(q: str, limit: int = 10):
+    """Typeahead completions for filenames, keywords and tags"""
+    try:
+        return document_processor.suggest(q, min(max(limit, 1), 50))
+    except Exception as e:
+        logger.error(f"Error getting suggestions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'error': 'Suggest Error',
+                'message': 'Failed to get suggestions.'
+            }
+        )
+
+@app.get("/documents/{document_id}/near-duplicates")
+async def get_near_duplicates(document_id: str):
+    """Get near-duplicate documents detected by MinHash/LSH"""
+    try:
+        result = await document_processor.get_near_duplicates(document_id)
+    except Exception as e:
+        logger.error(f"Error getting near-duplicates: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'error': 'Retrieval Error',
+                'message': 'Failed to retrieve near-duplicate documents.'
+            }
+        )
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No near-duplicate signature for document {document_id}")
+    return result
+
+@app.get("/documents/{document_id}/similar")
+async def get_similar_documents(document_id: str, limit: int = 10):
+    """Get documents similar to a document from the local vector index"""
+    limit = max(1, min(limit, 100))
+    try:
+        result = await document_processor.find_similar_documents(document_id, limit)
+    except Exception as e:
+        logger.error(f"Error finding similar documents: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'error': 'Similarity Error',
+                'message': 'Failed to find similar documents.'
+            }
+        )
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} is not in the vector index")
+    return result
+
+@app.get("/contacts/lookup")
+async def lookup_contact(email: str):
+    """Find the most recent contact for an email address (case-insensitive)"""
+    try:
+        contact = await contact_processor.lookup_contact(email)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Error looking up contact: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'error': 'Lookup Error',
+                'message': 'Failed to look up contact.'
+            }
+        )
+    if contact is None:
+        raise HTTPException(status_code=404, detail="No contact found for this email")
+    return contact
+
 @app.get("/contacts/{contact_id}/documents")
-async def get_contact_documents(contact_id: str):
-    """Get all documents for a specific contact"""
+async def get_contact_documents(contact_id: str, request: Request, limit: Optional[int] = Query(None, ge=1, le=1000),
+                                cursor: Optional[str] = None):
+    """Get a page of documents for a specific contact; supports If-None-Match"""
     try:
-        return await contact_processor.get_contact_documents(contact_id)
+        page, etag = await contact_processor.get_contact_documents(
+            contact_id, limit, cursor, request.headers.get('if-none-match')
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         logger.error(f"Error getting contact documents: {str(e)}")
         raise HTTPException(
@@ -168,13 +352,19 @@ async def get_contact_documents(contact_id: str):
                 'message': 'Failed to retrieve contact documents.'
             }
         )
+    
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if page is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(page), headers=headers)
 
 # Analytics Endpoints
 @app.get("/analytics/insights", response_model=AnalyticsResponse)
-async def get_analytics():
+async def get_analytics(response: Response):
     """Get system analytics and insights"""
     try:
-        analytics_data = await document_processor.get_analytics()
+        analytics_data, age = await document_processor.get_analytics()
+        response.headers.update(document_processor.analytics_cache.cache_control(age))
         return AnalyticsResponse(**analytics_data)
     except Exception as e:
         logger.error(f"Error getting analytics: {str(e)}")
@@ -186,42 +376,70 @@ async def get_analytics():
             }
         )
 
+@app.get("/analytics/timeseries")
+async def get_analytics_timeseries(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    granularity: str = "hour"
+):
+    """Get upload, contact and processing-latency trends per minute, hour or day"""
+    try:
+        return await document_processor.get_timeseries(from_, to, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting analytics timeseries: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'error': 'Analytics Error',
+                'message': 'Failed to retrieve analytics timeseries.'
+            }
+        )
+
 @app.get("/stats", response_model=StatsResponse)
-async def get_stats():
+async def get_stats(response: Response):
     """Get visitor statistics (legacy endpoint)"""
     try:
-        stats_data = await contact_processor.get_stats()
+        stats_data, age = await contact_processor.get_stats()
+        response.headers.update(contact_processor.stats_cache.cache_control(age))
         return StatsResponse(**stats_data)
     except Exception as e:
         logger.error(f"Error getting stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Unable to retrieve statistics")
 
 # Health Check Endpoint
+@app.get("/livez")
+def liveness_check():
+    """Liveness probe - the process is up and serving requests (no I/O)"""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat() + 'Z'}
+
+@app.get("/readyz")
+def readiness_check():
+    """Readiness probe built from cached dependency probes"""
+    readiness = health_monitor.readiness() if health_monitor else {'ready': False, 'reason': 'starting'}
+    readiness['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+    return JSONResponse(status_code=200 if readiness['ready'] else 503, content=readiness)
+
 @app.get("/health", response_model=HealthResponse)
-def health_check():
-    """Comprehensive health check with document processing status"""
+async def health_check():
+    """Comprehensive health check with document processing status (served from cached probes)"""
     try:
-        # Check AWS services connectivity
-        region = os.environ.get('AWS_REGION', 'ap-southeast-1')
-        
-        # Test AWS connectivity
-        services = aws_clients.test_aws_connectivity()
+        readiness = health_monitor.readiness()
         
-        # Get document statistics
-        documents_table = os.environ.get('DOCUMENTS_TABLE', 'realistic-demo-pretamane-documents')
-        doc_table = aws_clients.get_dynamo_table(documents_table)
-        doc_response = doc_table.scan(Select='COUNT')
+        # Document count comes from the cached aggregates, not a table scan
+        analytics_data, _ = await document_processor.get_analytics()
         
         # Get background processor status
         background_status = background_processor.get_status() if background_processor else {'running': False}
         
         return HealthResponse(
-            status="healthy",
+            status="healthy" if readiness['ready'] else "degraded",
             timestamp=datetime.utcnow().isoformat() + 'Z',
-            services=services,
+            services=health_monitor.services(),
             version="3.0.0",
             document_stats={
-                "total_documents": doc_response['Count'],
+                "total_documents": analytics_data['total_documents'],
                 "upload_directory": "/mnt/efs/uploads",
                 "processed_directory": "/mnt/efs/processed",
                 "max_file_size_mb": 50,
@@ -262,10 +480,17 @@ def read_root():
             "contact_basic": "/contact/basic",
             "document_upload": "/documents/upload",
             "document_search": "/documents/search",
+            "document_suggest": "/documents/suggest",
+            "document_near_duplicates": "/documents/{document_id}/near-duplicates",
+            "document_similar": "/documents/{document_id}/similar",
+            "contact_lookup": "/contacts/lookup?email=",
             "contact_documents": "/contacts/{contact_id}/documents",
             "analytics": "/analytics/insights",
+            "analytics_timeseries": "/analytics/timeseries",
             "stats": "/stats",
             "health": "/health",
+            "liveness": "/livez",
+            "readiness": "/readyz",
             "docs": "/docs"
         },
         "architecture": {
@@ -292,7 +517,7 @@ async def contact_options():
         headers={
             "Access-Control-Allow-Origin": os.environ.get('ALLOWED_ORIGIN', '*'),
             "Access-Control-Allow-Methods": "POST, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, X-Amz-Date, Authorization, X-Api-Key, X-Amz-Security-Token",
+            "Access-Control-Allow-Headers": "Content-Type, X-Amz-Date, Authorization, X-Api-Key, X-Amz-Security-Token, Idempotency-Key",
             "Access-Control-Allow-Credentials": "true"
         }
     )
@@ -312,6 +537,104 @@ async def process_s3_event_background(
         logger.error(f"Error queuing S3 event processing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Local search index rebuild endpoint
+@app.post("/admin/search-index/rebuild")
+async def rebuild_search_index(background_tasks: BackgroundTasks):
+    """Rebuild the local fallback search index from DynamoDB (admin endpoint)"""
+    try:
+        background_tasks.add_task(document_processor.database_service.rebuild_local_search_index)
+        return {"message": "Local search index rebuild queued"}
+    except Exception as e:
+        logger.error(f"Error queuing search index rebuild: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Analytics aggregates reconciliation endpoint
+@app.post("/admin/analytics/reconcile")
+async def reconcile_analytics(background_tasks: BackgroundTasks):
+    """Recount contacts and documents and correct the analytics aggregates (admin endpoint)"""
+    try:
+        background_tasks.add_task(document_processor.database_service.reconcile_analytics_aggregates)
+        return {"message": "Analytics reconciliation queued"}
+    except Exception as e:
+        logger.error(f"Error queuing analytics reconciliation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Contact email index backfill endpoint
+@app.post("/admin/contacts/backfill-email-index")
+async def backfill_contact_email_index(background_tasks: BackgroundTasks):
+    """Add email_normalized to contacts written before the contact-email-index existed (admin endpoint)"""
+    try:
+        background_tasks.add_task(contact_processor.database_service.backfill_email_normalized)
+        return {"message": "Contact email index backfill queued"}
+    except Exception as e:
+        logger.error(f"Error queuing contact email index backfill: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Near-duplicate band index backfill endpoint
+@app.post("/admin/near-duplicates/backfill")
+async def backfill_near_duplicate_index(background_tasks: BackgroundTasks):
+    """Add stored MinHash signatures to the shared near-duplicate band index (admin endpoint)"""
+    try:
+        background_tasks.add_task(document_processor.backfill_near_duplicate_index)
+        return {"message": "Near-duplicate index backfill queued"}
+    except Exception as e:
+        logger.error(f"Error queuing near-duplicate index backfill: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Bulk export endpoint
+@app.get("/admin/export/{table}")
+async def export_table(table: str, format: str = "ndjson", compression: str = "none", fields: Optional[str] = None):
+    """Stream a full table export as NDJSON or Parquet (admin endpoint)"""
+    try:
+        field_list = export_processor.validate(table, format, compression, fields)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        export_processor.export(table, format, compression, field_list),
+        media_type=export_processor.content_type(format, compression),
+        headers={'Content-Disposition': f'attachment; filename="{export_processor.filename(table, format, compression)}"'}
+    )
+
+# Bulk contact import endpoint
+@app.post("/admin/contacts/import")
+async def import_contacts(request: Request, format: Optional[str] = None, source: str = "import"):
+    """Stream NDJSON or CSV contacts into the contacts table without per-contact emails (admin endpoint)"""
+    try:
+        import_format = import_processor.resolve_format(format, request.headers.get('content-type'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # The body is consumed as it arrives; progress is logged and listed under /admin/metrics
+    summary = await import_processor.import_contacts(request.stream(), import_format, source)
+    return JSONResponse(status_code=200 if summary['status'] == 'completed' else 500, content=summary)
+
+# Cache and search metrics endpoint
+@app.get("/admin/metrics")
+async def get_metrics():
+    """Get cache, search and index metrics (admin endpoint)"""
+    try:
+        return {
+            "analytics_cache": document_processor.analytics_cache.get_stats(),
+            "stats_cache": contact_processor.stats_cache.get_stats(),
+            "contact_outbox": contact_processor.outbox.get_stats(),
+            "email_outbox": contact_processor.email_outbox.get_stats(),
+            "notification_digest": document_processor.notification_digest.get_stats(),
+            "idempotency": idempotency_store.get_stats(),
+            "contact_imports": import_processor.get_stats(),
+            "contact_email_cache": document_processor.contact_email_cache.get_stats(),
+            "facet_cache": document_processor.facet_cache.get_stats(),
+            "search_executor": document_processor.search_executor.get_status(),
+            "vector_index": document_processor.vector_index.get_stats(),
+            "health_probes": health_monitor.get_status(),
+            "timestamp": datetime.utcnow().isoformat() + 'Z'
+        }
+    except Exception as e:
+        logger.error(f"Error getting metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Background processor status endpoint
 @app.get("/admin/background-status")
 async def get_background_status():
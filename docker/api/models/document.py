@@ -25,14 +25,27 @@ class SearchRequest(BaseModel):
     """Search request model (from enhanced_app.py)"""
     query: str = Field(..., min_length=1, description="Search query")
     filters: Optional[Dict[str, Any]] = Field(default={}, description="Search filters")
-    limit: Optional[int] = Field(default=10, ge=1, le=100, description="Number of results")
+    limit: Optional[int] = Field(default=10, ge=1, le=100, description="Number of results per page")
+    cursor: Optional[str] = Field(None, description="Opaque cursor returned by the previous page")
+    include_facets: Optional[bool] = Field(default=False, description="Return facet counts with the first page")
+    facet_size: Optional[int] = Field(default=10, ge=1, le=50, description="Buckets per terms facet")
 
 class SearchResponse(BaseModel):
     """Search response model (from enhanced_app.py)"""
     results: List[Dict[str, Any]]
     total_count: int
+    total_count_exact: bool = Field(True, description="False when total_count is a lower bound (DynamoDB scan fallback counts only the returned page)")
     query: str
     processing_time: float
+    next_cursor: Optional[str] = None
+    engine: Optional[str] = Field(None, description="Engine that served the results (opensearch, local, dynamodb)")
+    facets: Optional[Dict[str, Any]] = None
+
+class SuggestResponse(BaseModel):
+    """Typeahead suggestion response model"""
+    query: str
+    suggestions: List[Dict[str, Any]]
+    processing_time: float
 
 class DocumentRecord(BaseModel):
     """Document record model for database operations"""
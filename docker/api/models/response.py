@@ -17,6 +17,7 @@ class AnalyticsResponse(BaseModel):
     total_documents: int
     document_types: Dict[str, int]
     processing_stats: Dict[str, Any]
+    cardinality: Optional[Dict[str, Any]] = None
     timestamp: str
 
 class StatsResponse(BaseModel):
@@ -3,6 +3,7 @@ import boto3
 import os
 import logging
 from typing import Optional
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
@@ -13,9 +14,13 @@ class AWSClientManager:
     def __init__(self):
         self.region = os.environ.get('AWS_REGION', 'ap-southeast-1')
         self._dynamodb = None
+        self._dynamodb_client = None
         self._s3_client = None
         self._ses_client = None
         self._opensearch_client = None
+        self._async_opensearch_client = None
+        self._async_opensearch_search_client = None
+        self._tables = {}
         
     @property
     def dynamodb(self):
@@ -24,6 +29,17 @@ class AWSClientManager:
             self._dynamodb = boto3.resource('dynamodb', region_name=self.region)
         return self._dynamodb
     
+    @property
+    def dynamodb_client(self):
+        """Lazy initialization of the low-level DynamoDB client (wire-format items, thread-safe)"""
+        if self._dynamodb_client is None:
+            self._dynamodb_client = boto3.client(
+                'dynamodb',
+                region_name=self.region,
+                config=Config(max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', '50')))
+            )
+        return self._dynamodb_client
+    
     @property
     def s3_client(self):
         """Lazy initialization of S3 client"""
@@ -46,7 +62,7 @@ class AWSClientManager:
                 self._opensearch_client = OpenSearch(
                     hosts=[os.environ['OPENSEARCH_ENDPOINT']],
                     http_auth=(os.environ['OPENSEARCH_USERNAME'], os.environ['OPENSEARCH_PASSWORD']),
-                    use_ssl=True,
+                    use_ssl=os.environ.get('OPENSEARCH_USE_SSL', 'true').lower() == 'true',
                     verify_certs=True,
                     ssl_assert_hostname=False,
                     ssl_show_warn=False,
@@ -62,11 +78,66 @@ class AWSClientManager:
                 return None
         return self._opensearch_client
     
+    def get_async_opensearch_client(self):
+        """Get pooled async OpenSearch client for use from async routes"""
+        if self._async_opensearch_client is None:
+            self._async_opensearch_client = self._create_async_opensearch_client(max_retries=3)
+        return self._async_opensearch_client
+    
+    def get_async_opensearch_search_client(self):
+        """Async OpenSearch client for the search path: no transport retries, since the search executor
+        bounds each query with its own deadline and hedges slow ones with the local index"""
+        if self._async_opensearch_search_client is None:
+            self._async_opensearch_search_client = self._create_async_opensearch_client(max_retries=0)
+        return self._async_opensearch_search_client
+    
+    def _create_async_opensearch_client(self, max_retries: int):
+        try:
+            from opensearchpy import AsyncOpenSearch, AsyncHttpConnection
+            return AsyncOpenSearch(
+                hosts=[os.environ['OPENSEARCH_ENDPOINT']],
+                http_auth=(os.environ['OPENSEARCH_USERNAME'], os.environ['OPENSEARCH_PASSWORD']),
+                use_ssl=os.environ.get('OPENSEARCH_USE_SSL', 'true').lower() == 'true',
+                verify_certs=True,
+                ssl_assert_hostname=False,
+                ssl_show_warn=False,
+                connection_class=AsyncHttpConnection,
+                # Connection reuse - one pool per client per worker process
+                maxsize=int(os.environ.get('OPENSEARCH_POOL_MAXSIZE', '25')),
+                # Gzip request bodies (bulk documents are large)
+                http_compress=True,
+                # Managed domain sits behind a single endpoint - never sniff node addresses
+                sniff_on_start=False,
+                sniff_on_connection_fail=False,
+                sniffer_timeout=None,
+                timeout=30,
+                max_retries=max_retries,
+                retry_on_timeout=max_retries > 0
+            )
+        except ImportError:
+            logger.warning("Async OpenSearch client not available - opensearch-py[async] not installed")
+            return None
+        except KeyError as e:
+            logger.warning(f"OpenSearch configuration missing: {e}")
+            return None
+    
+    async def close(self):
+        """Release pooled connections held by async clients"""
+        for name in ('_async_opensearch_client', '_async_opensearch_search_client'):
+            client = getattr(self, name)
+            if client is not None:
+                await client.close()
+                setattr(self, name, None)
+    
     def get_dynamo_table(self, table_name: str):
-        """Get DynamoDB table with error handling"""
+        """Get DynamoDB table with error handling; the table is described once, then the handle is reused"""
+        table = self._tables.get(table_name)
+        if table is not None:
+            return table
         try:
             table = self.dynamodb.Table(table_name)
             table.load()
+            self._tables[table_name] = table
             return table
         except ClientError as e:
             logger.error(f"Error accessing DynamoDB table {table_name}: {str(e)}")
@@ -0,0 +1,141 @@
+# Cache utilities - In-process caches shared across components
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Optional, Dict, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache size and hit ratio"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class StaleWhileRevalidateCache:
+    """Single-value async cache: serves stale data past the soft TTL while one background refresh runs"""
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], soft_ttl_seconds: float = 5.0, hard_ttl_seconds: float = 60.0):
+        self.loader = loader
+        self.soft_ttl_seconds = soft_ttl_seconds
+        self.hard_ttl_seconds = max(hard_ttl_seconds, soft_ttl_seconds)
+        self._value: Any = None
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_latencies = deque(maxlen=100)
+        self.stats = {'fresh_hits': 0, 'stale_hits': 0, 'sync_loads': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def age(self) -> Optional[float]:
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    async def get(self) -> Tuple[Any, float]:
+        """Return (value, age in seconds), loading synchronously only when missing or past the hard TTL"""
+        age = self.age()
+        if age is None or age >= self.hard_ttl_seconds:
+            self.stats['sync_loads'] += 1
+            # Concurrent callers share one in-flight load
+            await asyncio.shield(self._start_refresh())
+            return self._value, self.age()
+
+        if age >= self.soft_ttl_seconds:
+            self.stats['stale_hits'] += 1
+            self._start_refresh()
+        else:
+            self.stats['fresh_hits'] += 1
+        return self._value, age
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(self._refresh_done)
+        return self._refresh_task
+
+    async def _refresh(self):
+        start_time = time.monotonic()
+        value = await self.loader()
+        self._value, self._loaded_at = value, time.monotonic()
+        self._refresh_latencies.append(self._loaded_at - start_time)
+        self.stats['refreshes'] += 1
+
+    def _refresh_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['refresh_errors'] += 1
+            logger.error(f"Cache refresh failed: {str(task.exception())}")
+
+    def invalidate(self):
+        """Force the next get() to load synchronously"""
+        self._loaded_at = None
+
+    def cache_control(self, age: float) -> Dict[str, str]:
+        """Cache-Control and Age headers for a value of the given age"""
+        max_age = max(0, int(self.soft_ttl_seconds - age))
+        stale_window = int(self.hard_ttl_seconds - self.soft_ttl_seconds)
+        return {
+            'Cache-Control': f"public, max-age={max_age}, stale-while-revalidate={stale_window}",
+            'Age': str(int(age))
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit counters, refresh latency and current staleness"""
+        latencies = sorted(self._refresh_latencies)
+        age = self.age()
+        return {
+            **self.stats,
+            'soft_ttl_seconds': self.soft_ttl_seconds,
+            'hard_ttl_seconds': self.hard_ttl_seconds,
+            'age_seconds': None if age is None else round(age, 3),
+            'refresh_latency_last_seconds': round(self._refresh_latencies[-1], 4) if latencies else 0.0,
+            'refresh_latency_p95_seconds': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4) if latencies else 0.0
+        }
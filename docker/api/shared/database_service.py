@@ -1,12 +1,43 @@
 # Database Service - Unified database operations
 import os
 import logging
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, AsyncIterator, Tuple
+from datetime import datetime, timedelta
+from decimal import Decimal
 from botocore.exceptions import ClientError
 
+from shared.local_search import LocalSearchIndex
+from shared.scan_engine import ParallelScanner
+from shared.rollups import RollupRecorder
+from shared.sketches import SketchStore
+from shared.sharded_counter import ShardedCounter
+from shared.cache import TTLCache
+from shared.lease import Lease
+
 logger = logging.getLogger(__name__)
 
+# Single item in the analytics table holding the running counters behind /analytics/insights
+ANALYTICS_AGGREGATE_ID = 'aggregates'
+AGGREGATES_METADATA = ('id', 'reconciled_at')
+DOCUMENT_TYPE_PREFIX = 'document_type#'
+PROCESSING_STATUS_PREFIX = 'processing_status#'
+# Per-contact version stamp bumped whenever a listed document of that contact changes
+CONTACT_DOCUMENTS_VERSION_PREFIX = 'contact_documents_version#'
+# Attributes read for document listings (processing_metadata and other large fields are left out)
+CONTACT_DOCUMENT_FIELDS = ('id', 'filename', 'document_type', 'description', 'tags', 'upload_timestamp', 'processing_status', 'size')
+# Contact attributes projected into the contact-email index and returned by lookups
+CONTACT_LOOKUP_FIELDS = ('id', 'name', 'email', 'company', 'service', 'status', 'source', 'timestamp', 'submission_count')
+# Document processing state machine: target status -> statuses it may be entered from
+DOCUMENT_TRANSITIONS = {
+    'processing': ('pending', 'failed'),
+    'completed': ('processing',),
+    'failed': ('pending', 'processing')
+}
+# Attributes the processor needs from a document record before it claims it
+DOCUMENT_PROCESSING_FIELDS = ('id', 'contact_id', 'filename', 'document_type', 'tags', 'upload_timestamp', 'processing_status', 'version', 's3_key')
+# Attributes stored in the local search index (plus processing_metadata.keywords)
+LOCAL_SEARCH_FIELDS = CONTACT_DOCUMENT_FIELDS + ('contact_id',)
+
 class DatabaseService:
     """Unified database service for all components"""
     
@@ -15,6 +46,27 @@ class DatabaseService:
         self.contacts_table_name = os.environ.get('CONTACTS_TABLE', 'realistic-demo-pretamane-contact-submissions')
         self.visitors_table_name = os.environ.get('VISITORS_TABLE', 'realistic-demo-pretamane-website-visitors')
         self.documents_table_name = os.environ.get('DOCUMENTS_TABLE', 'realistic-demo-pretamane-documents')
+        self.analytics_table_name = os.environ.get('ANALYTICS_TABLE', 'realistic-demo-pretamane-analytics')
+        self.local_search = LocalSearchIndex()
+        self.local_search_sync_overlap_seconds = int(os.environ.get('LOCAL_SEARCH_SYNC_OVERLAP_SECONDS', '120'))
+        self.scanner = ParallelScanner(aws_clients.dynamodb_client)
+        self.rollups = RollupRecorder(aws_clients, self.analytics_table_name)
+        self.sketches = SketchStore(aws_clients, self.analytics_table_name)
+        self.visitor_counter = ShardedCounter(aws_clients, self.visitors_table_name, 'visitor_count', 'VISITOR_COUNTER')
+        # Only one process in the fleet recounts the aggregates at a time
+        self.reconcile_lease = Lease(aws_clients, self.analytics_table_name, 'analytics-reconcile',
+                                     float(os.environ.get('ANALYTICS_RECONCILE_LEASE_SECONDS', '900')))
+        self.contact_lookup_cache = TTLCache(
+            max_entries=int(os.environ.get('CONTACT_LOOKUP_CACHE_MAX_ENTRIES', '10000')),
+            ttl_seconds=float(os.environ.get('CONTACT_LOOKUP_CACHE_TTL_SECONDS', '300'))
+        )
+        # A document left in 'processing' longer than this may be claimed by another processor
+        self.processing_lease_seconds = int(os.environ.get('DOCUMENT_PROCESSING_LEASE_SECONDS', '900'))
+    
+    @staticmethod
+    def normalize_email(email: Optional[str]) -> str:
+        """Lowercased, trimmed email used as the contact-email index key"""
+        return (email or '').strip().lower()
     
     def get_contacts_table(self):
         """Get contacts table"""
@@ -28,113 +80,360 @@ class DatabaseService:
         """Get documents table"""
         return self.aws_clients.get_dynamo_table(self.documents_table_name)
     
-    def create_contact_record(self, contact_data: Dict[str, Any]) -> str:
+    def close(self):
+        """Flush buffered rollups and sketches"""
+        self.rollups.stop()
+        self.sketches.stop()
+        self.visitor_counter.stop()
+    
+    def get_analytics_table(self):
+        """Get analytics aggregates table"""
+        return self.aws_clients.get_dynamo_table(self.analytics_table_name)
+    
+    def create_contact_record(self, contact_data: Dict[str, Any], record_metrics: bool = True) -> str:
         """Create contact record (from lambda_function.py and enhanced_app.py)"""
         try:
             contact_table = self.get_contacts_table()
+            contact_data.setdefault('email_normalized', self.normalize_email(contact_data.get('email')))
             contact_table.put_item(Item=contact_data)
             logger.info(f"Saved contact submission with ID: {contact_data['id']}")
+            
+            # The newest contact for an email is what lookups return
+            self.contact_lookup_cache.set(contact_data['email_normalized'],
+                                          {field: contact_data[field] for field in CONTACT_LOOKUP_FIELDS if field in contact_data})
+            
+            if record_metrics:
+                self.record_contact_metrics(contact_data)
             return contact_data['id']
         except ClientError as e:
             logger.error(f"Error creating contact record: {str(e)}")
             raise
     
-    def update_visitor_count(self) -> int:
-        """Update visitor counter (from lambda_function.py and enhanced_app.py)"""
+    def get_contact_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Most recent contact for an email via the contact-email index, cached (misses only briefly)"""
+        email_normalized = self.normalize_email(email)
+        cached = self.contact_lookup_cache.get(email_normalized)
+        if cached is not None:
+            return cached or None
+        
         try:
-            visitor_table = self.get_visitors_table()
-            visitor_response = visitor_table.update_item(
-                Key={'id': 'visitor_count'},
-                UpdateExpression='ADD #count :inc',
-                ExpressionAttributeNames={'#count': 'count'},
-                ExpressionAttributeValues={':inc': 1},
-                ReturnValues='UPDATED_NEW'
+            response = self.get_contacts_table().query(
+                IndexName='contact-email-index',
+                KeyConditionExpression='email_normalized = :email',
+                ExpressionAttributeValues={':email': email_normalized},
+                ScanIndexForward=False,
+                Limit=1
             )
-            visitor_count = int(visitor_response["Attributes"]["count"])
-            return visitor_count
         except ClientError as e:
-            logger.error(f"Error updating visitor count: {str(e)}")
-            return 0
+            logger.error(f"Error looking up contact by email: {str(e)}")
+            raise
+        
+        items = response.get('Items', [])
+        contact = {field: items[0][field] for field in CONTACT_LOOKUP_FIELDS if field in items[0]} if items else {}
+        self.contact_lookup_cache.set(email_normalized, contact, None if contact else 30)
+        return contact or None
     
-    def get_visitor_count(self) -> int:
-        """Get current visitor count"""
+    def merge_contact_submission(self, contact_id: str, contact_data: Dict[str, Any]) -> bool:
+        """Fold a repeat submission into an existing contact instead of inserting a new one"""
+        updates = {
+            'name': contact_data['name'],
+            'latest_message': contact_data['message'],
+            'latest_submission_at': contact_data['timestamp'],
+            'latest_source': contact_data.get('source'),
+            'latest_page_url': contact_data.get('pageUrl')
+        }
+        # Only overwrite profile fields the new submission actually provided
+        for field in ('company', 'service', 'budget'):
+            if contact_data.get(field) and contact_data[field] != 'Not specified':
+                updates[field] = contact_data[field]
+        
+        names = {f'#u{index}': field for index, field in enumerate(updates)}
+        values = {f':u{index}': value for index, value in enumerate(updates.values())}
+        values[':one'] = 1
+        try:
+            self.get_contacts_table().update_item(
+                Key={'id': contact_id},
+                # The original submission counts as the first one
+                UpdateExpression='SET ' + ', '.join(f'#u{index} = :u{index}' for index in range(len(updates))) +
+                                 ', submission_count = if_not_exists(submission_count, :one) + :one',
+                ConditionExpression='attribute_exists(id)',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+            logger.info(f"Merged submission into existing contact {contact_id}")
+            self.contact_lookup_cache.delete(self.normalize_email(contact_data.get('email')))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            logger.error(f"Error merging contact submission: {str(e)}")
+            raise
+    
+    def backfill_email_normalized(self) -> int:
+        """Add email_normalized to contacts written before the contact-email index existed"""
+        contact_table = self.get_contacts_table()
+        updated = 0
+        contacts = self.scanner.iter_scan(
+            self.contacts_table_name,
+            projection='id, email',
+            filter_expression='attribute_exists(email) AND attribute_not_exists(email_normalized)'
+        )
+        for contact in contacts:
+            contact_table.update_item(
+                Key={'id': contact['id']},
+                UpdateExpression='SET email_normalized = :email',
+                ExpressionAttributeValues={':email': self.normalize_email(contact['email'])}
+            )
+            updated += 1
+        # Lookups that missed before the backfill may now find a contact
+        self.contact_lookup_cache.clear()
+        logger.info(f"Backfilled email_normalized on {updated} contacts")
+        return updated
+    
+    def record_contact_metrics(self, contact_data: Dict[str, Any]):
+        """Count a stored contact in the aggregates, rollups and sketches"""
+        self._increment_aggregates({'total_contacts': 1})
+        self.rollups.record_contact(contact_data)
+        
+        email = (contact_data.get('email') or '').strip().lower()
+        self.sketches.add('unique_contacts', email)
+        self.sketches.add('email_domains', email.rpartition('@')[2])
+    
+    def record_imported_contacts(self, contacts: List[Dict[str, Any]]):
+        """Count a batch of imported contacts: one aggregates ADD plus sketches (imports are not activity rollups)"""
+        self._increment_aggregates({'total_contacts': len(contacts)})
+        for contact_data in contacts:
+            email = (contact_data.get('email') or '').strip().lower()
+            self.sketches.add('unique_contacts', email)
+            self.sketches.add('email_domains', email.rpartition('@')[2])
+    
+    def update_visitor_count(self, visitor_key: Optional[str] = None) -> int:
+        """Update visitor counter (from lambda_function.py and enhanced_app.py); sharded and write-behind"""
+        self.sketches.add('unique_visitors', visitor_key)
         try:
-            visitor_table = self.get_visitors_table()
-            response = visitor_table.get_item(Key={'id': 'visitor_count'})
-            return response.get('Item', {}).get('count', 0)
+            return self.visitor_counter.increment()
         except ClientError as e:
-            logger.error(f"Error getting visitor count: {str(e)}")
+            logger.error(f"Error updating visitor count: {str(e)}")
             return 0
     
+    def get_visitor_count(self) -> int:
+        """Get current visitor count (sum of counter shards, cached briefly)"""
+        return self.visitor_counter.get()
+    
     def create_document_record(self, document_data: Dict[str, Any]) -> str:
         """Create document record (from enhanced_app.py)"""
         try:
             document_table = self.get_documents_table()
             document_table.put_item(Item=document_data)
             logger.info(f"Saved document metadata: {document_data['id']}")
+            
+            self._increment_aggregates({
+                'total_documents': 1,
+                DOCUMENT_TYPE_PREFIX + document_data.get('document_type', 'unknown'): 1,
+                PROCESSING_STATUS_PREFIX + document_data.get('processing_status', 'pending'): 1
+            })
+            self.rollups.record_document_created(document_data)
+            self.sketches.add('uploading_contacts', document_data.get('contact_id'))
+            self._bump_contact_documents_version(document_data.get('contact_id'))
+            
+            # Keep the fallback search index in sync
+            self.local_search.upsert_document(document_data)
             return document_data['id']
         except ClientError as e:
             logger.error(f"Error creating document record: {str(e)}")
             raise
     
-    def update_document_status(self, document_id: str, status: str, metadata: Optional[Dict] = None) -> bool:
-        """Update document processing status (from enhanced_index.py)"""
+    def get_document_by_s3_key(self, s3_key: str) -> Optional[Dict[str, Any]]:
+        """Find the record for an uploaded object; the document ID is embedded in the key (documents/{contact_id}/{document_id}_{filename})"""
+        parts = s3_key.split('/')
+        if len(parts) < 3 or parts[0] != 'documents' or '_' not in parts[-1]:
+            return None
+        document_id = parts[-1].split('_', 1)[0]
         try:
-            document_table = self.get_documents_table()
-            
-            update_expression = "SET processing_status = :status, processing_timestamp = :timestamp"
-            expression_values = {
-                ':status': status,
-                ':timestamp': datetime.utcnow().isoformat() + 'Z'
-            }
-            
-            if metadata:
-                update_expression += ", processing_metadata = :metadata"
-                expression_values[':metadata'] = metadata
-            
-            document_table.update_item(
+            item = self.get_documents_table().get_item(
+                Key={'id': document_id},
+                ProjectionExpression=', '.join(f'#f{index}' for index in range(len(DOCUMENT_PROCESSING_FIELDS))),
+                ExpressionAttributeNames={f'#f{index}': field for index, field in enumerate(DOCUMENT_PROCESSING_FIELDS)},
+                ConsistentRead=True
+            ).get('Item')
+        except ClientError as e:
+            logger.error(f"Error getting document for S3 key {s3_key}: {str(e)}")
+            raise
+        return item if item and item.get('s3_key') == s3_key else None
+    
+    def transition_document(self, document_id: str, status: str, expected_version: Optional[int] = None,
+                            updates: Optional[Dict[str, Any]] = None, removes: Tuple[str, ...] = (),
+                            contact_id: Optional[str] = None, reclaim_before: Optional[str] = None) -> Optional[int]:
+        """Move a document to a new processing status in one conditional UpdateItem, together with any
+        other attribute changes; returns the new version, or None if the document's current status (or
+        version) does not allow the transition"""
+        sources = DOCUMENT_TRANSITIONS[status]
+        names = {'#status': 'processing_status', '#version': 'version'}
+        values = {':status': status, ':timestamp': datetime.utcnow().isoformat() + 'Z', ':zero': 0, ':one': 1}
+        assignments = ['#status = :status', 'processing_timestamp = :timestamp',
+                       '#version = if_not_exists(#version, :zero) + :one']
+        for index, (field, value) in enumerate((updates or {}).items()):
+            names[f'#u{index}'] = field
+            values[f':u{index}'] = value
+            assignments.append(f'#u{index} = :u{index}')
+        update_expression = 'SET ' + ', '.join(assignments)
+        if removes:
+            update_expression += ' REMOVE ' + ', '.join(removes)
+        
+        values.update({f':from{index}': source for index, source in enumerate(sources)})
+        condition = f"#status IN ({', '.join(f':from{index}' for index in range(len(sources)))})"
+        if reclaim_before:
+            # Also take over a claim whose processor stopped making progress
+            values.update({':claimed': status, ':reclaim_before': reclaim_before})
+            condition = f"({condition} OR (#status = :claimed AND processing_timestamp < :reclaim_before))"
+        if expected_version is not None:
+            values[':expected'] = expected_version
+            # Records written before versioning count as version 0
+            condition += (' AND (attribute_not_exists(#version) OR #version = :expected)' if expected_version == 0
+                          else ' AND #version = :expected')
+        
+        try:
+            response = self.get_documents_table().update_item(
                 Key={'id': document_id},
                 UpdateExpression=update_expression,
-                ExpressionAttributeValues=expression_values
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='UPDATED_OLD'
             )
-            
-            logger.info(f"Updated document {document_id} with status: {status}")
-            return True
         except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.warning(f"Document {document_id} cannot move to {status}: not {'/'.join(sources)}"
+                               f"{'' if expected_version is None else f' at version {expected_version}'}")
+                return None
             logger.error(f"Error updating document status: {str(e)}")
-            return False
+            return None
+        
+        previous = response.get('Attributes', {})
+        version = int(previous.get('version', 0)) + 1
+        logger.info(f"Document {document_id} moved to {status} (version {version})")
+        
+        self._record_status_change(previous.get('processing_status', status), status)
+        self._bump_contact_documents_version(contact_id)
+        self.local_search.update_document(document_id, status, ((updates or {}).get('processing_metadata') or {}).get('keywords'))
+        return version
+    
+    def start_document_processing(self, document_id: str, expected_version: Optional[int] = None,
+                                  contact_id: Optional[str] = None) -> Optional[int]:
+        """Claim a pending (or previously failed) document; None if another processor has it or it is done"""
+        reclaim_before = (datetime.utcnow() - timedelta(seconds=self.processing_lease_seconds)).isoformat() + 'Z'
+        return self.transition_document(document_id, 'processing', expected_version, contact_id=contact_id,
+                                        reclaim_before=reclaim_before)
+    
+    def complete_document_processing(self, document_id: str, version: int, complexity_score: float,
+                                     metadata: Dict[str, Any], updates: Optional[Dict[str, Any]] = None,
+                                     document_type: Optional[str] = None, upload_timestamp: Optional[str] = None,
+                                     contact_id: Optional[str] = None) -> Optional[int]:
+        """Store the processing results and mark the document completed in a single write"""
+        completion = {
+            'processing_metadata': metadata,
+            'complexity_score': Decimal(str(round(complexity_score, 4))),
+            'indexed_timestamp': datetime.utcnow().isoformat() + 'Z',
+            **(updates or {})
+        }
+        version = self.transition_document(document_id, 'completed', version, completion, ('processing_error',), contact_id)
+        if version is not None:
+            self.rollups.record_document_completed(document_type, self._seconds_since(upload_timestamp))
+        return version
+    
+    def fail_document_processing(self, document_id: str, version: Optional[int], error: str,
+                                 contact_id: Optional[str] = None) -> Optional[int]:
+        """Record a failed processing attempt with its error; the document can be claimed again later"""
+        return self.transition_document(document_id, 'failed', version, {'processing_error': error[:1000]},
+                                        contact_id=contact_id)
+    
+    @staticmethod
+    def _seconds_since(timestamp: Optional[str]) -> Optional[float]:
+        """Seconds from an ISO timestamp (as stored on records) until now"""
+        if not timestamp:
+            return None
+        try:
+            return (datetime.utcnow() - datetime.fromisoformat(timestamp.rstrip('Z'))).total_seconds()
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def near_duplicate_fields(signature: bytes, cluster_id: Optional[str] = None, duplicate_of: Optional[str] = None,
+                              similarity: Optional[float] = None) -> Dict[str, Any]:
+        """MinHash signature and near-duplicate flags, written with the document's completion"""
+        fields = {'minhash_signature': signature}
+        if cluster_id:
+            fields.update({
+                'duplicate_cluster_id': cluster_id,
+                'near_duplicate_of': duplicate_of,
+                'near_duplicate_similarity': Decimal(str(similarity))
+            })
+        return fields
     
-    def update_document_completion(self, document_id: str, complexity_score: float) -> bool:
-        """Update document with completion data (from enhanced_index.py)"""
+    def assign_duplicate_cluster(self, document_id: str, cluster_id: str) -> Optional[str]:
+        """Mark a document as the root of a duplicate cluster unless it already belongs to one;
+        returns the cluster the document ends up in (None if it does not exist)"""
         try:
             document_table = self.get_documents_table()
-            
-            document_table.update_item(
+            response = document_table.update_item(
                 Key={'id': document_id},
-                UpdateExpression='SET processing_status = :status, complexity_score = :score, indexed_timestamp = :timestamp',
-                ExpressionAttributeValues={
-                    ':status': 'completed',
-                    ':score': complexity_score,
-                    ':timestamp': datetime.utcnow().isoformat() + 'Z'
-                }
+                UpdateExpression="SET duplicate_cluster_id = if_not_exists(duplicate_cluster_id, :cluster)",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeValues={':cluster': cluster_id},
+                ReturnValues='ALL_NEW'
             )
-            
-            logger.info(f"Updated document {document_id} with completion data")
-            return True
+            return response['Attributes'].get('duplicate_cluster_id')
         except ClientError as e:
-            logger.error(f"Error updating document completion: {str(e)}")
-            return False
+            logger.error(f"Error assigning duplicate cluster: {str(e)}")
+            return None
+    
+    def get_near_duplicate_info(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """A document's stored MinHash signature and duplicate cluster"""
+        try:
+            return self.get_documents_table().get_item(
+                Key={'id': document_id},
+                ProjectionExpression='id, minhash_signature, duplicate_cluster_id'
+            ).get('Item')
+        except ClientError as e:
+            logger.error(f"Error getting near-duplicate info: {str(e)}")
+            raise
+    
+    def iter_near_duplicate_signatures(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over stored MinHash signatures, projecting only what the band index backfill needs"""
+        return self.scanner.iter_scan(
+            self.documents_table_name,
+            projection='id, minhash_signature',
+            filter_expression='attribute_exists(minhash_signature)'
+        )
     
     def get_contact_documents(self, contact_id: str) -> List[Dict[str, Any]]:
-        """Get all documents for a contact (from enhanced_app.py)"""
+        """Get all documents for a contact (from enhanced_app.py); follows pages past the 1MB query limit"""
+        documents, start_key = [], None
+        while True:
+            page, start_key = self.list_contact_documents(contact_id, start_key=start_key)
+            documents.extend(page)
+            if not start_key:
+                return documents
+    
+    def list_contact_documents(self, contact_id: str, limit: Optional[int] = None,
+                               start_key: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """One projected page of a contact's documents; returns (documents, LastEvaluatedKey)"""
         try:
             document_table = self.get_documents_table()
             
-            response = document_table.query(
-                IndexName='contact-id-index',
-                KeyConditionExpression='contact_id = :contact_id',
-                ExpressionAttributeValues={':contact_id': contact_id}
-            )
+            names = {f'#f{index}': field for index, field in enumerate(CONTACT_DOCUMENT_FIELDS)}
+            query_kwargs = {
+                'IndexName': 'contact-id-index',
+                'KeyConditionExpression': 'contact_id = :contact_id',
+                'ExpressionAttributeValues': {':contact_id': contact_id},
+                'ProjectionExpression': ', '.join(names),
+                'ExpressionAttributeNames': names
+            }
+            if limit:
+                query_kwargs['Limit'] = limit
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            response = document_table.query(**query_kwargs)
             
             documents = []
             for item in response.get('Items', []):
@@ -149,154 +448,368 @@ class DatabaseService:
                     'size': item['size']
                 })
             
-            return documents
+            return documents, response.get('LastEvaluatedKey')
         except ClientError as e:
             logger.error(f"Error getting contact documents: {str(e)}")
-            return []
+            return [], None
     
-    def enrich_contact_data(self, contact_id: str, document_metadata: Dict[str, Any]) -> Dict[str, Any]:
-        """Enrich contact data with document insights (from enhanced_index.py)"""
+    def get_contact_documents_version(self, contact_id: str) -> int:
+        """Current version stamp of a contact's document listing (0 if never bumped)"""
+        response = self.get_analytics_table().get_item(
+            Key={'id': CONTACT_DOCUMENTS_VERSION_PREFIX + contact_id},
+            ProjectionExpression='#version',
+            ExpressionAttributeNames={'#version': 'version'}
+        )
+        return int(response.get('Item', {}).get('version', 0))
+    
+    def _bump_contact_documents_version(self, contact_id: Optional[str]):
+        if not contact_id:
+            return
         try:
-            contact_table = self.get_contacts_table()
-            
-            # Get current contact data
-            response = contact_table.get_item(Key={'id': contact_id})
-            if 'Item' not in response:
-                logger.warning(f"Contact {contact_id} not found")
-                return {}
-            
-            contact = response['Item']
-            
-            # Calculate document insights
-            document_insights = {
-                'total_documents': 1,  # This would be calculated from all documents
-                'document_types': [document_metadata.get('document_type', 'unknown')],
-                'total_size': document_metadata.get('size', 0),
-                'last_document_upload': document_metadata.get('upload_timestamp'),
-                'processing_status': document_metadata.get('processing_status', 'pending'),
-                'content_analysis': {
-                    'has_business_content': document_metadata.get('has_business_keywords', False),
-                    'complexity_score': self._calculate_complexity_score(document_metadata),
-                    'confidence_level': 'high' if document_metadata.get('word_count', 0) > 100 else 'medium'
-                }
-            }
-            
-            # Update contact with document insights
-            contact_table.update_item(
-                Key={'id': contact_id},
-                UpdateExpression="SET document_insights = :insights, last_updated = :timestamp",
-                ExpressionAttributeValues={
-                    ':insights': document_insights,
-                    ':timestamp': datetime.utcnow().isoformat() + 'Z'
-                }
+            self.get_analytics_table().update_item(
+                Key={'id': CONTACT_DOCUMENTS_VERSION_PREFIX + contact_id},
+                UpdateExpression='ADD #version :one SET updated_at = :timestamp',
+                ExpressionAttributeNames={'#version': 'version'},
+                ExpressionAttributeValues={':one': 1, ':timestamp': datetime.utcnow().isoformat() + 'Z'}
             )
-            
-            logger.info(f"Enriched contact {contact_id} with document insights")
-            return document_insights
-            
         except ClientError as e:
+            logger.error(f"Error bumping document version for contact {contact_id}: {str(e)}")
+    
+    def enrich_contact_data(self, contact_id: str, document_metadata: Dict[str, Any], complexity_score: float,
+                            processing_status: str, retry: bool = True) -> Dict[str, Any]:
+        """Fold a processed document into the contact's running document insights with a single UpdateItem;
+        processing_status is the document's final status (document_metadata still says 'processing')"""
+        now = datetime.utcnow().isoformat() + 'Z'
+        values = {
+            ':one': 1,
+            ':size': document_metadata.get('size', 0),
+            ':types': {document_metadata.get('document_type') or 'unknown'},
+            ':business': 1 if document_metadata.get('has_business_keywords') else 0,
+            ':high_confidence': 1 if document_metadata.get('word_count', 0) > 100 else 0,
+            ':complexity': Decimal(str(round(complexity_score, 4))),
+            ':last_upload': document_metadata.get('upload_timestamp'),
+            ':status': processing_status,
+            ':timestamp': now
+        }
+        contact_table = self.get_contacts_table()
+        try:
+            try:
+                response = contact_table.update_item(
+                    Key={'id': contact_id},
+                    UpdateExpression=(
+                        'ADD document_insights.total_documents :one, document_insights.total_size :size, '
+                        'document_insights.document_types :types, document_insights.business_documents :business, '
+                        'document_insights.high_confidence_documents :high_confidence, '
+                        'document_insights.complexity_score_total :complexity '
+                        'SET document_insights.last_document_upload = :last_upload, '
+                        'document_insights.processing_status = :status, last_updated = :timestamp'
+                    ),
+                    ConditionExpression='attribute_exists(id)',
+                    ExpressionAttributeValues=values,
+                    ReturnValues='ALL_NEW'
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ValidationException':
+                    raise
+                # First document for this contact (or insights in the old overwrite format): start the map.
+                # Old-format insights have no running totals to add to, so they are replaced and their
+                # counts restart from this document
+                response = contact_table.update_item(
+                    Key={'id': contact_id},
+                    UpdateExpression='SET document_insights = :insights, last_updated = :timestamp',
+                    ConditionExpression='attribute_exists(id) AND attribute_not_exists(document_insights.complexity_score_total)',
+                    ExpressionAttributeValues={
+                        ':insights': {
+                            'total_documents': values[':one'],
+                            'total_size': values[':size'],
+                            'document_types': values[':types'],
+                            'business_documents': values[':business'],
+                            'high_confidence_documents': values[':high_confidence'],
+                            'complexity_score_total': values[':complexity'],
+                            'last_document_upload': values[':last_upload'],
+                            'processing_status': values[':status']
+                        },
+                        ':timestamp': now
+                    },
+                    ReturnValues='ALL_NEW'
+                )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                # Either the contact is missing or a concurrent first document started the map; retry once in the latter case
+                if retry and contact_table.get_item(Key={'id': contact_id}, ProjectionExpression='id').get('Item'):
+                    return self.enrich_contact_data(contact_id, document_metadata, complexity_score, processing_status,
+                                                    retry=False)
+                logger.warning(f"Contact {contact_id} not found")
+                return {}
             logger.error(f"Error enriching contact data: {str(e)}")
             return {}
-    
-    def _calculate_complexity_score(self, metadata: Dict[str, Any]) -> float:
-        """Calculate document complexity score (from enhanced_index.py)"""
-        score = 0.0
-        
-        # Word count factor
-        word_count = metadata.get('word_count', 0)
-        if word_count > 1000:
-            score += 0.3
-        elif word_count > 500:
-            score += 0.2
-        elif word_count > 100:
-            score += 0.1
         
-        # Entity richness
-        entities = metadata.get('entities', {})
-        entity_count = sum(len(v) for v in entities.values())
-        if entity_count > 10:
-            score += 0.3
-        elif entity_count > 5:
-            score += 0.2
-        elif entity_count > 0:
-            score += 0.1
-        
-        # Keyword diversity
-        keywords = metadata.get('keywords', [])
-        if len(keywords) > 10:
-            score += 0.2
-        elif len(keywords) > 5:
-            score += 0.1
+        document_insights = response['Attributes']['document_insights']
+        total_documents = int(document_insights['total_documents'])
+        # Running mean derived from the stored sum so concurrent updates never lose a document
+        document_insights['average_complexity_score'] = round(float(document_insights['complexity_score_total']) / total_documents, 4)
+        logger.info(f"Enriched contact {contact_id} with document insights ({total_documents} documents)")
+        return document_insights
+    
+    def search_documents(self, query: str, limit: int = 10, page: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fallback document search - local full-text index first, table scan as last resort"""
+        page = page or {}
         
-        # File type complexity
-        file_ext = metadata.get('file_extension', '')
-        if file_ext in ['.pdf', '.docx', '.pptx']:
-            score += 0.2
-        elif file_ext in ['.doc', '.xlsx']:
-            score += 0.1
+        if page.get('engine', 'local') == 'local' and self.local_search.is_ready():
+            local_results = self.local_search.search(query, limit, after=page.get('after'))
+            if local_results is not None:
+                return {
+                    'results': local_results['results'],
+                    'total_count': local_results['total_count'],
+                    'next_page': {'engine': 'local', 'after': local_results['after']} if local_results['after'] else None,
+                    'engine': 'local'
+                }
         
-        return min(score, 1.0)
+        scan_results = self.scan_search_documents(query, limit, page.get('last_evaluated_key'))
+        last_evaluated_key = scan_results['last_evaluated_key']
+        return {
+            'results': scan_results['results'],
+            # A filtered scan cannot count the matches without reading the rest of the table
+            'total_count': None,
+            'next_page': {'engine': 'dynamodb', 'last_evaluated_key': last_evaluated_key} if last_evaluated_key else None,
+            'engine': 'dynamodb'
+        }
     
-    def search_documents(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search documents (from enhanced_app.py)"""
+    def scan_search_documents(self, query: str, limit: int = 10,
+                              exclusive_start_key: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Search documents page by page, following LastEvaluatedKey (from enhanced_app.py)"""
         try:
             document_table = self.get_documents_table()
             
             # Basic search simulation
-            response = document_table.scan(
-                FilterExpression='contains(filename, :query) OR contains(description, :query)',
-                ExpressionAttributeValues={':query': query}
-            )
+            scan_kwargs = {
+                'FilterExpression': 'contains(filename, :query) OR contains(description, :query)',
+                'ExpressionAttributeValues': {':query': query}
+            }
+            if exclusive_start_key:
+                scan_kwargs['ExclusiveStartKey'] = exclusive_start_key
             
             results = []
-            for item in response.get('Items', []):
-                results.append({
-                    'document_id': item['id'],
-                    'filename': item['filename'],
-                    'contact_id': item['contact_id'],
-                    'document_type': item['document_type'],
-                    'description': item['description'],
-                    'tags': item.get('tags', []),
-                    'upload_timestamp': item['upload_timestamp'],
-                    'processing_status': item['processing_status'],
-                    'size': item['size']
-                })
-            
-            # Limit results
-            return results[:limit]
+            while True:
+                response = document_table.scan(**scan_kwargs)
+                
+                for item in response.get('Items', []):
+                    results.append({
+                        'document_id': item['id'],
+                        'filename': item['filename'],
+                        'contact_id': item['contact_id'],
+                        'document_type': item['document_type'],
+                        'description': item['description'],
+                        'tags': item.get('tags', []),
+                        'upload_timestamp': item['upload_timestamp'],
+                        'processing_status': item['processing_status'],
+                        'size': item['size']
+                    })
+                    
+                    # Page is full - the next page resumes right after this item
+                    if len(results) == limit:
+                        return {'results': results, 'last_evaluated_key': {'id': item['id']}}
+                
+                last_evaluated_key = response.get('LastEvaluatedKey')
+                if not last_evaluated_key:
+                    return {'results': results, 'last_evaluated_key': None}
+                scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
         except ClientError as e:
             logger.error(f"Error searching documents: {str(e)}")
-            return []
+            return {'results': [], 'last_evaluated_key': None}
     
-    def get_analytics_data(self) -> Dict[str, Any]:
-        """Get system analytics (from enhanced_app.py)"""
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over every document record with a parallel segmented scan"""
+        return self.scanner.iter_scan(self.documents_table_name)
+    
+    async def parallel_scan(self, table_name: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a whole table as an async generator (projection, filter, names, values)"""
+        async for item in self.scanner.scan(table_name, **kwargs):
+            yield item
+    
+    def iter_search_documents(self, changed_since: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the indexed fields of every document, or of those uploaded or moved to a new
+        processing status (processing_timestamp, set by every transition) since the given time"""
+        names = {f'#f{index}': field for index, field in enumerate(LOCAL_SEARCH_FIELDS)}
+        scan_kwargs = {'projection': ', '.join(list(names) + ['#metadata.#keywords'])}
+        names.update({'#metadata': 'processing_metadata', '#keywords': 'keywords'})
+        if changed_since:
+            names.update({'#uploaded': 'upload_timestamp', '#processed': 'processing_timestamp'})
+            scan_kwargs.update({
+                'filter_expression': '#uploaded >= :since OR #processed >= :since',
+                'values': {':since': changed_since}
+            })
+        return self.scanner.iter_scan(self.documents_table_name, names=names, **scan_kwargs)
+    
+    def rebuild_local_search_index(self) -> int:
+        """Rebuild the local full-text index from the documents table"""
         try:
-            contact_table = self.get_contacts_table()
-            document_table = self.get_documents_table()
-            
-            # Get contact count
-            contact_response = contact_table.scan(Select='COUNT')
-            total_contacts = contact_response['Count']
+            synced_at = datetime.utcnow().isoformat() + 'Z'
+            return self.local_search.rebuild(self.iter_search_documents(), synced_at)
+        except Exception as e:
+            logger.error(f"Error rebuilding local search index: {str(e)}")
+            return 0
+    
+    def catch_up_local_search_index(self, min_interval_seconds: float) -> Optional[int]:
+        """Bring the local index up to date with documents written through other pods; None when another
+        worker of this pod caught up within the interval"""
+        if not self.local_search.claim_refresh(min_interval_seconds):
+            return None
+        synced_at = self.local_search.get_state('synced_at')
+        if synced_at is None:
+            return self.rebuild_local_search_index()
+        # Overlap the previous pass to cover clock skew between pods and writes still in flight during it
+        changed_since = (datetime.fromisoformat(synced_at.rstrip('Z'))
+                         - timedelta(seconds=self.local_search_sync_overlap_seconds)).isoformat() + 'Z'
+        now = datetime.utcnow().isoformat() + 'Z'
+        try:
+            count = self.local_search.catch_up(self.iter_search_documents(changed_since), now)
+        except Exception as e:
+            logger.error(f"Error catching up local search index: {str(e)}")
+            return 0
+        if count:
+            logger.info(f"Local search index caught up with {count} changed documents")
+        return count
+    
+    def _increment_aggregates(self, deltas: Dict[str, int], set_values: Optional[Dict[str, Any]] = None,
+                              raise_errors: bool = False):
+        """Apply counter deltas to the aggregates item in a single atomic ADD"""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas and not set_values:
+            return
+        
+        names, values, clauses = {}, {}, []
+        for index, (name, delta) in enumerate(deltas.items()):
+            names[f'#a{index}'] = name
+            values[f':a{index}'] = delta
+        update_expression = 'ADD ' + ', '.join(f'#a{index} :a{index}' for index in range(len(deltas))) if deltas else ''
+        
+        for index, (name, value) in enumerate((set_values or {}).items()):
+            names[f'#s{index}'] = name
+            values[f':s{index}'] = value
+            clauses.append(f'#s{index} = :s{index}')
+        if clauses:
+            update_expression = ' '.join(filter(None, ['SET ' + ', '.join(clauses), update_expression]))
+        
+        try:
+            self.get_analytics_table().update_item(
+                Key={'id': ANALYTICS_AGGREGATE_ID},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if raise_errors:
+                raise
+            # The reconciliation job corrects any counters missed here
+            logger.error(f"Error updating analytics aggregates: {str(e)}")
+    
+    def _record_status_change(self, previous_status: str, status: str):
+        """Move one document between processing status counters (UPDATED_OLD omits unchanged values)"""
+        if previous_status != status:
+            self._increment_aggregates({
+                PROCESSING_STATUS_PREFIX + previous_status: -1,
+                PROCESSING_STATUS_PREFIX + status: 1
+            })
+    
+    def reconcile_analytics_aggregates(self, max_age_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Recount contacts and documents and correct the aggregates item; skipped when another process
+        holds the reconcile lease or (with max_age_seconds) the last reconciliation is recent enough"""
+        if not self.reconcile_lease.acquire():
+            logger.info("Analytics reconciliation is running in another process; skipped")
+            return {'skipped': True, 'reason': 'running elsewhere'}
+        try:
+            # Snapshot before the recount: the correction is the recount minus the snapshot, applied as an
+            # ADD so increments landing during the scan are kept (a write both counted by the scan and
+            # incremented during it is over-counted until the next pass)
+            snapshot = self.get_analytics_table().get_item(
+                Key={'id': ANALYTICS_AGGREGATE_ID}, ConsistentRead=True
+            ).get('Item', {})
+            age = self._seconds_since(snapshot.get('reconciled_at'))
+            if max_age_seconds is not None and age is not None and age < max_age_seconds:
+                return {'skipped': True, 'reason': 'recently reconciled', 'reconciled_at': snapshot['reconciled_at']}
             
-            # Get document count and types
-            document_response = document_table.scan()
-            total_documents = len(document_response.get('Items', []))
+            counts = self._count_aggregates()
+            corrections = {name: counts.get(name, 0) - int(snapshot.get(name, 0))
+                           for name in set(counts) | set(snapshot) if name not in AGGREGATES_METADATA}
+            corrections = {name: delta for name, delta in corrections.items() if delta}
+            reconciled_at = datetime.utcnow().isoformat() + 'Z'
+            self._increment_aggregates(corrections, {'reconciled_at': reconciled_at}, raise_errors=True)
+            if corrections:
+                logger.warning(f"Analytics aggregates corrected: {corrections}")
+            return {
+                'total_contacts': counts['total_contacts'],
+                'total_documents': counts['total_documents'],
+                'corrections': corrections,
+                'reconciled_at': reconciled_at
+            }
+        except ClientError as e:
+            logger.error(f"Error reconciling analytics aggregates: {str(e)}")
+            raise
+        finally:
+            self.reconcile_lease.release()
+    
+    def _count_aggregates(self) -> Dict[str, int]:
+        """Full recount of the values kept in the aggregates item"""
+        counts = {
+            'total_contacts': self.scanner.count_sync(self.contacts_table_name),
+            'total_documents': 0
+        }
+        documents = self.scanner.iter_scan(
+            self.documents_table_name,
+            projection='#type, #status',
+            names={'#type': 'document_type', '#status': 'processing_status'}
+        )
+        for item in documents:
+            counts['total_documents'] += 1
+            for name in (DOCUMENT_TYPE_PREFIX + item.get('document_type', 'unknown'),
+                         PROCESSING_STATUS_PREFIX + item.get('processing_status', 'pending')):
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+    
+    def get_timeseries(self, start: datetime, end: datetime, granularity: str) -> Dict[str, Any]:
+        """Activity rollups for a time range at minute, hour or day granularity"""
+        try:
+            points = self.rollups.get_timeseries(start, end, granularity)
+        except ClientError as e:
+            logger.error(f"Error reading analytics rollups: {str(e)}")
+            raise
+        return {
+            'granularity': granularity,
+            'from': start.isoformat() + 'Z',
+            'to': end.isoformat() + 'Z',
+            'points': points
+        }
+    
+    def get_analytics_data(self) -> Dict[str, Any]:
+        """Get system analytics from the incrementally maintained aggregates"""
+        try:
+            analytics_table = self.get_analytics_table()
+            # Until the background reconciliation first seeds the item, the counters only hold increments
+            # since deployment
+            item = analytics_table.get_item(Key={'id': ANALYTICS_AGGREGATE_ID}).get('Item', {})
             
             document_types = {}
             processing_stats = {'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0}
+            for name, value in item.items():
+                if name.startswith(DOCUMENT_TYPE_PREFIX):
+                    if value:
+                        document_types[name[len(DOCUMENT_TYPE_PREFIX):]] = int(value)
+                elif name.startswith(PROCESSING_STATUS_PREFIX):
+                    processing_stats[name[len(PROCESSING_STATUS_PREFIX):]] = int(value)
             
-            for item in document_response.get('Items', []):
-                doc_type = item.get('document_type', 'unknown')
-                document_types[doc_type] = document_types.get(doc_type, 0) + 1
-                
-                status = item.get('processing_status', 'pending')
-                processing_stats[status] = processing_stats.get(status, 0) + 1
+            try:
+                cardinality = self.sketches.get_cardinalities()
+            except ClientError as e:
+                logger.error(f"Error reading distinct-count sketches: {str(e)}")
+                cardinality = None
             
             return {
-                'total_contacts': total_contacts,
-                'total_documents': total_documents,
+                'total_contacts': int(item.get('total_contacts', 0)),
+                'total_documents': int(item.get('total_documents', 0)),
                 'document_types': document_types,
                 'processing_stats': processing_stats,
+                'cardinality': cardinality,
                 'timestamp': datetime.utcnow().isoformat() + 'Z'
             }
         except ClientError as e:
@@ -0,0 +1,369 @@
+# Email Outbox - Durable DynamoDB-backed email queue drained at the SES send rate
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from shared.lease import Lease
+
+logger = logging.getLogger(__name__)
+
+STATUS_INDEX = 'status-next-attempt-index'
+# SES per-destination results that will not succeed on retry
+PERMANENT_FAILURES = ('MessageRejected', 'InvalidParameterValue', 'MailFromDomainNotVerified')
+THROTTLING_ERRORS = ('Throttling', 'ThrottlingException', 'MaxSendingRateExceeded', 'AccountThrottled')
+
+class TokenBucket:
+    """Async token bucket; one token per recipient sent"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def drain(self):
+        """Empty the bucket (e.g. after SES reports throttling)"""
+        self._refill()
+        self.tokens = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until the requested tokens are available, then take them"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self.tokens) / self.rate if self.rate > 0 else 1.0)
+
+class EmailOutbox:
+    """Persists outgoing emails and sends them in rate-limited bulk templated batches with retry"""
+
+    def __init__(self, aws_clients):
+        self.aws_clients = aws_clients
+        self.table_name = os.environ.get('EMAIL_OUTBOX_TABLE', 'realistic-demo-pretamane-email-outbox')
+        self.enabled = os.environ.get('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true'
+        self.template_name = os.environ.get('EMAIL_OUTBOX_TEMPLATE', 'realistic-demo-pretamane-notification')
+        self.from_email = os.environ.get('SES_FROM_EMAIL', 'noreply@example.com')
+        self.batch_size = min(int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', '50')), 50)
+        self.poll_interval = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', '2'))
+        self.lease_seconds = int(os.environ.get('EMAIL_OUTBOX_LEASE_SECONDS', '120'))
+        self.max_attempts = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+        self.retry_base_seconds = float(os.environ.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS', '30'))
+        self.retention_seconds = int(os.environ.get('EMAIL_OUTBOX_RETENTION_HOURS', '168')) * 3600
+        # Share of the account's SES send rate the sender may use (leave headroom for other senders)
+        self.rate_fraction = float(os.environ.get('EMAIL_SEND_RATE_FRACTION', '0.8'))
+        self.quota_refresh_seconds = float(os.environ.get('EMAIL_QUOTA_REFRESH_SECONDS', '300'))
+        self.depth_interval = float(os.environ.get('EMAIL_OUTBOX_DEPTH_INTERVAL_SECONDS', '15'))
+        # Every uvicorn worker of every replica runs the sender loop; only the lease holder sends, so the
+        # fleet as a whole stays within the rate fraction
+        self.sender_lease = Lease(aws_clients, self.table_name, 'email-sender',
+                                  float(os.environ.get('EMAIL_OUTBOX_SENDER_LEASE_SECONDS', '60')))
+
+        self.bucket = TokenBucket(rate=1.0)
+        self.quota: Dict[str, float] = {}
+        self.quota_refreshed_at = 0.0
+        self.template_ready: Optional[bool] = None
+        self.depth: Optional[int] = None
+        self.depth_refreshed_at = 0.0
+        self.latencies = deque(maxlen=500)
+        self.stats = {'enqueued': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'throttled': 0, 'bulk_calls': 0, 'single_calls': 0}
+
+    def get_table(self):
+        return self.aws_clients.get_dynamo_table(self.table_name)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    def enqueue(self, to_addresses: List[str], subject: str, body: str, kind: str = 'notification') -> Dict[str, Any]:
+        """Persist an email for the background sender; returns a send_email-shaped response"""
+        now = self._now_ms()
+        message_id = f"email_{now}_{str(uuid.uuid4())[:8]}"
+        self.get_table().put_item(Item={
+            'id': message_id,
+            'status': 'pending',
+            'next_attempt_at': now,
+            'created_at': now,
+            'kind': kind,
+            'to_addresses': to_addresses,
+            'subject': subject,
+            'body': body,
+            'attempts': 0
+        })
+        self.stats['enqueued'] += 1
+        return {'MessageId': message_id, 'Queued': True}
+
+    async def run(self):
+        """Sender loop; started as a background task"""
+        logger.info(f"Starting email outbox sender for {self.table_name}")
+        while True:
+            try:
+                if time.monotonic() - self.depth_refreshed_at >= self.depth_interval:
+                    await asyncio.to_thread(self.refresh_depth)
+                if not await asyncio.to_thread(self._ensure_sender):
+                    await asyncio.sleep(self.sender_lease.duration_seconds / 4)
+                    continue
+
+                if time.monotonic() - self.quota_refreshed_at >= self.quota_refresh_seconds:
+                    await asyncio.to_thread(self.refresh_quota)
+                if self.template_ready is None:
+                    self.template_ready = await asyncio.to_thread(self.ensure_template)
+
+                sent = await self.drain_once()
+                if not sent:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                logger.info("Email outbox sender cancelled")
+                if self.sender_lease.held:
+                    self.sender_lease.release()
+                break
+            except Exception as e:
+                logger.error(f"Error in email outbox sender: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    def _ensure_sender(self) -> bool:
+        """Hold the sender lease, renewing it once half of it has elapsed"""
+        if self.sender_lease.expires_at - time.time() > self.sender_lease.duration_seconds / 2:
+            return True
+        was_sender = self.sender_lease.held
+        is_sender = self.sender_lease.acquire()
+        if is_sender != was_sender:
+            logger.info(f"Email outbox sender lease {'acquired' if is_sender else 'lost'} by {self.sender_lease.owner}")
+            if is_sender:
+                # Re-read the quota on takeover so the rate is current
+                self.quota_refreshed_at = 0.0
+        return is_sender
+
+    def refresh_quota(self):
+        """Tune the token bucket from get_send_quota"""
+        self.quota_refreshed_at = time.monotonic()
+        try:
+            quota = self.aws_clients.ses_client.get_send_quota()
+        except ClientError as e:
+            logger.error(f"Error getting SES send quota: {str(e)}")
+            return
+        self.quota = {name: float(quota[name]) for name in ('Max24HourSend', 'MaxSendRate', 'SentLast24Hours')}
+        self.bucket.set_rate(max(self.quota['MaxSendRate'] * self.rate_fraction, 0.1))
+        logger.info(f"SES send rate set to {self.bucket.rate:.2f}/s (quota {self.quota})")
+
+    def daily_quota_exhausted(self) -> bool:
+        # Max24HourSend of -1 means unlimited
+        max_send = self.quota.get('Max24HourSend', -1)
+        return max_send >= 0 and self.quota.get('SentLast24Hours', 0) >= max_send
+
+    def ensure_template(self) -> bool:
+        """Make sure the pass-through template used for bulk sends exists; False falls back to single sends"""
+        ses = self.aws_clients.ses_client
+        try:
+            ses.get_template(TemplateName=self.template_name)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TemplateDoesNotExist':
+                logger.warning(f"Cannot read SES template {self.template_name}, using single sends: {str(e)}")
+                return False
+        try:
+            ses.create_template(Template={
+                'TemplateName': self.template_name,
+                'SubjectPart': '{{{subject}}}',
+                'TextPart': '{{{body}}}'
+            })
+            return True
+        except ClientError as e:
+            logger.warning(f"Cannot create SES template {self.template_name}, using single sends: {str(e)}")
+            return False
+
+    async def drain_once(self) -> int:
+        """Claim one batch of due messages and send it; returns the number sent"""
+        if self.daily_quota_exhausted():
+            return 0
+        batch = await asyncio.to_thread(self._claim_batch)
+        if not batch:
+            return 0
+
+        await self.bucket.acquire(sum(len(message['to_addresses']) for message in batch))
+        start_time = time.monotonic()
+        if self.template_ready:
+            results = await asyncio.to_thread(self._send_bulk, batch)
+        else:
+            results = await asyncio.to_thread(self._send_single, batch)
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+
+        sent = 0
+        for message, (message_id, error_code) in zip(batch, results):
+            if message_id:
+                sent += 1
+                self.latencies.append({'send_ms': elapsed_ms, 'queue_ms': self._now_ms() - int(message['created_at'])})
+            await asyncio.to_thread(self._record_result, message, message_id, error_code)
+        if any(code in THROTTLING_ERRORS for _, code in results):
+            self.stats['throttled'] += 1
+            self.bucket.drain()
+        self.quota['SentLast24Hours'] = self.quota.get('SentLast24Hours', 0) + sent
+        return sent
+
+    def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Take due pending messages, plus sending ones whose lease expired, with a conditional lease"""
+        table = self.get_table()
+        now = self._now_ms()
+        # Never claim more than one bucket's worth, so a batch is sent at the allowed rate
+        limit = max(1, min(self.batch_size, int(self.bucket.capacity)))
+        candidates = []
+        for status in ('pending', 'sending'):
+            response = table.query(
+                IndexName=STATUS_INDEX,
+                KeyConditionExpression=Key('status').eq(status) & Key('next_attempt_at').lte(now),
+                Limit=limit - len(candidates)
+            )
+            candidates.extend(response.get('Items', []))
+            if len(candidates) >= limit:
+                break
+
+        claimed = []
+        for item in candidates:
+            try:
+                table.update_item(
+                    Key={'id': item['id']},
+                    UpdateExpression='SET #status = :sending, next_attempt_at = :lease',
+                    ConditionExpression='#status = :status AND next_attempt_at = :seen',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={':sending': 'sending', ':lease': now + self.lease_seconds * 1000,
+                                               ':status': item['status'], ':seen': item['next_attempt_at']}
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    logger.error(f"Error claiming outbox email {item['id']}: {str(e)}")
+                continue
+            claimed.append(item)
+        return claimed
+
+    def _send_bulk(self, batch: List[Dict[str, Any]]) -> List[tuple]:
+        """One SendBulkTemplatedEmail call for the whole batch; returns (message_id, error_code) per message"""
+        self.stats['bulk_calls'] += 1
+        try:
+            response = self.aws_clients.ses_client.send_bulk_templated_email(
+                Source=self.from_email,
+                Template=self.template_name,
+                DefaultTemplateData=json.dumps({'subject': '', 'body': ''}),
+                Destinations=[{
+                    'Destination': {'ToAddresses': list(message['to_addresses'])},
+                    'ReplacementTemplateData': json.dumps({'subject': message['subject'], 'body': message['body']})
+                } for message in batch]
+            )
+        except ClientError as e:
+            logger.error(f"Error sending bulk email batch: {str(e)}")
+            return [(None, e.response['Error']['Code'])] * len(batch)
+
+        results = []
+        for status in response.get('Status', []):
+            code = status.get('Status', 'Success')
+            results.append((status.get('MessageId'), None) if code == 'Success' else (None, code))
+        return results + [(None, 'Failed')] * (len(batch) - len(results))
+
+    def _send_single(self, batch: List[Dict[str, Any]]) -> List[tuple]:
+        """Fallback when the bulk template is unavailable: one SendEmail per message"""
+        results = []
+        for message in batch:
+            self.stats['single_calls'] += 1
+            try:
+                response = self.aws_clients.ses_client.send_email(
+                    Source=self.from_email,
+                    Destination={'ToAddresses': list(message['to_addresses'])},
+                    Message={
+                        'Subject': {'Data': message['subject']},
+                        'Body': {'Text': {'Data': message['body']}}
+                    }
+                )
+                results.append((response['MessageId'], None))
+            except ClientError as e:
+                logger.error(f"Error sending outbox email {message['id']}: {str(e)}")
+                results.append((None, e.response['Error']['Code']))
+        return results
+
+    def _record_result(self, message: Dict[str, Any], ses_message_id: Optional[str], error_code: Optional[str]):
+        """Mark a message sent, schedule its retry with backoff, or give up"""
+        now = self._now_ms()
+        attempts = int(message.get('attempts', 0)) + 1
+        if ses_message_id:
+            status, next_attempt_at = 'sent', now
+            self.stats['sent'] += 1
+        elif error_code in PERMANENT_FAILURES or attempts >= self.max_attempts:
+            status, next_attempt_at = 'failed', now
+            self.stats['failed'] += 1
+            logger.error(f"Giving up on outbox email {message['id']} after {attempts} attempts: {error_code}")
+        else:
+            delay = min(self.retry_base_seconds * (2 ** (attempts - 1)), 3600)
+            status, next_attempt_at = 'pending', now + int(delay * 1000)
+            self.stats['retried'] += 1
+
+        update_expression = 'SET #status = :status, next_attempt_at = :next, attempts = :attempts, last_error = :error'
+        values = {':status': status, ':next': next_attempt_at, ':attempts': attempts, ':error': error_code}
+        if status != 'pending':
+            update_expression += ', ses_message_id = :ses_id, finished_at = :now, expires_at = :expires'
+            values.update({':ses_id': ses_message_id, ':now': now, ':expires': now // 1000 + self.retention_seconds})
+        try:
+            self.get_table().update_item(
+                Key={'id': message['id']},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            logger.error(f"Error recording outbox email {message['id']}: {str(e)}")
+
+    def refresh_depth(self) -> Optional[int]:
+        """Count pending and in-flight messages (paginated COUNT queries on the status index)"""
+        self.depth_refreshed_at = time.monotonic()
+        table = self.get_table()
+        depth = 0
+        try:
+            for status in ('pending', 'sending'):
+                kwargs = {'IndexName': STATUS_INDEX, 'KeyConditionExpression': Key('status').eq(status), 'Select': 'COUNT'}
+                while True:
+                    response = table.query(**kwargs)
+                    depth += response['Count']
+                    if 'LastEvaluatedKey' not in response:
+                        break
+                    kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as e:
+            logger.error(f"Error counting outbox depth: {str(e)}")
+            return self.depth
+        self.depth = depth
+        return depth
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Outbox depth, send counters and latency percentiles"""
+        def percentile(name: str, fraction: float) -> Optional[float]:
+            values = sorted(sample[name] for sample in self.latencies)
+            return round(values[min(int(len(values) * fraction), len(values) - 1)], 1) if values else None
+
+        return {
+            **self.stats,
+            'enabled': self.enabled,
+            'sender': self.sender_lease.held,
+            'depth': self.depth,
+            'send_rate_per_second': round(self.bucket.rate, 2),
+            'quota': self.quota,
+            'bulk_template': self.template_ready,
+            'send_latency_ms': {'p50': percentile('send_ms', 0.5), 'p95': percentile('send_ms', 0.95)},
+            'queue_latency_ms': {'p50': percentile('queue_ms', 0.5), 'p95': percentile('queue_ms', 0.95)},
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
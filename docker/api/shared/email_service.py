@@ -2,7 +2,7 @@
 import os
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
@@ -10,11 +10,25 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """Unified email service for all components"""
     
-    def __init__(self, ses_client):
+    def __init__(self, ses_client, outbox=None):
         self.ses_client = ses_client
+        self.outbox = outbox
         self.from_email = os.environ.get('SES_FROM_EMAIL', 'noreply@example.com')
         self.to_email = os.environ.get('SES_TO_EMAIL', 'admin@example.com')
     
+    def _send(self, to_addresses: list, subject: str, body: str, kind: str) -> Dict:
+        """Queue the email in the durable outbox when enabled, otherwise send it inline"""
+        if self.outbox is not None and self.outbox.enabled:
+            return self.outbox.enqueue(to_addresses, subject, body, kind)
+        return self.ses_client.send_email(
+            Source=self.from_email,
+            Destination={'ToAddresses': to_addresses},
+            Message={
+                'Subject': {'Data': subject},
+                'Body': {'Text': {'Data': body}}
+            }
+        )
+    
     def send_contact_notification(self, name: str, email: str, company: str, service: str, 
                                 budget: str, message: str, timestamp: str, source: str, 
                                 user_agent: str, page_url: str, document_count: int = 0) -> Optional[Dict]:
@@ -39,16 +53,7 @@ Additional Information:
 - User Agent: {user_agent}
 """
 
-            response = self.ses_client.send_email(
-                Source=self.from_email,
-                Destination={
-                    'ToAddresses': [self.to_email]
-                },
-                Message={
-                    'Subject': {'Data': f'New Contact: {name} - {service}'},
-                    'Body': {'Text': {'Data': email_body}}
-                }
-            )
+            response = self._send([self.to_email], f'New Contact: {name} - {service}', email_body, 'contact')
             return response
         except ClientError as e:
             logger.error(f"Error sending contact notification email: {str(e)}")
@@ -88,16 +93,8 @@ System Status:
 - Analytics: Available
 """
 
-            response = self.ses_client.send_email(
-                Source=self.from_email,
-                Destination={
-                    'ToAddresses': [self.to_email]
-                },
-                Message={
-                    'Subject': {'Data': f'Enhanced Contact: {name} - {service} (Documents: {document_count})'},
-                    'Body': {'Text': {'Data': email_body}}
-                }
-            )
+            response = self._send([self.to_email], f'Enhanced Contact: {name} - {service} (Documents: {document_count})',
+                                  email_body, 'enhanced_contact')
             return response
         except ClientError as e:
             logger.error(f"Error sending enhanced contact notification email: {str(e)}")
@@ -131,33 +128,56 @@ Best regards,
 Document Processing System
 """
             
-            response = self.ses_client.send_email(
-                Source=self.from_email,
-                Destination={'ToAddresses': [contact_email]},
-                Message={
-                    'Subject': {'Data': subject},
-                    'Body': {'Text': {'Data': body}}
-                }
-            )
+            response = self._send([contact_email], subject, body, 'processing')
             
-            logger.info(f"Sent processing notification to {contact_email}")
+            logger.info(f"Queued processing notification to {contact_email}")
             return response
             
         except ClientError as e:
             logger.error(f"Error sending processing notification: {str(e)}")
             return None
     
+    def send_processing_digest(self, contact_id: str, documents: List[Dict[str, Any]], 
+                               contact_email: str) -> Optional[Dict]:
+        """Send one summary email for several processed documents"""
+        try:
+            subject = f"Document Processing Update ({len(documents)} documents)"
+            lines = '\n'.join(
+                f"- {document['filename']} ({document['document_type']}, {document['size']} bytes): {document['status']}"
+                for document in documents
+            )
+            body = f"""
+Document Processing Summary
+
+Contact ID: {contact_id}
+Documents processed: {len(documents)}
+Timestamp: {datetime.utcnow().isoformat()}
+
+Documents:
+{lines}
+
+Next Steps:
+- Completed documents are now searchable in the system
+- Contact insights have been updated
+- Analytics data has been refreshed
+
+Best regards,
+Document Processing System
+"""
+            
+            response = self._send([contact_email], subject, body, 'processing_digest')
+            
+            logger.info(f"Queued processing digest of {len(documents)} documents to {contact_email}")
+            return response
+            
+        except ClientError as e:
+            logger.error(f"Error sending processing digest: {str(e)}")
+            return None
+    
     def send_admin_notification(self, subject: str, message: str) -> Optional[Dict]:
         """Send admin notification"""
         try:
-            response = self.ses_client.send_email(
-                Source=self.from_email,
-                Destination={'ToAddresses': [self.to_email]},
-                Message={
-                    'Subject': {'Data': subject},
-                    'Body': {'Text': {'Data': message}}
-                }
-            )
+            response = self._send([self.to_email], subject, message, 'admin')
             return response
         except ClientError as e:
             logger.error(f"Error sending admin notification: {str(e)}")
@@ -0,0 +1,146 @@
+# Health Monitor - Background dependency probing with cached status for liveness/readiness
+import os
+import time
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """Probes AWS dependencies on an interval; health endpoints only read the cached results"""
+
+    def __init__(self, aws_clients):
+        self.aws_clients = aws_clients
+        self.interval = float(os.environ.get('HEALTH_PROBE_INTERVAL_SECONDS', '30'))
+        self.timeout = float(os.environ.get('HEALTH_PROBE_TIMEOUT_SECONDS', '3'))
+        # Only what the request path cannot work without; S3 is used by uploads and processing alone
+        self.critical = [name.strip() for name in os.environ.get('HEALTH_READINESS_DEPENDENCIES', 'dynamodb').split(',') if name.strip()]
+        self.contacts_table = os.environ.get('CONTACTS_TABLE', 'realistic-demo-pretamane-contact-submissions')
+        self.s3_bucket = os.environ.get('S3_DATA_BUCKET', 'realistic-demo-pretamane-data')
+
+        self.probes: Dict[str, Callable] = {
+            'dynamodb': self._probe_dynamodb,
+            'ses': self._probe_ses,
+            's3': self._probe_s3,
+            'opensearch': self._probe_opensearch
+        }
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.last_cycle_at: Optional[float] = None
+
+        # wait_for cannot cancel a thread, so probe calls get their own clients (socket timeouts matching the
+        # probe timeout, no retries) and their own threads (a hung probe never holds a default-executor thread)
+        self.client_config = Config(connect_timeout=self.timeout, read_timeout=self.timeout,
+                                    retries={'total_max_attempts': 1})
+        self.clients: Dict[str, Any] = {}
+        self.executor = ThreadPoolExecutor(max_workers=len(self.probes), thread_name_prefix='health-probe')
+
+    async def run(self):
+        """Probe loop; started as a background task"""
+        while True:
+            try:
+                await self.probe_all()
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                logger.info("Health monitor cancelled")
+                self.executor.shutdown(wait=False)
+                break
+            except Exception as e:
+                logger.error(f"Error in health monitor: {str(e)}")
+                await asyncio.sleep(self.interval)
+
+    async def probe_all(self):
+        """Run every probe concurrently, each bounded by the probe timeout"""
+        await asyncio.gather(*(self._run_probe(name, probe) for name, probe in self.probes.items()))
+        self.last_cycle_at = time.monotonic()
+
+    async def _run_probe(self, name: str, probe: Callable):
+        previous = self.results.get(name, {})
+        start_time = time.monotonic()
+        try:
+            status = await asyncio.wait_for(probe(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            status = f"error: timed out after {self.timeout}s"
+        except Exception as e:
+            status = f"error: {str(e)}"
+
+        healthy = status in ('connected', 'not_configured')
+        self.results[name] = {
+            'status': status,
+            'healthy': healthy,
+            'latency_ms': round((time.monotonic() - start_time) * 1000, 1),
+            'checked_at': datetime.utcnow().isoformat() + 'Z',
+            'consecutive_failures': 0 if healthy else previous.get('consecutive_failures', 0) + 1
+        }
+        if not healthy and previous.get('healthy', True):
+            logger.warning(f"Dependency {name} became unhealthy: {status}")
+
+    def _client(self, service: str):
+        if service not in self.clients:
+            self.clients[service] = boto3.client(service, region_name=self.aws_clients.region, config=self.client_config)
+        return self.clients[service]
+
+    async def _call(self, service: str, operation: str, **kwargs):
+        """Run one probe call on the probe executor"""
+        method = getattr(self._client(service), operation)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(method, **kwargs))
+
+    async def _probe_dynamodb(self) -> str:
+        await self._call('dynamodb', 'describe_table', TableName=self.contacts_table)
+        return 'connected'
+
+    async def _probe_ses(self) -> str:
+        await self._call('ses', 'get_send_quota')
+        return 'connected'
+
+    async def _probe_s3(self) -> str:
+        await self._call('s3', 'head_bucket', Bucket=self.s3_bucket)
+        return 'connected'
+
+    async def _probe_opensearch(self) -> str:
+        client = self.aws_clients.get_async_opensearch_client()
+        if client is None:
+            return 'not_configured'
+        await client.cluster.health(request_timeout=self.timeout)
+        return 'connected'
+
+    def is_stale(self) -> bool:
+        """True when the prober has not completed a cycle recently (e.g. it is wedged)"""
+        return self.last_cycle_at is None or time.monotonic() - self.last_cycle_at > self.interval * 3
+
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness from cached probe results: critical dependencies healthy and results fresh"""
+        failing = [name for name in self.critical if not self.results.get(name, {}).get('healthy', False)]
+        if self.last_cycle_at is None:
+            reason = 'awaiting first probe'
+        elif self.is_stale():
+            reason = 'probe results are stale'
+        elif failing:
+            reason = f"critical dependencies failing: {', '.join(failing)}"
+        else:
+            reason = None
+        return {
+            'ready': reason is None,
+            'reason': reason,
+            'dependencies': {name: result['status'] for name, result in self.results.items()},
+            'last_probe_age_seconds': None if self.last_cycle_at is None else round(time.monotonic() - self.last_cycle_at, 1)
+        }
+
+    def services(self) -> Dict[str, str]:
+        """Per-dependency status strings (same shape test_aws_connectivity returns)"""
+        return {name: result['status'] for name, result in self.results.items()}
+
+    def get_status(self) -> Dict[str, Any]:
+        """Full cached probe detail"""
+        return {
+            'probes': self.results,
+            'interval_seconds': self.interval,
+            'critical_dependencies': self.critical,
+            **self.readiness()
+        }
@@ -0,0 +1,111 @@
+# Idempotency - Idempotency-Key records so retried submissions are answered without re-executing
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyConflict(Exception):
+    """The key is being processed by another request, or was used for a different request"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class IdempotencyStore:
+    """Claims an Idempotency-Key with a conditional put and stores the response for replay until the record expires"""
+
+    MAX_KEY_LENGTH = 255
+
+    def __init__(self, aws_clients):
+        self.aws_clients = aws_clients
+        self.table_name = os.environ.get('IDEMPOTENCY_TABLE', 'realistic-demo-pretamane-idempotency')
+        self.ttl_seconds = int(float(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24')) * 3600)
+        # How long an in-progress claim blocks retries before it is considered abandoned
+        self.lock_seconds = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+        self.stats = {'claimed': 0, 'replayed': 0, 'conflicts': 0}
+
+    def get_table(self):
+        return self.aws_clients.get_dynamo_table(self.table_name)
+
+    @staticmethod
+    def fingerprint(payload: Any) -> str:
+        """Stable hash of the request so a key reused with a different body is rejected"""
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def begin(self, scope: str, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+        """Claim the key; None means the caller should execute, otherwise the stored response to replay"""
+        if not key or len(key) > self.MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be 1-{self.MAX_KEY_LENGTH} characters")
+
+        now = int(time.time())
+        record_id = f"{scope}#{key}"
+        table = self.get_table()
+        try:
+            # Expired records may linger until TTL deletion catches up, so treat them as absent
+            table.put_item(
+                Item={
+                    'id': record_id,
+                    'status': 'in_progress',
+                    'request_hash': request_hash,
+                    'created_at': now,
+                    'lock_expires_at': now + self.lock_seconds,
+                    'expires_at': now + self.ttl_seconds
+                },
+                ConditionExpression='attribute_not_exists(id) OR expires_at < :now OR '
+                                    '(#status = :in_progress AND lock_expires_at < :now)',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':now': now, ':in_progress': 'in_progress'}
+            )
+            self.stats['claimed'] += 1
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        record = table.get_item(Key={'id': record_id}, ConsistentRead=True).get('Item')
+        if record is None:
+            # Released between our put and read; let the caller try again
+            raise IdempotencyConflict("A request with this Idempotency-Key is being retried; please retry", 409)
+        if record['request_hash'] != request_hash:
+            self.stats['conflicts'] += 1
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request", 422)
+        if record['status'] != 'completed':
+            self.stats['conflicts'] += 1
+            raise IdempotencyConflict("A request with this Idempotency-Key is still being processed", 409)
+
+        self.stats['replayed'] += 1
+        return {'status_code': int(record['status_code']), 'body': json.loads(record['response'])}
+
+    def complete(self, scope: str, key: str, status_code: int, body: Any):
+        """Store the response so duplicates within the TTL are answered from it"""
+        try:
+            self.get_table().update_item(
+                Key={'id': f"{scope}#{key}"},
+                UpdateExpression='SET #status = :completed, status_code = :status_code, #response = :response',
+                ExpressionAttributeNames={'#status': 'status', '#response': 'response'},
+                ExpressionAttributeValues={':completed': 'completed', ':status_code': status_code,
+                                           ':response': json.dumps(body, default=str)}
+            )
+        except ClientError as e:
+            logger.error(f"Error storing idempotent response for {scope}: {str(e)}")
+
+    def release(self, scope: str, key: str):
+        """Drop the claim after a failed request so a retry executes again"""
+        try:
+            self.get_table().delete_item(
+                Key={'id': f"{scope}#{key}"},
+                ConditionExpression='#status = :in_progress',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':in_progress': 'in_progress'}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error(f"Error releasing idempotency key for {scope}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, ttl_seconds=self.ttl_seconds)
@@ -0,0 +1,58 @@
+# Lease - Conditional-put leader lease so one process in the fleet runs a singleton job
+import os
+import time
+import uuid
+import socket
+import logging
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+class Lease:
+    """Named lease item in a DynamoDB table; held by one owner until released or expired"""
+
+    def __init__(self, aws_clients, table_name: str, name: str, duration_seconds: float):
+        self.aws_clients = aws_clients
+        self.table_name = table_name
+        self.lease_id = f"lease#{name}"
+        self.duration_seconds = duration_seconds
+        # Unique per process: uvicorn workers on one pod share the hostname
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.expires_at = 0.0
+
+    @property
+    def held(self) -> bool:
+        return time.time() < self.expires_at
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free or expired, or extend it if we already hold it"""
+        now = time.time()
+        expires_at = now + self.duration_seconds
+        try:
+            self.aws_clients.get_dynamo_table(self.table_name).put_item(
+                Item={'id': self.lease_id, 'owner': self.owner, 'lease_expires_at': int(expires_at)},
+                ConditionExpression='attribute_not_exists(id) OR lease_expires_at < :now OR #owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':now': int(now), ':owner': self.owner}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error(f"Error acquiring lease {self.lease_id}: {str(e)}")
+            self.expires_at = 0.0
+            return False
+        self.expires_at = expires_at
+        return True
+
+    def release(self):
+        """Give the lease up early so another process can take it"""
+        self.expires_at = 0.0
+        try:
+            self.aws_clients.get_dynamo_table(self.table_name).delete_item(
+                Key={'id': self.lease_id},
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':owner': self.owner}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error(f"Error releasing lease {self.lease_id}: {str(e)}")
@@ -0,0 +1,330 @@
+# Local Search Index - Embedded SQLite FTS5 engine used when OpenSearch is unavailable
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Iterable, Iterator
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TABLES = """
+CREATE TABLE IF NOT EXISTS {documents} (
+    doc_rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    contact_id TEXT,
+    filename TEXT,
+    document_type TEXT,
+    description TEXT,
+    tags TEXT,
+    upload_timestamp TEXT,
+    processing_status TEXT,
+    size INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS {documents_fts} USING fts5(
+    filename, description, tags, keywords,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+LIVE_TABLES = {'documents': 'documents', 'documents_fts': 'documents_fts'}
+
+# Column weights for bm25(): filename, description, tags, keywords
+# Mirrors the filename^2 boost used by the OpenSearch multi_match query
+RANK_EXPRESSION = "bm25(documents_fts, 2.0, 1.0, 1.0, 1.0)"
+
+class LocalSearchIndex:
+    """Embedded full-text index kept in sync with the documents table"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        # Pod-local disk (an emptyDir in Kubernetes): SQLite locking is unreliable on NFS-backed EFS,
+        # so each pod keeps its own copy, built from DynamoDB at startup and caught up periodically
+        self.db_path = db_path or os.environ.get('LOCAL_SEARCH_DB_PATH', '/var/lib/search-index/documents.db')
+        self.enabled = os.environ.get('LOCAL_SEARCH_ENABLED', 'true').lower() == 'true'
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def get_connection(self) -> Optional[sqlite3.Connection]:
+        """Open the index database lazily; returns None when the index cannot be used"""
+        if not self.enabled:
+            return None
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.executescript(DOCUMENT_TABLES.format(**LIVE_TABLES) + STATE_TABLE)
+                self._conn = conn
+                logger.info(f"Opened local search index: {self.db_path}")
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Local search index unavailable: {str(e)}")
+                self.enabled = False
+                return None
+        return self._conn
+
+    def is_ready(self) -> bool:
+        """Whether the index has been built from DynamoDB at least once"""
+        return self.get_state('built_at') is not None
+
+    def claim_refresh(self, min_interval_seconds: float) -> bool:
+        """Claim the next catch-up for this process unless another worker of the pod (they share the
+        index file) claimed one within the interval"""
+        conn = self.get_connection()
+        if conn is None:
+            return False
+        now = datetime.utcnow()
+        claimed_before = (now - timedelta(seconds=min_interval_seconds)).isoformat() + 'Z'
+        try:
+            with self._lock, conn:
+                cursor = conn.execute(
+                    """INSERT INTO index_state (key, value) VALUES ('refresh_claimed_at', ?)
+                       ON CONFLICT(key) DO UPDATE SET value = excluded.value WHERE value < ?""",
+                    (now.isoformat() + 'Z', claimed_before)
+                )
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Error claiming local search index refresh: {str(e)}")
+            return False
+
+    def get_state(self, key: str) -> Optional[str]:
+        """Read an index bookkeeping value"""
+        conn = self.get_connection()
+        if conn is None:
+            return None
+        try:
+            with self._lock:
+                row = conn.execute("SELECT value FROM index_state WHERE key = ?", (key,)).fetchone()
+            return row['value'] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error reading local search index state: {str(e)}")
+            return None
+
+    def upsert_document(self, document: Dict[str, Any], keywords: Optional[List[str]] = None) -> bool:
+        """Insert or replace a document in the index"""
+        conn = self.get_connection()
+        if conn is None:
+            return False
+        try:
+            with self._lock, conn:
+                self._write_document(conn, document, keywords)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error indexing document locally: {str(e)}")
+            return False
+
+    def update_document(self, document_id: str, status: str, keywords: Optional[List[str]] = None) -> bool:
+        """Update processing status and, when known, the extracted keywords"""
+        conn = self.get_connection()
+        if conn is None:
+            return False
+        try:
+            with self._lock, conn:
+                row = conn.execute("SELECT doc_rowid FROM documents WHERE id = ?", (document_id,)).fetchone()
+                if row is None:
+                    return False
+                conn.execute("UPDATE documents SET processing_status = ? WHERE doc_rowid = ?", (status, row['doc_rowid']))
+                if keywords is not None:
+                    conn.execute(
+                        "UPDATE documents_fts SET keywords = ? WHERE rowid = ?",
+                        (' '.join(keywords), row['doc_rowid'])
+                    )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error updating local search index: {str(e)}")
+            return False
+
+    def rebuild(self, documents: Iterable[Dict[str, Any]], synced_at: str, batch_size: int = 500) -> int:
+        """Replace the index contents with the given documents; they are streamed into staging tables
+        in small transactions and swapped in at the end, so searches keep using the old contents meanwhile"""
+        conn = self.get_connection()
+        if conn is None:
+            return 0
+        # Per-process names: the workers of a pod share the index file
+        staging = {name: f'{name}_staging_{os.getpid()}' for name in LIVE_TABLES}
+        with self._lock:
+            for table in staging.values():
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.executescript(DOCUMENT_TABLES.format(**staging))
+        
+        count = 0
+        for batch in self._batches(documents, batch_size):
+            with self._lock, conn:
+                for document in batch:
+                    self._write_document(conn, document, self._keywords(document), staging)
+            count += len(batch)
+        
+        with self._lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for name, table in staging.items():
+                conn.execute(f"DROP TABLE {name}")
+                conn.execute(f"ALTER TABLE {table} RENAME TO {name}")
+            self._set_state(conn, 'built_at', datetime.utcnow().isoformat() + 'Z')
+            self._set_state(conn, 'synced_at', synced_at)
+            self._set_state(conn, 'changed_at', synced_at)
+        logger.info(f"Rebuilt local search index with {count} documents")
+        return count
+
+    def catch_up(self, documents: Iterable[Dict[str, Any]], synced_at: str, batch_size: int = 500) -> int:
+        """Upsert documents changed since the last sync and advance the sync watermark"""
+        conn = self.get_connection()
+        if conn is None:
+            return 0
+        count = 0
+        for batch in self._batches(documents, batch_size):
+            with self._lock, conn:
+                for document in batch:
+                    self._write_document(conn, document, self._keywords(document))
+            count += len(batch)
+        with self._lock, conn:
+            self._set_state(conn, 'synced_at', synced_at)
+            if count:
+                # Lets every worker of the pod notice that derived indexes (typeahead) are stale
+                self._set_state(conn, 'changed_at', synced_at)
+        return count
+
+    def iter_suggestion_sources(self) -> Iterator[Dict[str, Any]]:
+        """Filename, tags and keywords of every indexed document (feeds the typeahead index)"""
+        conn = self.get_connection()
+        if conn is None:
+            return
+        with self._lock:
+            rows = conn.execute(
+                """SELECT d.filename, d.tags, f.keywords
+                   FROM documents d JOIN documents_fts f ON f.rowid = d.doc_rowid"""
+            ).fetchall()
+        for row in rows:
+            yield {
+                'filename': row['filename'],
+                'tags': json.loads(row['tags'] or '[]'),
+                'keywords': (row['keywords'] or '').split()
+            }
+
+    def search(self, query: str, limit: int = 10, after: Optional[List[Any]] = None) -> Optional[Dict[str, Any]]:
+        """Ranked search with keyset pagination on (rank, id) and the total number of matches;
+        None when the index cannot answer"""
+        conn = self.get_connection()
+        if conn is None:
+            return None
+        match = self._build_match_expression(query)
+        if not match:
+            return {'results': [], 'after': None, 'total_count': 0}
+
+        sql = f"""
+            SELECT * FROM (
+                SELECT d.*, {RANK_EXPRESSION} AS rank
+                FROM documents_fts JOIN documents d ON d.doc_rowid = documents_fts.rowid
+                WHERE documents_fts MATCH ?
+            )
+        """
+        params: List[Any] = [match]
+        if after:
+            sql += " WHERE rank > ? OR (rank = ? AND id > ?)"
+            params.extend([after[0], after[0], after[1]])
+        sql += " ORDER BY rank, id LIMIT ?"
+        params.append(limit + 1)
+
+        try:
+            with self._lock:
+                rows = conn.execute(sql, params).fetchall()
+                total_count = conn.execute(
+                    "SELECT count(*) FROM documents_fts WHERE documents_fts MATCH ?", (match,)
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error searching local index: {str(e)}")
+            return None
+
+        results = []
+        for row in rows[:limit]:
+            results.append({
+                'document_id': row['id'],
+                'filename': row['filename'],
+                'contact_id': row['contact_id'],
+                'document_type': row['document_type'],
+                'description': row['description'],
+                'tags': json.loads(row['tags'] or '[]'),
+                'upload_timestamp': row['upload_timestamp'],
+                'processing_status': row['processing_status'],
+                'size': row['size'],
+                'score': -row['rank']
+            })
+
+        next_after = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_after = [last['rank'], last['id']]
+        return {'results': results, 'after': next_after, 'total_count': total_count}
+
+    def _write_document(self, conn: sqlite3.Connection, document: Dict[str, Any], keywords: Optional[List[str]],
+                        tables: Dict[str, str] = LIVE_TABLES):
+        """Write one document row and its full-text entry under the same rowid"""
+        tags = document.get('tags') or []
+        values = (
+            document.get('contact_id'), document.get('filename', ''), document.get('document_type'),
+            document.get('description', ''), json.dumps(list(tags)), document.get('upload_timestamp'),
+            document.get('processing_status', 'pending'), int(document.get('size', 0))
+        )
+
+        row = conn.execute(f"SELECT doc_rowid FROM {tables['documents']} WHERE id = ?", (document['id'],)).fetchone()
+        if row:
+            doc_rowid = row['doc_rowid']
+            conn.execute(
+                f"""UPDATE {tables['documents']} SET contact_id = ?, filename = ?, document_type = ?, description = ?,
+                   tags = ?, upload_timestamp = ?, processing_status = ?, size = ? WHERE doc_rowid = ?""",
+                values + (doc_rowid,)
+            )
+            conn.execute(f"DELETE FROM {tables['documents_fts']} WHERE rowid = ?", (doc_rowid,))
+        else:
+            doc_rowid = conn.execute(
+                f"""INSERT INTO {tables['documents']}
+                   (id, contact_id, filename, document_type, description, tags, upload_timestamp, processing_status, size)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (document['id'],) + values
+            ).lastrowid
+
+        conn.execute(
+            f"INSERT INTO {tables['documents_fts']} (rowid, filename, description, tags, keywords) VALUES (?, ?, ?, ?, ?)",
+            (
+                doc_rowid, self._tokenize_filename(document.get('filename', '')),
+                document.get('description', ''), ' '.join(tags), ' '.join(keywords or [])
+            )
+        )
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _keywords(document: Dict[str, Any]) -> Optional[List[str]]:
+        return (document.get('processing_metadata') or {}).get('keywords')
+
+    @staticmethod
+    def _batches(documents: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _tokenize_filename(filename: str) -> str:
+        """Split filenames on separators so 'q3_report.pdf' matches 'report'"""
+        return ' '.join(re.split(r'[_\-.\s]+', filename)) + ' ' + filename
+
+    @staticmethod
+    def _build_match_expression(query: str) -> str:
+        """Turn free text into a safe FTS5 expression of prefix terms"""
+        terms = re.findall(r'\w+', query.lower())
+        return ' '.join(f'"{term}"*' for term in terms)
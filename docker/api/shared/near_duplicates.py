@@ -0,0 +1,63 @@
+# Near-Duplicate Index - LSH band buckets kept in DynamoDB so every worker and pod sees every signature
+import os
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from utils.minhash import MinHasher, LSHBands
+
+logger = logging.getLogger(__name__)
+
+class NearDuplicateIndex:
+    """One item per (band bucket, document) carrying the document's signature; a lookup queries the
+    document's band buckets and compares the signatures found there"""
+
+    def __init__(self, aws_clients, threshold: float = 0.8, num_perm: int = 128, bands: int = 16):
+        self.aws_clients = aws_clients
+        self.table_name = os.environ.get('NEAR_DUPLICATE_TABLE', 'realistic-demo-pretamane-near-duplicate-bands')
+        self.threshold = threshold
+        self.bands = LSHBands(num_perm, bands)
+        # Bounds a lookup when boilerplate documents pile into one bucket
+        self.max_bucket_items = int(os.environ.get('NEAR_DUPLICATE_MAX_BUCKET_ITEMS', '200'))
+
+    def get_table(self):
+        return self.aws_clients.get_dynamo_table(self.table_name)
+
+    def insert(self, document_id: str, signature: np.ndarray):
+        """Add a document to its band buckets; rewriting the same document is idempotent"""
+        try:
+            with self.get_table().batch_writer(overwrite_by_pkeys=['band_key', 'document_id']) as batch:
+                for band_key in self.bands.keys(signature):
+                    batch.put_item(Item={
+                        'band_key': band_key,
+                        'document_id': document_id,
+                        'signature': signature.tobytes()
+                    })
+        except ClientError as e:
+            logger.error(f"Error storing near-duplicate bands for {document_id}: {str(e)}")
+            raise
+
+    def query(self, signature: np.ndarray, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Documents whose estimated similarity meets the threshold, most similar first"""
+        table = self.get_table()
+        similarities: Dict[str, float] = {}
+        for band_key in self.bands.keys(signature):
+            response = table.query(
+                KeyConditionExpression=Key('band_key').eq(band_key),
+                Limit=self.max_bucket_items
+            )
+            for item in response.get('Items', []):
+                document_id = item['document_id']
+                if document_id == exclude or document_id in similarities:
+                    continue
+                candidate = np.frombuffer(bytes(item['signature']), dtype=np.uint32)
+                similarities[document_id] = MinHasher.similarity(signature, candidate)
+
+        matches = [
+            {'document_id': document_id, 'similarity': round(similarity, 4)}
+            for document_id, similarity in similarities.items() if similarity >= self.threshold
+        ]
+        return sorted(matches, key=lambda match: -match['similarity'])
@@ -0,0 +1,159 @@
+# Notification Digest - Coalesces document processing notifications into one email per contact per window
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Callable, Optional
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from shared.email_outbox import STATUS_INDEX
+
+logger = logging.getLogger(__name__)
+
+# Status of open digest items in the email-outbox table; the sender only claims 'pending' and 'sending'
+DIGEST_STATUS = 'digest'
+
+class NotificationDigest:
+    """Collects processing notifications per contact in an email-outbox item that comes due when the contact's
+    window closes; any worker of any replica may then turn it into one summary email"""
+
+    def __init__(self, email_service, email_outbox, contact_email_lookup: Callable[[str], Optional[str]]):
+        self.email_service = email_service
+        self.email_outbox = email_outbox
+        self.contact_email_lookup = contact_email_lookup
+        # Digests live in the durable outbox table; without it every notification is sent on its own
+        self.enabled = (os.environ.get('NOTIFICATION_DIGEST_ENABLED', 'true').lower() == 'true'
+                        and email_outbox.enabled)
+        self.window_seconds = float(os.environ.get('NOTIFICATION_DIGEST_WINDOW_SECONDS', '300'))
+        self.max_documents = int(os.environ.get('NOTIFICATION_DIGEST_MAX_DOCUMENTS', '50'))
+        self.check_interval = min(self.window_seconds, 5.0)
+        self.stats = {'notifications': 0, 'emails': 0, 'skipped_no_email': 0}
+
+    @staticmethod
+    def _digest_id(contact_id: str) -> str:
+        return f"digest_{contact_id}"
+
+    def add(self, contact_id: str, document_metadata: Dict[str, Any], processing_status: str):
+        """Record a processed document; the contact's window opens on its first notification"""
+        self.stats['notifications'] += 1
+        summary = self._summary(document_metadata, processing_status)
+        if not self.enabled:
+            self._send(contact_id, [summary])
+            return
+
+        try:
+            documents = self._append(contact_id, [summary])
+        except ClientError as e:
+            logger.error(f"Error adding to the notification digest for {contact_id}, sending it alone: {str(e)}")
+            self._send(contact_id, [summary])
+            return
+        if documents >= self.max_documents:
+            self._flush_digest(contact_id)
+
+    def _append(self, contact_id: str, documents: List[Dict[str, Any]]) -> int:
+        """Append to the contact's open digest item (opening it if needed); returns its document count"""
+        now = int(time.time() * 1000)
+        response = self.email_outbox.get_table().update_item(
+            Key={'id': self._digest_id(contact_id)},
+            UpdateExpression='SET documents = list_append(if_not_exists(documents, :empty), :documents), '
+                             '#status = if_not_exists(#status, :digest), '
+                             'next_attempt_at = if_not_exists(next_attempt_at, :due), '
+                             'created_at = if_not_exists(created_at, :now), contact_id = :contact, kind = :kind',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':empty': [], ':documents': documents, ':digest': DIGEST_STATUS,
+                ':due': now + int(self.window_seconds * 1000), ':now': now,
+                ':contact': contact_id, ':kind': 'processing_digest'
+            },
+            ReturnValues='UPDATED_NEW'
+        )
+        return len(response['Attributes']['documents'])
+
+    @staticmethod
+    def _summary(document_metadata: Dict[str, Any], processing_status: str) -> Dict[str, Any]:
+        return {
+            'filename': document_metadata.get('filename', 'Unknown'),
+            'document_type': document_metadata.get('document_type', 'Unknown'),
+            'size': document_metadata.get('size', 0),
+            'status': processing_status,
+            'processed_at': datetime.utcnow().isoformat() + 'Z'
+        }
+
+    async def run(self):
+        """Flush loop; started as a background task in every worker (a digest is claimed by exactly one)"""
+        if not self.enabled:
+            return
+        while True:
+            try:
+                await asyncio.sleep(self.check_interval)
+                await asyncio.to_thread(self.flush)
+            except asyncio.CancelledError:
+                logger.info("Notification digest flusher cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error flushing notification digests: {str(e)}")
+
+    def flush(self) -> int:
+        """Send a digest for every contact whose window has closed; returns the number sent"""
+        response = self.email_outbox.get_table().query(
+            IndexName=STATUS_INDEX,
+            KeyConditionExpression=Key('status').eq(DIGEST_STATUS) & Key('next_attempt_at').lte(int(time.time() * 1000)),
+            ProjectionExpression='contact_id'
+        )
+        return sum(self._flush_digest(item['contact_id']) for item in response.get('Items', []))
+
+    def _flush_digest(self, contact_id: str) -> bool:
+        """Claim the contact's digest by deleting it (only one process gets its documents) and send it"""
+        try:
+            response = self.email_outbox.get_table().delete_item(
+                Key={'id': self._digest_id(contact_id)},
+                ConditionExpression='#status = :digest',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':digest': DIGEST_STATUS},
+                ReturnValues='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error(f"Error claiming notification digest for {contact_id}: {str(e)}")
+            return False
+
+        documents = response['Attributes']['documents']
+        if self._send(contact_id, documents):
+            return True
+        # The email was not queued: put the documents back so the next window retries them
+        try:
+            self._append(contact_id, documents)
+        except ClientError as e:
+            logger.error(f"Dropped notification digest of {len(documents)} documents for {contact_id}: {str(e)}")
+        return False
+
+    def _send(self, contact_id: str, documents: List[Dict[str, Any]]) -> bool:
+        """Queue the notification (one document) or summary email; False if it should be retried"""
+        try:
+            contact_email = self.contact_email_lookup(contact_id)
+            if not contact_email:
+                self.stats['skipped_no_email'] += 1
+                return True
+            if len(documents) == 1:
+                response = self.email_service.send_processing_notification(
+                    contact_id, documents[0], documents[0]['status'], contact_email
+                )
+            else:
+                response = self.email_service.send_processing_digest(contact_id, documents, contact_email)
+            if response is None:
+                return False
+            self.stats['emails'] += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error sending processing notification digest for {contact_id}: {str(e)}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Notification/email counts"""
+        return {
+            **self.stats,
+            'enabled': self.enabled,
+            'window_seconds': self.window_seconds
+        }
@@ -1,5 +1,6 @@
 # OpenSearch Client - Document indexing and search functionality
 import os
+import asyncio
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
@@ -12,7 +13,9 @@ class OpenSearchService:
     def __init__(self, aws_clients):
         self.aws_clients = aws_clients
         self.index_name = os.environ.get('OPENSEARCH_INDEX', 'documents')
+        self.pit_keep_alive = os.environ.get('OPENSEARCH_PIT_KEEP_ALIVE', '2m')
         self._client = None
+        self._index_ready = False
     
     def get_client(self):
         """Get OpenSearch client"""
@@ -20,15 +23,26 @@ class OpenSearchService:
             self._client = self.aws_clients.get_opensearch_client()
         return self._client
     
-    def create_index_if_not_exists(self) -> bool:
+    def get_async_client(self):
+        """Get pooled async OpenSearch client"""
+        return self.aws_clients.get_async_opensearch_client()
+    
+    def get_async_search_client(self):
+        """Get pooled async OpenSearch client without transport retries (search path)"""
+        return self.aws_clients.get_async_opensearch_search_client()
+    
+    async def create_index_if_not_exists(self) -> bool:
         """Create index if not exists with enhanced mapping (from enhanced_index.py)"""
+        if self._index_ready:
+            return True
         try:
-            opensearch = self.get_client()
+            opensearch = self.get_async_client()
             if not opensearch:
                 logger.warning("OpenSearch client not available")
                 return False
             
-            if opensearch.indices.exists(index=self.index_name):
+            if await opensearch.indices.exists(index=self.index_name):
+                self._index_ready = True
                 return True
             
             mapping = {
@@ -93,27 +107,29 @@ class OpenSearchService:
                 }
             }
             
-            opensearch.indices.create(index=self.index_name, body=mapping)
+            await opensearch.indices.create(index=self.index_name, body=mapping)
             logger.info(f"Created enhanced index: {self.index_name}")
+            self._index_ready = True
             return True
             
         except Exception as e:
             logger.error(f"Error creating OpenSearch index: {str(e)}")
             return False
     
-    def index_document(self, document: Dict[str, Any]) -> bool:
+    async def index_document(self, document: Dict[str, Any]) -> bool:
         """Index document in OpenSearch (from enhanced_index.py)"""
         try:
-            opensearch = self.get_client()
+            opensearch = self.get_async_client()
             if not opensearch:
                 logger.warning("OpenSearch client not available")
                 return False
             
             # Ensure index exists
-            self.create_index_if_not_exists()
+            await self.create_index_if_not_exists()
             
             # Index document
-            opensearch.index(index=self.index_name, body=document)
+            # Keyed by the document id so indexing the same document again replaces its entry
+            await opensearch.index(index=self.index_name, id=document['id'], body=document)
             logger.info(f"Indexed enhanced document: {document['id']}")
             return True
             
@@ -121,15 +137,17 @@ class OpenSearchService:
             logger.error(f"Error indexing document: {str(e)}")
             return False
     
-    def search_documents(self, query: str, filters: Optional[Dict] = None, limit: int = 10) -> Dict[str, Any]:
-        """Search documents in OpenSearch"""
+    async def search_documents(self, query: str, filters: Optional[Dict] = None, limit: int = 10,
+                               pagination: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+                               facet_size: Optional[int] = None) -> Dict[str, Any]:
+        """Search documents in OpenSearch using search_after over a point-in-time context"""
         try:
-            opensearch = self.get_client()
+            opensearch = self.get_async_search_client()
             if not opensearch:
                 logger.warning("OpenSearch client not available")
-                return {'results': [], 'total_count': 0, 'query': query, 'processing_time': 0.0}
+                return {'results': [], 'total_count': 0, 'query': query, 'processing_time': 0.0, 'pagination': None}
             
-            # Build search query
+            # Build search query; (timestamp, id) gives a stable total order for search_after
             search_body = {
                 "query": {
                     "multi_match": {
@@ -137,8 +155,8 @@ class OpenSearchService:
                         "fields": ["filename^2", "text_content", "metadata.keywords"]
                     }
                 },
-                "size": limit,
-                "sort": [{"timestamp": {"order": "desc"}}]
+                "size": limit + 1,
+                "sort": [{"timestamp": {"order": "desc"}}, {"id": {"order": "asc"}}]
             }
             
             # Add filters if provided
@@ -155,14 +173,33 @@ class OpenSearchService:
                         }
                     }
             
-            # Execute search
+            # Facet counts come back from the same round-trip as the hits
+            if facet_size:
+                search_body["aggs"] = self._build_facet_aggregations(facet_size)
+            
+            # Later pages resume in the cursor's point-in-time context; the first page queries the index directly
+            pit_id = pagination.get('pit_id') if pagination else None
+            if pagination and pagination.get('search_after'):
+                search_body["search_after"] = pagination['search_after']
+            
+            # Execute search; a caller-supplied timeout overrides the client default of 30s
+            search_params = {'request_timeout': timeout} if timeout else {}
             start_time = datetime.utcnow()
-            response = opensearch.search(index=self.index_name, body=search_body)
+            if pit_id:
+                search_body["pit"] = {"id": pit_id, "keep_alive": self.pit_keep_alive}
+                response = await opensearch.search(body=search_body, **search_params)
+                pit_id = response.get('pit_id', pit_id)
+            else:
+                response = await opensearch.search(index=self.index_name, body=search_body, **search_params)
             processing_time = (datetime.utcnow() - start_time).total_seconds()
             
+            hits = response['hits']['hits']
+            has_more = len(hits) > limit
+            hits = hits[:limit]
+            
             # Process results
             results = []
-            for hit in response['hits']['hits']:
+            for hit in hits:
                 source = hit['_source']
                 results.append({
                     'document_id': source['id'],
@@ -176,16 +213,89 @@ class OpenSearchService:
                     'score': hit['_score']
                 })
             
+            next_page = None
+            if has_more:
+                if not pagination:
+                    # Only searches with a next page need a snapshot, so single-page results skip the PIT round-trips
+                    pit_id = await self._open_point_in_time()
+                next_page = {'pit_id': pit_id, 'search_after': hits[-1]['sort']}
+            elif pit_id:
+                await self._close_point_in_time(pit_id)
+            
             return {
                 'results': results,
                 'total_count': response['hits']['total']['value'],
+                # OpenSearch stops counting at 10,000 hits and reports a lower bound
+                'total_count_exact': response['hits']['total'].get('relation', 'eq') == 'eq',
                 'query': query,
-                'processing_time': processing_time
+                'processing_time': processing_time,
+                'pagination': next_page,
+                'facets': self._parse_facet_aggregations(response['aggregations']) if 'aggregations' in response else None
             }
             
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
-            return {'results': [], 'total_count': 0, 'query': query, 'processing_time': 0.0}
+            return {'results': [], 'total_count': 0, 'query': query, 'processing_time': 0.0, 'pagination': None}
+    
+    @staticmethod
+    def _build_facet_aggregations(facet_size: int) -> Dict[str, Any]:
+        """Aggregations backing the search filter sidebar"""
+        return {
+            "document_type": {"terms": {"field": "document_type", "size": facet_size}},
+            "contact_id": {"terms": {"field": "contact_id", "size": facet_size}},
+            "file_extension": {"terms": {"field": "metadata.file_extension", "size": facet_size}},
+            "upload_date": {
+                "date_histogram": {"field": "upload_timestamp", "calendar_interval": "day", "min_doc_count": 1}
+            }
+        }
+    
+    @staticmethod
+    def _parse_facet_aggregations(aggregations: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten aggregation buckets into value/count pairs"""
+        facets = {}
+        for name, aggregation in aggregations.items():
+            buckets = aggregation.get('buckets', [])
+            if name == 'upload_date':
+                facets[name] = [{'date': b.get('key_as_string', b['key']), 'count': b['doc_count']} for b in buckets]
+            else:
+                facets[name] = [{'value': b['key'], 'count': b['doc_count']} for b in buckets]
+        return facets
+    
+    async def _open_point_in_time(self) -> Optional[str]:
+        """Open a point-in-time context so the following pages see a consistent snapshot"""
+        opening = asyncio.ensure_future(self._create_point_in_time())
+        try:
+            return await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            # Cancelled mid-request (e.g. the search lost a hedge): close the context once it exists
+            # rather than leaving it open until keep_alive expires
+            opening.add_done_callback(self._close_abandoned_point_in_time)
+            raise
+    
+    def _close_abandoned_point_in_time(self, opening: asyncio.Future):
+        if not opening.cancelled() and opening.result():
+            asyncio.ensure_future(self._close_point_in_time(opening.result()))
+    
+    def release_pagination(self, pagination: Optional[Dict[str, Any]]):
+        """Close the point-in-time context of a cursor that will never be followed"""
+        if pagination and pagination.get('pit_id'):
+            asyncio.ensure_future(self._close_point_in_time(pagination['pit_id']))
+    
+    async def _create_point_in_time(self) -> Optional[str]:
+        try:
+            response = await self.get_async_search_client().create_pit(index=self.index_name, keep_alive=self.pit_keep_alive)
+            return response['pit_id']
+        except Exception as e:
+            # Clusters without PIT support still page correctly on the (timestamp, id) sort
+            logger.warning(f"Point-in-time unavailable, paging without snapshot: {str(e)}")
+            return None
+    
+    async def _close_point_in_time(self, pit_id: str):
+        """Release a point-in-time context once the last page has been served"""
+        try:
+            await self.get_async_search_client().delete_pit(body={"pit_id": [pit_id]})
+        except Exception as e:
+            logger.warning(f"Error closing point-in-time context: {str(e)}")
     
     def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Get document by ID from OpenSearch"""
@@ -216,14 +326,14 @@ class OpenSearchService:
             logger.error(f"Error deleting document: {str(e)}")
             return False
     
-    def get_index_stats(self) -> Dict[str, Any]:
+    async def get_index_stats(self) -> Dict[str, Any]:
         """Get index statistics"""
         try:
-            opensearch = self.get_client()
+            opensearch = self.get_async_client()
             if not opensearch:
                 return {}
             
-            stats = opensearch.indices.stats(index=self.index_name)
+            stats = await opensearch.indices.stats(index=self.index_name)
             return {
                 'total_documents': stats['indices'][self.index_name]['total']['docs']['count'],
                 'index_size': stats['indices'][self.index_name]['total']['store']['size_in_bytes'],
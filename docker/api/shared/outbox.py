@@ -0,0 +1,104 @@
+# Outbox - Deferred side effects (notifications, counters) run off the request path
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class Outbox:
+    """In-process queue of side effects drained by a small worker pool, with retry and backoff"""
+
+    def __init__(self, name: str = 'outbox'):
+        self.name = name
+        self.workers = int(os.environ.get('OUTBOX_WORKERS', '2'))
+        self.max_attempts = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+        self.retry_base_seconds = float(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', '1'))
+        self.drain_timeout = float(os.environ.get('OUTBOX_DRAIN_TIMEOUT_SECONDS', '10'))
+
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.environ.get('OUTBOX_MAX_SIZE', '10000')))
+        self._retrying = 0
+        self.stats = {'enqueued': 0, 'delivered': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]):
+        """Register the (blocking) handler for a kind of entry; it runs in a worker thread and raises on failure"""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> bool:
+        """Queue a side effect; False if the outbox is full and the entry was dropped"""
+        if kind not in self.handlers:
+            raise KeyError(f"No outbox handler registered for '{kind}'")
+        entry = {'kind': kind, 'payload': payload, 'attempts': 0, 'enqueued_at': time.monotonic()}
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            logger.error(f"{self.name} full; dropped {kind} entry")
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    async def run(self):
+        """Worker pool; started as a background task"""
+        logger.info(f"Starting {self.name} with {self.workers} workers")
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+
+    async def _worker(self):
+        while True:
+            try:
+                entry = await self.queue.get()
+            except asyncio.CancelledError:
+                break
+            try:
+                await self._deliver(entry)
+            except asyncio.CancelledError:
+                break
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, entry: Dict[str, Any]):
+        entry['attempts'] += 1
+        try:
+            await asyncio.to_thread(self.handlers[entry['kind']], entry['payload'])
+            self.stats['delivered'] += 1
+        except Exception as e:
+            if entry['attempts'] >= self.max_attempts:
+                self.stats['failed'] += 1
+                logger.error(f"{self.name} gave up on {entry['kind']} after {entry['attempts']} attempts: {str(e)}")
+                return
+            delay = self.retry_base_seconds * (2 ** (entry['attempts'] - 1))
+            self.stats['retried'] += 1
+            logger.warning(f"{self.name} {entry['kind']} attempt {entry['attempts']} failed, retrying in {delay}s: {str(e)}")
+            self._retrying += 1
+            asyncio.get_running_loop().call_later(delay, self._requeue, entry)
+
+    def _requeue(self, entry: Dict[str, Any]):
+        self._retrying -= 1
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            logger.error(f"{self.name} full; dropped {entry['kind']} retry")
+
+    async def stop(self):
+        """Give queued entries a bounded amount of time to drain before shutdown"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        remaining = self.queue.qsize() + self._retrying
+        if remaining:
+            logger.warning(f"{self.name} stopped with {remaining} undelivered entries")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and delivery counters"""
+        return {
+            **self.stats,
+            'depth': self.queue.qsize(),
+            'retrying': self._retrying,
+            'workers': self.workers,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
@@ -0,0 +1,216 @@
+# Rollups - Minute/hour/day activity buckets in the analytics table with write-behind flushing
+import os
+import re
+import time
+import logging
+import threading
+from decimal import Decimal
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Bucket key format and retention per granularity; day buckets are kept indefinitely
+GRANULARITIES = {
+    'minute': {'format': '%Y-%m-%dT%H:%M', 'step': timedelta(minutes=1), 'retention_env': 'ROLLUP_MINUTE_RETENTION_HOURS', 'retention_default': '48'},
+    'hour': {'format': '%Y-%m-%dT%H', 'step': timedelta(hours=1), 'retention_env': 'ROLLUP_HOUR_RETENTION_HOURS', 'retention_default': '2160'},
+    'day': {'format': '%Y-%m-%d', 'step': timedelta(days=1), 'retention_env': None, 'retention_default': None}
+}
+
+class RollupRecorder:
+    """Buffers counter increments per time bucket and flushes them as one ADD per bucket"""
+
+    def __init__(self, aws_clients, table_name: str):
+        self.aws_clients = aws_clients
+        self.table_name = table_name
+        self.flush_interval = float(os.environ.get('ROLLUP_FLUSH_INTERVAL_SECONDS', '10'))
+        self.max_points = int(os.environ.get('ROLLUP_MAX_POINTS', '1000'))
+        self.retention = {
+            name: timedelta(hours=int(os.environ.get(spec['retention_env'], spec['retention_default'])))
+            for name, spec in GRANULARITIES.items() if spec['retention_env']
+        }
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def bucket_id(granularity: str, bucket_start: datetime) -> str:
+        return f"rollup#{granularity}#{bucket_start.strftime(GRANULARITIES[granularity]['format'])}"
+
+    @staticmethod
+    def truncate(timestamp: datetime, granularity: str) -> datetime:
+        """Start of the bucket containing a timestamp"""
+        if granularity == 'minute':
+            return timestamp.replace(second=0, microsecond=0)
+        if granularity == 'hour':
+            return timestamp.replace(minute=0, second=0, microsecond=0)
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def dimension(value: Any) -> str:
+        """Normalize a free-form dimension value so it cannot blow up attribute cardinality"""
+        return re.sub(r'[^a-z0-9_\-]+', '_', str(value or 'unknown').lower())[:40] or 'unknown'
+
+    def record(self, counters: Dict[str, Any], timestamp: Optional[datetime] = None):
+        """Add counters to the minute, hour and day buckets for a timestamp (default: now)"""
+        timestamp = timestamp or datetime.utcnow()
+        with self._lock:
+            for granularity in GRANULARITIES:
+                bucket = self._pending.setdefault(self.bucket_id(granularity, self.truncate(timestamp, granularity)), {})
+                for name, value in counters.items():
+                    bucket[name] = bucket.get(name, 0) + value
+        self._ensure_started()
+
+    def record_contact(self, contact_data: Dict[str, Any]):
+        self.record({'contacts': 1, f"contacts#source#{self.dimension(contact_data.get('source'))}": 1})
+
+    def record_document_created(self, document_data: Dict[str, Any]):
+        self.record({
+            'documents': 1,
+            f"documents#type#{self.dimension(document_data.get('document_type'))}": 1,
+            f"documents#status#{self.dimension(document_data.get('processing_status', 'pending'))}": 1,
+            f"documents#source#{self.dimension(document_data.get('source', 'upload'))}": 1
+        })
+
+    def record_document_completed(self, document_type: Optional[str], processing_seconds: Optional[float]):
+        counters = {
+            'documents#status#completed': 1,
+            f"completed#type#{self.dimension(document_type)}": 1
+        }
+        if processing_seconds is not None and processing_seconds >= 0:
+            counters['processing_seconds_sum'] = Decimal(str(round(processing_seconds, 3)))
+            counters['processing_count'] = 1
+        self.record(counters)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush_loop, name='rollup-flush', daemon=True)
+                    self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still buffered"""
+        self._stopped.set()
+        self.flush()
+
+    def flush(self) -> int:
+        """Write buffered buckets; failed buckets are merged back for the next flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = self.aws_clients.get_dynamo_table(self.table_name)
+        written = 0
+        for bucket_id, counters in pending.items():
+            granularity, bucket_key = bucket_id.split('#')[1:3]
+            names = {'#granularity': 'granularity', '#bucket': 'bucket_start'}
+            values = {':granularity': granularity, ':bucket': bucket_key}
+            set_clauses = ['#granularity = :granularity', '#bucket = :bucket']
+            if granularity in self.retention:
+                bucket_start = datetime.strptime(bucket_key, GRANULARITIES[granularity]['format'])
+                expires_at = bucket_start + GRANULARITIES[granularity]['step'] + self.retention[granularity]
+                names['#expires'] = 'expires_at'
+                values[':expires'] = int((expires_at - datetime(1970, 1, 1)).total_seconds())
+                set_clauses.append('#expires = :expires')
+
+            add_clauses = []
+            for index, (name, value) in enumerate(counters.items()):
+                names[f'#c{index}'] = name
+                values[f':c{index}'] = value
+                add_clauses.append(f'#c{index} :c{index}')
+
+            try:
+                table.update_item(
+                    Key={'id': bucket_id},
+                    UpdateExpression=f"SET {', '.join(set_clauses)} ADD {', '.join(add_clauses)}",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values
+                )
+                written += 1
+            except ClientError as e:
+                logger.error(f"Error flushing rollup bucket {bucket_id}: {str(e)}")
+                with self._lock:
+                    merged = self._pending.setdefault(bucket_id, {})
+                    for name, value in counters.items():
+                        merged[name] = merged.get(name, 0) + value
+        return written
+
+    def bucket_starts(self, start: datetime, end: datetime, granularity: str) -> List[datetime]:
+        """Bucket starts covering [start, end]; raises ValueError past ROLLUP_MAX_POINTS"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+        if end < start:
+            raise ValueError("'to' must not be earlier than 'from'")
+
+        step = GRANULARITIES[granularity]['step']
+        current = self.truncate(start, granularity)
+        if (end - current) // step + 1 > self.max_points:
+            raise ValueError(f"Range covers more than {self.max_points} {granularity} buckets; use a coarser granularity")
+
+        starts = []
+        while current <= end:
+            starts.append(current)
+            current += step
+        return starts
+
+    def get_timeseries(self, start: datetime, end: datetime, granularity: str) -> List[Dict[str, Any]]:
+        """Read the buckets of a range with batched point reads, filling gaps with zeros"""
+        starts = self.bucket_starts(start, end, granularity)
+        ids = [self.bucket_id(granularity, bucket_start) for bucket_start in starts]
+
+        items: Dict[str, Dict[str, Any]] = {}
+        dynamodb = self.aws_clients.dynamodb
+        for offset in range(0, len(ids), 100):
+            request = {self.table_name: {'Keys': [{'id': bucket_id} for bucket_id in ids[offset:offset + 100]]}}
+            attempts = 0
+            while request:
+                response = dynamodb.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self.table_name, []):
+                    items[item['id']] = item
+                request = response.get('UnprocessedKeys') or None
+                if request:
+                    attempts += 1
+                    time.sleep(min(1.0, 0.05 * 2 ** attempts))
+
+        return [self._point(bucket_start, items.get(bucket_id, {})) for bucket_start, bucket_id in zip(starts, ids)]
+
+    @staticmethod
+    def _point(bucket_start: datetime, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape one bucket item into a timeseries point"""
+        point = {
+            'bucket_start': bucket_start.isoformat() + 'Z',
+            'documents': int(item.get('documents', 0)),
+            'contacts': int(item.get('contacts', 0)),
+            'documents_by_type': {},
+            'documents_by_status': {},
+            'documents_by_source': {},
+            'contacts_by_source': {},
+            'completed_by_type': {},
+            'avg_processing_seconds': None
+        }
+        groups = {
+            'documents#type#': 'documents_by_type',
+            'documents#status#': 'documents_by_status',
+            'documents#source#': 'documents_by_source',
+            'contacts#source#': 'contacts_by_source',
+            'completed#type#': 'completed_by_type'
+        }
+        for name, value in item.items():
+            for prefix, field in groups.items():
+                if name.startswith(prefix):
+                    point[field][name[len(prefix):]] = int(value)
+                    break
+
+        processing_count = int(item.get('processing_count', 0))
+        if processing_count:
+            point['avg_processing_seconds'] = round(float(item['processing_seconds_sum']) / processing_count, 3)
+        return point
@@ -0,0 +1,166 @@
+# Scan Engine - Parallel segmented DynamoDB scans with adaptive rate limiting
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, AsyncIterator, Iterator
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+class AdaptiveRateLimiter:
+    """Capacity-unit budget per second: halves on throttling, creeps back up on success"""
+
+    def __init__(self, max_rate: float, min_rate: float = 5.0):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.tokens = max_rate
+        self.updated_at = time.monotonic()
+        self.throttles = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def wait(self):
+        """Block until the budget is no longer in debt"""
+        self._refill()
+        while self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+            self._refill()
+
+    def consume(self, capacity_units: float):
+        """Charge the capacity a page actually consumed and grow the rate additively"""
+        self._refill()
+        self.tokens -= capacity_units
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def throttled(self):
+        self.throttles += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+
+class ParallelScanner:
+    """Segment/TotalSegments scans on the low-level client, streamed as async generators"""
+
+    def __init__(self, client, segments: Optional[int] = None, max_capacity_per_second: Optional[float] = None,
+                 page_size: Optional[int] = None):
+        self.client = client
+        self.segments = segments or int(os.environ.get('SCAN_SEGMENTS', str(min(16, (os.cpu_count() or 1) * 4))))
+        self.max_capacity_per_second = max_capacity_per_second or float(os.environ.get('SCAN_MAX_CAPACITY_PER_SECOND', '1000'))
+        self.page_size = page_size or int(os.environ.get('SCAN_PAGE_SIZE', '0')) or None
+        self.max_retries = 8
+        self._deserializer = TypeDeserializer()
+        self._serializer = TypeSerializer()
+
+    async def scan(self, table_name: str, projection: Optional[str] = None, filter_expression: Optional[str] = None,
+                   names: Optional[Dict[str, str]] = None, values: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every matching item across all segments (unordered)"""
+        async for page in self._scan_pages(table_name, projection, filter_expression, names, values):
+            for item in page['Items']:
+                yield {key: self._deserializer.deserialize(value) for key, value in item.items()}
+
+    async def count(self, table_name: str, filter_expression: Optional[str] = None,
+                    names: Optional[Dict[str, str]] = None, values: Optional[Dict[str, Any]] = None) -> int:
+        """Count matching items with Select=COUNT pages"""
+        total = 0
+        async for page in self._scan_pages(table_name, None, filter_expression, names, values, select_count=True):
+            total += page['Count']
+        return total
+
+    def iter_scan(self, table_name: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Blocking iterator over scan(); for worker threads only, never the event loop thread"""
+        loop = asyncio.new_event_loop()
+        items = self.scan(table_name, **kwargs)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(items.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(items.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def count_sync(self, table_name: str, **kwargs) -> int:
+        """Blocking count(); for worker threads only"""
+        return asyncio.run(self.count(table_name, **kwargs))
+
+    async def _scan_pages(self, table_name: str, projection: Optional[str], filter_expression: Optional[str],
+                          names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]],
+                          select_count: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Run one worker per segment and yield raw pages as they arrive"""
+        request = {'TableName': table_name, 'TotalSegments': self.segments, 'ReturnConsumedCapacity': 'TOTAL'}
+        if select_count:
+            request['Select'] = 'COUNT'
+        if projection:
+            request['ProjectionExpression'] = projection
+        if filter_expression:
+            request['FilterExpression'] = filter_expression
+        if names:
+            request['ExpressionAttributeNames'] = names
+        if values:
+            request['ExpressionAttributeValues'] = {key: self._serializer.serialize(value) for key, value in values.items()}
+        if self.page_size:
+            request['Limit'] = self.page_size
+
+        limiter = AdaptiveRateLimiter(self.max_capacity_per_second)
+        # Bounded queue gives backpressure: segments pause while the consumer is behind
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.segments * 2)
+        done = object()
+        stats = {'pages': 0, 'items': 0, 'capacity_units': 0.0}
+        start_time = time.monotonic()
+
+        async def scan_segment(segment: int):
+            kwargs = dict(request, Segment=segment)
+            attempts = 0
+            try:
+                while True:
+                    await limiter.wait()
+                    try:
+                        response = await asyncio.to_thread(self.client.scan, **kwargs)
+                    except ClientError as e:
+                        if e.response['Error']['Code'] not in THROTTLE_ERRORS or attempts >= self.max_retries:
+                            raise
+                        attempts += 1
+                        limiter.throttled()
+                        await asyncio.sleep(min(5.0, 0.05 * 2 ** attempts))
+                        continue
+                    attempts = 0
+                    limiter.consume(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0.0))
+                    await pages.put(response)
+
+                    if 'LastEvaluatedKey' not in response:
+                        break
+                    kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            except Exception as e:
+                await pages.put(e)
+            await pages.put(done)
+
+        workers = [asyncio.create_task(scan_segment(segment)) for segment in range(self.segments)]
+        remaining = len(workers)
+        try:
+            while remaining:
+                page = await pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    stats['pages'] += 1
+                    stats['items'] += page['Count']
+                    stats['capacity_units'] += page.get('ConsumedCapacity', {}).get('CapacityUnits', 0.0)
+                    yield page
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            logger.info(f"Scanned {table_name}: {stats['items']} items in {stats['pages']} pages, "
+                        f"{stats['capacity_units']:.1f} RCU, {limiter.throttles} throttles, "
+                        f"{self.segments} segments, {time.monotonic() - start_time:.2f}s")
@@ -0,0 +1,167 @@
+# Search Executor - Latency-budgeted, hedged search across OpenSearch and the fallback engine
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class SearchExecutor:
+    """Runs searches under a per-request deadline, hedging slow OpenSearch calls with the fallback engine"""
+
+    def __init__(self, opensearch_service, database_service):
+        self.opensearch_service = opensearch_service
+        self.database_service = database_service
+
+        # Configuration
+        self.deadline = float(os.environ.get('SEARCH_DEADLINE_SECONDS', '3.0'))
+        self.hedge_percentile = float(os.environ.get('SEARCH_HEDGE_PERCENTILE', '95'))
+        self.hedge_min_delay = float(os.environ.get('SEARCH_HEDGE_MIN_DELAY_SECONDS', '0.05'))
+        self.hedge_default_delay = float(os.environ.get('SEARCH_HEDGE_DEFAULT_DELAY_SECONDS', '0.5'))
+        self.min_samples = 20
+
+        # Rolling window of OpenSearch latencies used to place the hedge
+        self.latencies = deque(maxlen=500)
+        self.stats = {
+            'searches': 0,
+            'hedges_started': 0,
+            'deadline_exceeded': 0,
+            'served_by': {'opensearch': 0, 'local': 0, 'dynamodb': 0, 'none': 0}
+        }
+
+    def hedge_delay(self) -> float:
+        """Delay before the fallback is started: the configured percentile of recent OpenSearch latency"""
+        if len(self.latencies) < self.min_samples:
+            delay = self.hedge_default_delay
+        else:
+            ordered = sorted(self.latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+            delay = ordered[index]
+        return max(self.hedge_min_delay, min(delay, self.deadline))
+
+    async def search(self, query: str, filters: Optional[Dict] = None, limit: int = 10,
+                     facet_size: Optional[int] = None) -> Dict[str, Any]:
+        """First page of a search: OpenSearch with a hedged fallback, bounded by the deadline"""
+        self.stats['searches'] += 1
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline
+
+        primary = asyncio.create_task(self._search_opensearch(query, filters, limit, facet_size=facet_size))
+        fallback = None
+        empty_result = None
+        served = None
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            if primary in done:
+                result = primary.result()
+                if result['results']:
+                    served = result
+                    return self._served(result)
+                empty_result = result
+            else:
+                self.stats['hedges_started'] += 1
+                logger.info("OpenSearch slower than hedge threshold, starting fallback search")
+
+            fallback = asyncio.create_task(self._search_fallback(query, limit))
+            pending = {task for task in (primary, fallback) if not task.done()}
+
+            # Take whichever engine answers with hits first
+            while pending:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result['results']:
+                        served = result
+                        return self._served(result)
+                    empty_result = result
+
+            if pending:
+                self.stats['deadline_exceeded'] += 1
+                logger.warning(f"Search deadline of {self.deadline}s exceeded for query: {query}")
+
+            served = empty_result or self._empty_result()
+            return self._served(served)
+        finally:
+            # Cancelling the OpenSearch loser releases its pooled connection (and any point-in-time context it
+            # opened); the fallback thread runs to completion
+            for task in (primary, fallback):
+                if task is not None and not task.done():
+                    task.cancel()
+            # An OpenSearch answer that finished but was not served holds a cursor nobody will follow
+            if primary.done() and not primary.cancelled() and primary.exception() is None and primary.result() is not served:
+                self.opensearch_service.release_pagination(primary.result().get('next_page'))
+
+    async def search_page(self, backend: str, query: str, filters: Optional[Dict], limit: int,
+                          page: Dict[str, Any]) -> Dict[str, Any]:
+        """Subsequent page of a search, pinned to the backend that produced the cursor"""
+        if backend == 'opensearch':
+            coroutine = self._search_opensearch(query, filters, limit, page)
+        else:
+            coroutine = self._search_fallback(query, limit, page)
+
+        try:
+            return self._served(await asyncio.wait_for(coroutine, timeout=self.deadline))
+        except asyncio.TimeoutError:
+            self.stats['deadline_exceeded'] += 1
+            raise TimeoutError(f"Search deadline of {self.deadline}s exceeded")
+
+    async def _search_opensearch(self, query: str, filters: Optional[Dict], limit: int,
+                                 page: Optional[Dict[str, Any]] = None, facet_size: Optional[int] = None) -> Dict[str, Any]:
+        """Run the OpenSearch query and record its latency"""
+        start_time = time.monotonic()
+        try:
+            result = await self.opensearch_service.search_documents(
+                query, filters, limit, page, self.deadline, facet_size=facet_size
+            )
+        except asyncio.CancelledError:
+            # Lost to the hedge - the true latency is unknown, so count it as a deadline-length sample
+            self.latencies.append(self.deadline)
+            raise
+        self.latencies.append(time.monotonic() - start_time)
+
+        return {
+            'results': result['results'],
+            'total_count': result['total_count'],
+            'total_count_exact': result.get('total_count_exact', True),
+            'next_page': result.get('pagination'),
+            'facets': result.get('facets'),
+            'backend': 'opensearch',
+            'engine': 'opensearch'
+        }
+
+    async def _search_fallback(self, query: str, limit: int, page: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the local index (or DynamoDB) fallback query"""
+        result = await asyncio.to_thread(self.database_service.search_documents, query, limit, page)
+        return {
+            'results': result['results'],
+            'total_count': len(result['results']) if result['total_count'] is None else result['total_count'],
+            'total_count_exact': result['total_count'] is not None,
+            'next_page': result['next_page'],
+            'facets': None,
+            'backend': 'fallback',
+            'engine': result['engine']
+        }
+
+    def _served(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Count which engine answered"""
+        self.stats['served_by'][result['engine']] = self.stats['served_by'].get(result['engine'], 0) + 1
+        return result
+
+    @staticmethod
+    def _empty_result() -> Dict[str, Any]:
+        return {'results': [], 'total_count': 0, 'total_count_exact': True, 'next_page': None, 'facets': None, 'backend': 'none', 'engine': 'none'}
+
+    def get_status(self) -> Dict[str, Any]:
+        """Executor configuration and counters"""
+        return {
+            'deadline_seconds': self.deadline,
+            'hedge_delay_seconds': round(self.hedge_delay(), 4),
+            'latency_samples': len(self.latencies),
+            **self.stats
+        }
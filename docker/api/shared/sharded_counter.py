@@ -0,0 +1,112 @@
+# Sharded Counter - Hot-key-free counter spread over N items, with optional write-behind batching
+import os
+import time
+import random
+import logging
+import threading
+from typing import Optional
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+class ShardedCounter:
+    """Counter stored as N shard items (plus the legacy single item) that are summed on read"""
+
+    def __init__(self, aws_clients, table_name: str, counter_id: str, env_prefix: str):
+        self.aws_clients = aws_clients
+        self.table_name = table_name
+        self.counter_id = counter_id
+        self.shards = int(os.environ.get(f'{env_prefix}_SHARDS', '16'))
+        self.write_behind = os.environ.get(f'{env_prefix}_WRITE_BEHIND', 'true').lower() == 'true'
+        self.flush_interval = float(os.environ.get(f'{env_prefix}_FLUSH_INTERVAL_SECONDS', '1'))
+        self.cache_seconds = float(os.environ.get(f'{env_prefix}_CACHE_SECONDS', '2'))
+
+        self._pending = 0
+        self._since_read = 0
+        self._cached_total: Optional[int] = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def shard_keys(self):
+        # The original single item keeps its historical count and is included in the sum
+        return [{'id': self.counter_id}] + [{'id': f"{self.counter_id}#shard#{shard}"} for shard in range(self.shards)]
+
+    def increment(self, amount: int = 1) -> int:
+        """Count an event and return the approximate new total"""
+        if self.write_behind:
+            with self._lock:
+                self._pending += amount
+                self._since_read += amount
+            self._ensure_started()
+        else:
+            self._add_to_shard(amount)
+            with self._lock:
+                self._since_read += amount
+        return self.get()
+
+    def get(self) -> int:
+        """Sum of all shards (cached briefly) plus this process's increments since that read"""
+        if self._cached_total is None or time.monotonic() - self._cached_at >= self.cache_seconds:
+            self._refresh()
+        with self._lock:
+            return (self._cached_total or 0) + self._since_read
+
+    def _refresh(self):
+        try:
+            response = self.aws_clients.dynamodb.batch_get_item(
+                RequestItems={self.table_name: {'Keys': self.shard_keys(), 'ProjectionExpression': '#count',
+                                                'ExpressionAttributeNames': {'#count': 'count'}}}
+            )
+            items = response['Responses'].get(self.table_name, [])
+            if response.get('UnprocessedKeys'):
+                # Partial read - keep the previous total rather than report a dip
+                return
+            total = sum(int(item.get('count', 0)) for item in items)
+            with self._lock:
+                # Unflushed increments are not in the shards yet, so keep counting them locally
+                self._cached_total, self._cached_at = total, time.monotonic()
+                self._since_read = self._pending
+        except ClientError as e:
+            logger.error(f"Error reading sharded counter {self.counter_id}: {str(e)}")
+
+    def _add_to_shard(self, amount: int):
+        table = self.aws_clients.get_dynamo_table(self.table_name)
+        table.update_item(
+            Key={'id': f"{self.counter_id}#shard#{random.randrange(self.shards)}"},
+            UpdateExpression='ADD #count :inc',
+            ExpressionAttributeNames={'#count': 'count'},
+            ExpressionAttributeValues={':inc': amount}
+        )
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush_loop, name=f'{self.counter_id}-flush', daemon=True)
+                    self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the accumulated delta to one random shard; kept for the next flush on failure"""
+        with self._lock:
+            delta, self._pending = self._pending, 0
+        if not delta:
+            return 0
+        try:
+            self._add_to_shard(delta)
+            return delta
+        except ClientError as e:
+            logger.error(f"Error flushing sharded counter {self.counter_id}: {str(e)}")
+            with self._lock:
+                self._pending += delta
+            return 0
+
+    def stop(self):
+        """Stop the flush thread and write out any remaining delta"""
+        self._stopped.set()
+        self.flush()
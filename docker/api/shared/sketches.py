@@ -0,0 +1,164 @@
+# Sketches - HyperLogLog distinct counts shared across pods via the analytics table
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from botocore.exceptions import ClientError
+
+from utils.hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+SKETCHES = ('unique_visitors', 'unique_contacts', 'email_domains', 'uploading_contacts')
+
+class SketchStore:
+    """Accumulates sketch updates locally and CAS-merges them into one DynamoDB item per sketch and window"""
+
+    def __init__(self, aws_clients, table_name: str):
+        self.aws_clients = aws_clients
+        self.table_name = table_name
+        self.precision = int(os.environ.get('HLL_PRECISION', '12'))
+        self.flush_interval = float(os.environ.get('SKETCH_FLUSH_INTERVAL_SECONDS', '30'))
+        self.week_retention = timedelta(weeks=int(os.environ.get('SKETCH_WEEK_RETENTION_WEEKS', '8')))
+        self.max_merge_attempts = 5
+
+        self._pending: Dict[str, HyperLogLog] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def item_id(name: str, window: str) -> str:
+        return f"hll#{name}#{window}"
+
+    @staticmethod
+    def week_window(timestamp: datetime) -> str:
+        year, week, _ = timestamp.isocalendar()
+        return f"week-{year}-W{week:02d}"
+
+    def windows(self, timestamp: Optional[datetime] = None) -> List[str]:
+        return ['all', self.week_window(timestamp or datetime.utcnow())]
+
+    def add(self, name: str, value: Optional[str]):
+        """Count a value towards a sketch's all-time and current-week windows"""
+        if not value:
+            return
+        with self._lock:
+            for window in self.windows():
+                item_id = self.item_id(name, window)
+                if item_id not in self._pending:
+                    self._pending[item_id] = HyperLogLog(self.precision)
+                self._pending[item_id].add(value)
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush_loop, name='sketch-flush', daemon=True)
+                    self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the flush thread and merge whatever is still pending"""
+        self._stopped.set()
+        self.flush()
+
+    def flush(self) -> int:
+        """Merge pending sketches into their stored items; failures are kept for the next flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = self.aws_clients.get_dynamo_table(self.table_name)
+        merged = 0
+        for item_id, sketch in pending.items():
+            if self._merge_into_item(table, item_id, sketch):
+                merged += 1
+            else:
+                with self._lock:
+                    if item_id in self._pending:
+                        self._pending[item_id].merge(sketch)
+                    else:
+                        self._pending[item_id] = sketch
+        return merged
+
+    def _merge_into_item(self, table, item_id: str, sketch: HyperLogLog) -> bool:
+        """Read-merge-write guarded by a version attribute; retried when another pod wins the race"""
+        _, name, window = item_id.split('#', 2)
+        for _ in range(self.max_merge_attempts):
+            try:
+                item = table.get_item(Key={'id': item_id}, ConsistentRead=True).get('Item')
+                if item:
+                    stored = HyperLogLog.from_bytes(bytes(item['registers']), int(item['precision']))
+                    combined = HyperLogLog.from_bytes(stored.to_bytes(), stored.precision).merge(sketch)
+                    if (combined.registers == stored.registers).all():
+                        return True
+                    condition = {'ConditionExpression': '#version = :version',
+                                 'ExpressionAttributeNames': {'#version': 'version'},
+                                 'ExpressionAttributeValues': {':version': item['version']}}
+                    version = int(item['version']) + 1
+                else:
+                    combined = sketch
+                    condition = {'ConditionExpression': 'attribute_not_exists(id)'}
+                    version = 1
+
+                new_item = {
+                    'id': item_id,
+                    'sketch': name,
+                    'window': window,
+                    'precision': combined.precision,
+                    'registers': combined.to_bytes(),
+                    'version': version,
+                    'updated_at': datetime.utcnow().isoformat() + 'Z'
+                }
+                if window.startswith('week-'):
+                    week_start = datetime.strptime(window[len('week-'):] + '-1', '%G-W%V-%u')
+                    new_item['expires_at'] = int((week_start + timedelta(weeks=1) + self.week_retention - datetime(1970, 1, 1)).total_seconds())
+                table.put_item(Item=new_item, **condition)
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                    continue
+                logger.error(f"Error merging sketch {item_id}: {str(e)}")
+                return False
+        logger.warning(f"Gave up merging sketch {item_id} after {self.max_merge_attempts} attempts")
+        return False
+
+    def get_cardinalities(self) -> Dict[str, Dict[str, Any]]:
+        """Estimated distinct counts per sketch for all time and the current week"""
+        all_window, week_window = self.windows()
+        ids = [self.item_id(name, window) for name in SKETCHES for window in (all_window, week_window)]
+
+        response = self.aws_clients.dynamodb.batch_get_item(
+            RequestItems={self.table_name: {'Keys': [{'id': item_id} for item_id in ids]}}
+        )
+        sketches = {
+            item['id']: HyperLogLog.from_bytes(bytes(item['registers']), int(item['precision']))
+            for item in response['Responses'].get(self.table_name, [])
+        }
+        # Include this pod's not-yet-flushed updates
+        with self._lock:
+            for item_id, pending in self._pending.items():
+                if item_id in sketches:
+                    sketches[item_id].merge(pending)
+                elif item_id in ids:
+                    sketches[item_id] = HyperLogLog.from_bytes(pending.to_bytes(), pending.precision)
+
+        def estimate(item_id: str) -> int:
+            sketch = sketches.get(item_id)
+            return sketch.count() if sketch else 0
+
+        return {
+            name: {
+                'all_time': estimate(self.item_id(name, all_window)),
+                'this_week': estimate(self.item_id(name, week_window)),
+                'week': week_window[len('week-'):]
+            }
+            for name in SKETCHES
+        }
@@ -0,0 +1,119 @@
+# Suggest Index - Compact in-process prefix index for search-box typeahead
+import re
+import bisect
+import logging
+import threading
+from typing import Dict, Any, List, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Entry key: (normalized prefix key, suggestion type, display text)
+Entry = Tuple[str, str, str]
+# Suggestion: (suggestion type, display text)
+Suggestion = Tuple[str, str]
+
+class PrefixIndex:
+    """Sorted-array prefix index; short prefixes (whose ranges are huge) are answered from a per-prefix
+    top-k kept up to date on insert, longer ones with a bisect plus a bounded scan of their range"""
+
+    def __init__(self, max_term_length: int = 100, top_prefix_length: int = 4, top_k: int = 50,
+                 max_scan: int = 2000):
+        self.max_term_length = max_term_length
+        self.top_prefix_length = top_prefix_length
+        self.top_k = top_k
+        # Past the top-k lengths ranges are small; the cap only bounds pathological ones (ranked within
+        # the first max_scan entries in key order)
+        self.max_scan = max_scan
+        self._keys: List[Entry] = []
+        self._weights: Dict[Entry, int] = {}
+        self._top: Dict[str, Dict[Suggestion, int]] = {}
+        self._lock = threading.Lock()
+
+    def add_document(self, filename: str = '', keywords: Iterable[str] = (), tags: Iterable[str] = ()):
+        """Index completions for one document"""
+        with self._lock:
+            for entry in self._entries_for(filename, keywords, tags):
+                if entry in self._weights:
+                    self._weights[entry] += 1
+                else:
+                    self._weights[entry] = 1
+                    bisect.insort(self._keys, entry)
+                self._update_top(self._top, entry, self._weights[entry])
+
+    def bulk_load(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Rebuild the index from document sources in one sort"""
+        weights: Dict[Entry, int] = {}
+        count = 0
+        for document in documents:
+            for entry in self._entries_for(document.get('filename', ''), document.get('keywords'), document.get('tags')):
+                weights[entry] = weights.get(entry, 0) + 1
+            count += 1
+        keys = sorted(weights)
+        top: Dict[str, Dict[Suggestion, int]] = {}
+        for entry, weight in weights.items():
+            self._update_top(top, entry, weight)
+
+        with self._lock:
+            self._keys, self._weights, self._top = keys, weights, top
+        return count
+
+    def _update_top(self, top: Dict[str, Dict[Suggestion, int]], entry: Entry, weight: int):
+        """Record an entry's new weight in the top-k of each short prefix of its key; exact because weights only grow"""
+        suggestion = (entry[1], entry[2])
+        for length in range(1, min(len(entry[0]), self.top_prefix_length) + 1):
+            leaders = top.setdefault(entry[0][:length], {})
+            if suggestion in leaders:
+                leaders[suggestion] = max(leaders[suggestion], weight)
+            elif len(leaders) < self.top_k:
+                leaders[suggestion] = weight
+            else:
+                weakest = min(leaders, key=leaders.get)
+                if weight > leaders[weakest]:
+                    del leaders[weakest]
+                    leaders[suggestion] = weight
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top completions for a prefix, most frequent first"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        with self._lock:
+            if len(prefix) <= self.top_prefix_length:
+                candidates = dict(self._top.get(prefix, {}))
+            else:
+                candidates = {}
+                position = bisect.bisect_left(self._keys, (prefix,))
+                end = min(position + self.max_scan, len(self._keys))
+                while position < end and self._keys[position][0].startswith(prefix):
+                    entry = self._keys[position]
+                    suggestion = (entry[1], entry[2])
+                    candidates[suggestion] = max(candidates.get(suggestion, 0), self._weights[entry])
+                    position += 1
+
+        ranked = sorted(candidates.items(), key=lambda item: (-item[1], len(item[0][1]), item[0][1]))
+        return [{'text': text, 'type': kind, 'weight': weight} for (kind, text), weight in ranked[:limit]]
+
+    def _entries_for(self, filename: str, keywords: Iterable[str], tags: Iterable[str]) -> List[Entry]:
+        """Index entries for one document's filename, keywords and tags"""
+        entries = []
+        if filename:
+            # Filenames complete on the whole name and on each word inside it
+            for key in {filename.lower(), *self._filename_tokens(filename)}:
+                entries.append((key, 'filename', filename))
+        for keyword in keywords or []:
+            entries.append((keyword.lower(), 'keyword', keyword))
+        for tag in tags or []:
+            tag = tag.strip()
+            if tag:
+                entries.append((tag.lower(), 'tag', tag))
+        return [entry for entry in entries if entry[0] and len(entry[0]) <= self.max_term_length]
+
+    @staticmethod
+    def _filename_tokens(filename: str) -> List[str]:
+        """Words inside a filename, e.g. 'q3_sales-report.pdf' -> q3, sales, report"""
+        stem = filename.rsplit('.', 1)[0].lower()
+        return [token for token in re.split(r'[_\-.\s]+', stem) if len(token) > 1]
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,243 @@
+# Vector Index - Hashing-vectorizer embeddings in memory-mapped fixed-size records on EFS
+import os
+import re
+import fcntl
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fixed id field per record; document ids are UUIDs
+ID_BYTES = 64
+
+class HashingVectorizer:
+    """Stateless bag-of-words embedding: signed feature hashing, sublinear tf, L2-normalized"""
+
+    def __init__(self, dimensions: int = 512, keyword_weight: float = 2.0):
+        self.dimensions = dimensions
+        self.keyword_weight = keyword_weight
+
+    def _bucket(self, token: str):
+        digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+        return digest % self.dimensions, 1.0 if (digest >> 63) & 1 else -1.0
+
+    def vectorize(self, text: str, keywords: Iterable[str] = ()) -> Optional[np.ndarray]:
+        """Embed text plus extracted keywords; None when there is nothing to embed"""
+        counts: Dict[str, float] = {}
+        for token in re.findall(r'[a-z0-9]{2,}', text.lower()):
+            counts[token] = counts.get(token, 0.0) + 1.0
+        for keyword in keywords or []:
+            token = keyword.lower()
+            counts[token] = counts.get(token, 0.0) + self.keyword_weight
+        if not counts:
+            return None
+
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token, count in counts.items():
+            index, sign = self._bucket(token)
+            vector[index] += sign * (1.0 + np.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+class VectorIndex:
+    """Append-only vector store with exact batched cosine search and optional IVF partitions"""
+
+    def __init__(self, path: Optional[str] = None, dimensions: Optional[int] = None):
+        self.path = path or os.environ.get('VECTOR_INDEX_PATH', '/mnt/efs/vector-index')
+        self.dimensions = dimensions or int(os.environ.get('VECTOR_DIMENSIONS', '512'))
+        self.enabled = os.environ.get('VECTOR_INDEX_ENABLED', 'true').lower() == 'true'
+        self.batch_rows = int(os.environ.get('VECTOR_SEARCH_BATCH_ROWS', '65536'))
+        self.ivf_min_documents = int(os.environ.get('VECTOR_IVF_MIN_DOCUMENTS', '50000'))
+        self.ivf_probes = int(os.environ.get('VECTOR_IVF_PROBES', '8'))
+
+        # One fixed-size record per row holds the id and its vector, so a row can never lose its id
+        self.records_path = os.path.join(self.path, 'records.bin')
+        self.record_dtype = np.dtype([('id', f'S{ID_BYTES}'), ('vector', '<f4', (self.dimensions,))])
+
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._row_ids: List[str] = []
+        self._id_rows: Dict[str, int] = {}
+
+        # IVF partitions: centroids plus row lists; rows appended after a build go to their nearest list
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._partitioned_rows = 0
+
+    def append(self, document_id: str, vector: np.ndarray) -> bool:
+        """Append one document vector; re-appending an id supersedes its earlier row"""
+        if not self.enabled:
+            return False
+        encoded_id = document_id.encode('utf-8')
+        if len(encoded_id) > ID_BYTES:
+            logger.error(f"Document id too long for the vector index: {document_id}")
+            return False
+
+        record = np.zeros(1, dtype=self.record_dtype)
+        record['id'] = encoded_id
+        record['vector'] = vector
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self.records_path, 'ab') as records_file:
+                # Pods share the file on EFS, so serialize writers to keep records on record boundaries
+                fcntl.flock(records_file, fcntl.LOCK_EX)
+                try:
+                    # Drop the torn tail of a writer that died mid-record
+                    size = os.fstat(records_file.fileno()).st_size
+                    if size % self.record_dtype.itemsize:
+                        os.ftruncate(records_file.fileno(), size - size % self.record_dtype.itemsize)
+                    records_file.write(record.tobytes())
+                    records_file.flush()
+                    os.fsync(records_file.fileno())
+                finally:
+                    fcntl.flock(records_file, fcntl.LOCK_UN)
+            return True
+        except OSError as e:
+            logger.error(f"Error appending to vector index: {str(e)}")
+            return False
+
+    def refresh(self) -> int:
+        """Re-map the matrix if other writers have appended rows since the last look"""
+        if not self.enabled or not os.path.exists(self.records_path):
+            return 0
+
+        with self._lock:
+            # Only map complete records; a concurrent writer may be mid-append
+            rows = os.path.getsize(self.records_path) // self.record_dtype.itemsize
+            if rows > len(self._row_ids):
+                records = np.memmap(self.records_path, dtype=self.record_dtype, mode='r', shape=(rows,))
+                for encoded_id in records['id'][len(self._row_ids):]:
+                    document_id = encoded_id.decode('utf-8')
+                    self._id_rows[document_id] = len(self._row_ids)
+                    self._row_ids.append(document_id)
+                self._matrix = records['vector']
+                self._assign_new_rows()
+            return len(self._row_ids)
+
+    def get_vector(self, document_id: str) -> Optional[np.ndarray]:
+        row = self._id_rows.get(document_id)
+        if row is None or self._matrix is None or row >= self._matrix.shape[0]:
+            return None
+        return np.asarray(self._matrix[row])
+
+    def similar(self, document_id: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+        """Most similar documents to an indexed document; None if it has no vector"""
+        self.refresh()
+        vector = self.get_vector(document_id)
+        if vector is None:
+            return None
+        return self.search(vector, limit, exclude=document_id)
+
+    def search(self, vector: np.ndarray, limit: int = 10, exclude: Optional[str] = None) -> Dict[str, Any]:
+        """Top-k cosine similarity; probes IVF partitions when built, otherwise scans every row"""
+        with self._lock:
+            matrix = self._matrix
+            if matrix is None:
+                return {'results': [], 'engine': 'exact', 'scanned': 0}
+            # Over-fetch so superseded rows and the query document can be dropped afterwards
+            fetch = limit + 1 + max(0, len(self._row_ids) - len(self._id_rows))
+            if self._centroids is not None:
+                candidates = self._probe(vector)
+                rows, scores = self._top_k_rows(matrix, vector, fetch, candidates)
+                engine, scanned = 'ivf', len(candidates)
+            else:
+                rows, scores = self._top_k_rows(matrix, vector, fetch)
+                engine, scanned = 'exact', matrix.shape[0]
+
+            results = []
+            for row, score in zip(rows, scores):
+                document_id = self._row_ids[row]
+                if document_id == exclude or self._id_rows.get(document_id) != row:
+                    continue
+                results.append({'document_id': document_id, 'score': round(float(score), 4)})
+                if len(results) == limit:
+                    break
+        return {'results': results, 'engine': engine, 'scanned': scanned}
+
+    def _top_k_rows(self, matrix: np.ndarray, vector: np.ndarray, k: int, candidates: Optional[np.ndarray] = None):
+        """Batched dot products (rows are unit length, so dot == cosine) with a running top-k"""
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        total = matrix.shape[0] if candidates is None else len(candidates)
+
+        for start in range(0, total, self.batch_rows):
+            if candidates is None:
+                rows = np.arange(start, min(start + self.batch_rows, total))
+                scores = matrix[start:start + self.batch_rows] @ vector
+            else:
+                rows = candidates[start:start + self.batch_rows]
+                scores = matrix[rows] @ vector
+            rows = np.concatenate([best_rows, rows])
+            scores = np.concatenate([best_scores, scores])
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[keep], scores[keep]
+            best_rows, best_scores = rows, scores
+
+        order = np.argsort(-best_scores)
+        return best_rows[order], best_scores[order]
+
+    def build_partitions(self, iterations: int = 10, sample_size: int = 100000, seed: int = 1) -> bool:
+        """Coarse k-means partitioning (IVF) once the corpus is large enough to need it"""
+        rows = self.refresh()
+        if rows < self.ivf_min_documents:
+            return False
+
+        matrix = self._matrix
+        rng = np.random.default_rng(seed)
+        lists = max(1, int(np.sqrt(rows)))
+        sample = np.asarray(matrix[np.sort(rng.choice(rows, size=min(rows, sample_size), replace=False))])
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for index in range(lists):
+                members = sample[assignment == index]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[index] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        assignment = np.concatenate([
+            np.argmax(np.asarray(matrix[start:start + self.batch_rows]) @ centroids.T, axis=1)
+            for start in range(0, rows, self.batch_rows)
+        ])
+        with self._lock:
+            self._centroids = centroids
+            self._lists = [np.flatnonzero(assignment == index) for index in range(lists)]
+            self._partitioned_rows = rows
+            self._assign_new_rows()
+        logger.info(f"Vector index partitioned {rows} rows into {lists} lists")
+        return True
+
+    def _assign_new_rows(self):
+        """Route rows appended since the last partition build to their nearest list"""
+        if self._centroids is None or self._matrix is None or self._matrix.shape[0] <= self._partitioned_rows:
+            return
+        start = self._partitioned_rows
+        assignment = np.argmax(np.asarray(self._matrix[start:]) @ self._centroids.T, axis=1)
+        for index in np.unique(assignment):
+            self._lists[index] = np.concatenate([self._lists[index], start + np.flatnonzero(assignment == index)])
+        self._partitioned_rows = self._matrix.shape[0]
+
+    def _probe(self, vector: np.ndarray) -> np.ndarray:
+        """Rows in the lists whose centroids are closest to the query"""
+        probes = min(self.ivf_probes, len(self._centroids))
+        nearest = np.argpartition(-(self._centroids @ vector), probes - 1)[:probes]
+        return np.sort(np.concatenate([self._lists[index] for index in nearest]))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size and partitioning state"""
+        return {
+            'enabled': self.enabled,
+            'rows': 0 if self._matrix is None else int(self._matrix.shape[0]),
+            'documents': len(self._id_rows),
+            'dimensions': self.dimensions,
+            'partitions': 0 if self._centroids is None else len(self._centroids)
+        }
@@ -0,0 +1,57 @@
+# HyperLogLog - Mergeable approximate distinct counting in a few kilobytes
+import math
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+class HyperLogLog:
+    """HyperLogLog sketch with one byte per register (2^precision registers)"""
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.size, dtype=np.uint8)
+        self._suffix_bits = 64 - precision
+
+    def add(self, value: str) -> bool:
+        """Add a value; True if a register changed (i.e. the sketch needs flushing)"""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = hashed >> self._suffix_bits
+        suffix = hashed & ((1 << self._suffix_bits) - 1)
+        rank = self._suffix_bits - suffix.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Union in place: register-wise maximum"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct values (linear counting for small cardinalities)"""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def is_empty(self) -> bool:
+        return not self.registers.any()
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = 12) -> 'HyperLogLog':
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        if len(registers) != 1 << precision:
+            raise ValueError("Register array does not match precision")
+        return cls(precision, registers)
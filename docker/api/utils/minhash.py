@@ -0,0 +1,67 @@
+# MinHash utilities - Near-duplicate detection with MinHash signatures and LSH banding
+import re
+import hashlib
+import logging
+from typing import List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime 2^31 - 1 keeps a * h + b inside uint64 for 32-bit shingle hashes
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+class MinHasher:
+    """Computes MinHash signatures over word shingles with vectorized permutations"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(MERSENNE_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        """Overlapping word n-grams of the normalized text"""
+        words = re.findall(r'\w+', text.lower())
+        if len(words) <= self.shingle_size:
+            return {' '.join(words)} if words else set()
+        return {' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str, chunk_size: int = 4096) -> Optional[np.ndarray]:
+        """MinHash signature (uint32 per permutation); None for empty text"""
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+
+        # Stable 32-bit shingle hashes so signatures agree across pods and restarts
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        ) % MERSENNE_PRIME
+
+        signature = np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        for start in range(0, len(hashes), chunk_size):
+            block = hashes[start:start + chunk_size]
+            permuted = (self.a * block + self.b) % MERSENNE_PRIME
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the underlying shingle sets"""
+        return float(np.count_nonzero(first == second)) / len(first)
+
+class LSHBands:
+    """Splits MinHash signatures into LSH bands; documents that share any band are near-duplicate candidates"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+
+    def keys(self, signature: np.ndarray) -> List[str]:
+        """One bucket key per band: the band number and the hex of its rows"""
+        return [f"{band}#{signature[band * self.rows:(band + 1) * self.rows].tobytes().hex()}" for band in range(self.bands)]
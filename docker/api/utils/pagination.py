@@ -0,0 +1,45 @@
+# Pagination utilities - Opaque cursor encoding for paginated endpoints
+import json
+import base64
+import hashlib
+import logging
+from decimal import Decimal
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class CursorCodec:
+    """Encode and decode opaque pagination cursors"""
+
+    @staticmethod
+    def encode(state: Dict[str, Any]) -> str:
+        """Encode cursor state as a URL-safe token"""
+        raw = json.dumps(state, separators=(',', ':'), default=CursorCodec._json_default)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode(cursor: str) -> Dict[str, Any]:
+        """Decode a cursor token back into its state"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Rejected malformed cursor: {str(e)}")
+            raise ValueError("Invalid pagination cursor")
+
+        if not isinstance(state, dict):
+            raise ValueError("Invalid pagination cursor")
+        return state
+
+    @staticmethod
+    def fingerprint(*parts: Any) -> str:
+        """Short stable hash used to bind a cursor to the query that produced it"""
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def _json_default(value: Any):
+        """Serialize DynamoDB numeric types inside keys"""
+        if isinstance(value, Decimal):
+            return int(value) if value == value.to_integral_value() else float(value)
+        raise TypeError(f"Unserializable cursor value: {type(value).__name__}")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark the OpenSearch search path: blocking client vs pooled async client.
+
+Starts a local OpenSearch-compatible stand-in (fixed per-request latency) and
+measures search throughput per worker at increasing concurrency.
+
+Usage: python3 scripts/benchmark-opensearch-client.py [--latency-ms 20] [--requests 400]
+"""
+import os, sys, time, asyncio, argparse, threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'docker' / 'api'))
+
+from aiohttp import web
+
+HIT = {'_score': 1.0, 'sort': [0, 'doc'], '_source': {
+    'id': 'doc', 'filename': 'report.pdf', 'contact_id': 'c1', 'document_type': 'report',
+    'upload_timestamp': '2024-01-01T00:00:00Z', 'processing_info': {'status': 'completed'}}}
+
+def start_stand_in(port: int, latency: float):
+    """Serve the stand-in from its own thread so the blocking client cannot stall it"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(build_stand_in(port, latency))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+
+async def build_stand_in(port: int, latency: float):
+    async def search(request):
+        await asyncio.sleep(latency)
+        return web.json_response({'took': int(latency * 1000), 'hits': {'total': {'value': 1}, 'hits': [HIT]}})
+
+    async def pit(request):
+        return web.json_response({'pit_id': 'stand-in-pit'})
+
+    app = web.Application()
+    app.router.add_route('*', '/{index}/_search', search)
+    app.router.add_route('*', '/_search', search)
+    app.router.add_route('*', '/{index}/_search/point_in_time', pit)
+    app.router.add_route('*', '/_search/point_in_time', pit)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+
+async def run_blocking(client, concurrency: int, total: int) -> float:
+    """Sync client called from coroutines - what the routes did before"""
+    async def one():
+        client.search(index='documents', body={'query': {'match_all': {}}})
+    return await drive(one, concurrency, total)
+
+async def run_async(service, concurrency: int, total: int) -> float:
+    async def one():
+        await service.search_documents('report', limit=10)
+    return await drive(one, concurrency, total)
+
+async def drive(request, concurrency: int, total: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--port', type=int, default=9299)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENSEARCH_ENDPOINT', f'http://127.0.0.1:{args.port}')
+    os.environ.setdefault('OPENSEARCH_USERNAME', 'admin')
+    os.environ.setdefault('OPENSEARCH_PASSWORD', 'admin')
+    os.environ.setdefault('OPENSEARCH_USE_SSL', 'false')
+
+    from opensearchpy import OpenSearch
+    from shared.aws_clients import AWSClientManager
+    from shared.opensearch_client import OpenSearchService
+
+    start_stand_in(args.port, args.latency_ms / 1000)
+    blocking = OpenSearch(hosts=[os.environ['OPENSEARCH_ENDPOINT']])
+    aws_clients = AWSClientManager()
+    service = OpenSearchService(aws_clients)
+
+    print(f"Stand-in latency {args.latency_ms}ms, {args.requests} requests per run")
+    print(f"{'concurrency':>12} {'blocking req/s':>16} {'async req/s':>14}")
+    try:
+        for concurrency in (1, 4, 16, 32, 64):
+            sync_rate = await run_blocking(blocking, concurrency, args.requests)
+            async_rate = await run_async(service, concurrency, args.requests)
+            print(f"{concurrency:>12} {sync_rate:>16.1f} {async_rate:>14.1f}")
+    finally:
+        await aws_clients.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
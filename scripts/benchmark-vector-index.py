@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Benchmark the local vector index: exact batched cosine scan vs IVF partitions.
+
+Writes a synthetic corpus of unit vectors (clustered, like real topic mixes) to a
+temporary index directory, then measures "more like this" query latency and
+IVF recall against the exact scan.
+
+Usage: python3 scripts/benchmark-vector-index.py [--documents 1000000] [--dimensions 512] [--queries 50]
+"""
+import os, sys, time, shutil, argparse, tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'docker' / 'api'))
+
+from shared.vector_index import VectorIndex
+
+def write_corpus(index: VectorIndex, documents: int, topics: int, chunk: int = 100000):
+    """Write records directly in bulk; append() is one fsync'd write per document"""
+    rng = np.random.default_rng(7)
+    centres = rng.standard_normal((topics, index.dimensions)).astype(np.float32)
+    os.makedirs(index.path, exist_ok=True)
+    with open(index.records_path, 'wb') as records_file:
+        for start in range(0, documents, chunk):
+            count = min(chunk, documents - start)
+            block = centres[rng.integers(0, topics, count)] + 0.6 * rng.standard_normal((count, index.dimensions)).astype(np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+            records = np.zeros(count, dtype=index.record_dtype)
+            records['id'] = [f"doc-{start + i}".encode('utf-8') for i in range(count)]
+            records['vector'] = block
+            records_file.write(records.tobytes())
+
+def measure(index: VectorIndex, query_ids, limit: int):
+    latencies, results = [], []
+    for document_id in query_ids:
+        start = time.perf_counter()
+        result = index.similar(document_id, limit)
+        latencies.append(time.perf_counter() - start)
+        results.append({item['document_id'] for item in result['results']})
+    latencies.sort()
+    return latencies, results
+
+def report(label: str, latencies):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+    print(f"{label:<8} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=1000000)
+    parser.add_argument('--dimensions', type=int, default=512)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--probes', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='vector-index-')
+    os.environ['VECTOR_IVF_MIN_DOCUMENTS'] = '1'
+    os.environ['VECTOR_IVF_PROBES'] = str(args.probes)
+    try:
+        index = VectorIndex(workdir, args.dimensions)
+        start = time.perf_counter()
+        write_corpus(index, args.documents, args.topics)
+        print(f"Wrote {args.documents} x {args.dimensions} vectors "
+              f"({os.path.getsize(index.records_path) / 2**30:.2f} GiB) in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index.refresh()
+        print(f"Mapped index in {time.perf_counter() - start:.2f}s")
+
+        query_ids = [f"doc-{i}" for i in np.random.default_rng(11).integers(0, args.documents, args.queries)]
+        measure(index, query_ids[:3], args.limit)  # warm the page cache
+        exact_latencies, exact_results = measure(index, query_ids, args.limit)
+        report('exact', exact_latencies)
+
+        start = time.perf_counter()
+        index.build_partitions()
+        print(f"Built {index.get_stats()['partitions']} IVF partitions in {time.perf_counter() - start:.1f}s")
+        ivf_latencies, ivf_results = measure(index, query_ids, args.limit)
+        report('ivf', ivf_latencies)
+
+        recall = np.mean([len(a & b) / max(1, len(a)) for a, b in zip(exact_results, ivf_results)])
+        print(f"IVF recall@{args.limit} vs exact: {recall:.3f} (probes={args.probes})")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,11 @@ resource "aws_dynamodb_table" "contact_submissions" {
     type = "S"
   }
 
+  attribute {
+    name = "email_normalized"
+    type = "S"
+  }
+
   # Global Secondary Index for email queries
   global_secondary_index {
     name     = "email-index"
@@ -32,6 +37,15 @@ resource "aws_dynamodb_table" "contact_submissions" {
     projection_type = "ALL"
   }
 
+  # Case-insensitive contact lookup by email, newest submission first
+  global_secondary_index {
+    name               = "contact-email-index"
+    hash_key           = "email_normalized"
+    range_key          = "timestamp"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["name", "email", "company", "service", "status", "source", "submission_count"]
+  }
+
   # Global Secondary Index for timestamp queries
   global_secondary_index {
     name     = "timestamp-index"
@@ -136,6 +150,150 @@ resource "aws_dynamodb_table" "documents" {
   }
 }
 
+# Analytics Table (incrementally maintained aggregates)
+resource "aws_dynamodb_table" "analytics" {
+  name           = "${var.project_name}-analytics"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  # Expire minute and hour rollup buckets once they are past retention
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  # Point-in-time recovery
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  # Server-side encryption
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-analytics"
+    Environment = var.environment
+    Project     = var.project_name
+  }
+}
+
+# Email Outbox Table (durable queue drained by the SES sender)
+resource "aws_dynamodb_table" "email_outbox" {
+  name           = "${var.project_name}-email-outbox"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  attribute {
+    name = "status"
+    type = "S"
+  }
+
+  attribute {
+    name = "next_attempt_at"
+    type = "N"
+  }
+
+  # Due messages per status, oldest first
+  global_secondary_index {
+    name            = "status-next-attempt-index"
+    hash_key        = "status"
+    range_key       = "next_attempt_at"
+    projection_type = "ALL"
+  }
+
+  # Expire sent and failed messages once they are past retention
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  # Point-in-time recovery
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  # Server-side encryption
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-email-outbox"
+    Environment = var.environment
+    Project     = var.project_name
+  }
+}
+
+# Near-Duplicate Bands Table (MinHash LSH buckets shared by every replica)
+resource "aws_dynamodb_table" "near_duplicate_bands" {
+  name           = "${var.project_name}-near-duplicate-bands"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "band_key"
+  range_key      = "document_id"
+
+  attribute {
+    name = "band_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "document_id"
+    type = "S"
+  }
+
+  # Server-side encryption
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-near-duplicate-bands"
+    Environment = var.environment
+    Project     = var.project_name
+  }
+}
+
+# Idempotency Table (Idempotency-Key records for retried submissions)
+resource "aws_dynamodb_table" "idempotency" {
+  name           = "${var.project_name}-idempotency"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  # Expire stored responses once the replay window has passed
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  # Server-side encryption
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-idempotency"
+    Environment = var.environment
+    Project     = var.project_name
+  }
+}
+
 # ---------------------------
 # SES Configuration
 # ---------------------------
@@ -166,6 +324,13 @@ resource "aws_ses_configuration_set" "main" {
   reputation_metrics_enabled = true
 }
 
+# Pass-through template used by the email outbox for bulk sends
+resource "aws_ses_template" "notification" {
+  name    = "${var.project_name}-notification"
+  subject = "{{{subject}}}"
+  text    = "{{{body}}}"
+}
+
 # ---------------------------
 # IAM Policy for Application
 # ---------------------------
@@ -195,14 +360,23 @@ resource "aws_iam_policy" "app_database_policy" {
           "${aws_dynamodb_table.contact_submissions.arn}/index/*",
           aws_dynamodb_table.website_visitors.arn,
           aws_dynamodb_table.documents.arn,
-          "${aws_dynamodb_table.documents.arn}/index/*"
+          "${aws_dynamodb_table.documents.arn}/index/*",
+          aws_dynamodb_table.analytics.arn,
+          aws_dynamodb_table.email_outbox.arn,
+          "${aws_dynamodb_table.email_outbox.arn}/index/*",
+          aws_dynamodb_table.near_duplicate_bands.arn,
+          aws_dynamodb_table.idempotency.arn
         ]
       },
       {
         Effect = "Allow"
         Action = [
           "ses:SendEmail",
-          "ses:SendRawEmail"
+          "ses:SendRawEmail",
+          "ses:SendBulkTemplatedEmail",
+          "ses:GetSendQuota",
+          "ses:GetTemplate",
+          "ses:CreateTemplate"
         ]
         Resource = "*"
       }
@@ -24,6 +24,38 @@ output "documents_table_arn" {
   value = aws_dynamodb_table.documents.arn
 }
 
+output "analytics_table_name" {
+  value = aws_dynamodb_table.analytics.name
+}
+
+output "analytics_table_arn" {
+  value = aws_dynamodb_table.analytics.arn
+}
+
+output "email_outbox_table_name" {
+  value = aws_dynamodb_table.email_outbox.name
+}
+
+output "email_outbox_table_arn" {
+  value = aws_dynamodb_table.email_outbox.arn
+}
+
+output "near_duplicate_bands_table_name" {
+  value = aws_dynamodb_table.near_duplicate_bands.name
+}
+
+output "near_duplicate_bands_table_arn" {
+  value = aws_dynamodb_table.near_duplicate_bands.arn
+}
+
+output "idempotency_table_name" {
+  value = aws_dynamodb_table.idempotency.name
+}
+
+output "idempotency_table_arn" {
+  value = aws_dynamodb_table.idempotency.arn
+}
+
 output "app_role_arn" {
   value = aws_iam_role.app_role.arn
 }